@@ -0,0 +1,112 @@
+"""
+Compare prefix-filter deduplication with the previous all-pairs implementation
+
+Candidates are synthetic LoCoMo-style memories where a share of them are light rewordings of
+earlier ones, the way overlapping expanded queries return near-identical memories. Both
+implementations must return the same memories in the same order.
+"""
+import argparse
+import hashlib
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.improved_mem0.utils import calculate_similarity, deduplicate_memories
+
+SUBJECTS = ["Caroline", "Melanie", "Jon", "Gina", "John", "Maria", "Tim", "Nate", "Joanna", "Audrey"]
+VERBS = ["went to", "talked about", "painted", "visited", "signed up for", "is planning", "enjoyed", "recommended"]
+OBJECTS = [
+    "the LGBTQ support group", "a pottery class", "the beach with her kids", "a counseling course",
+    "a charity run", "the museum downtown", "a camping trip", "a new dance studio", "her art show",
+    "a book about adoption", "the farmers market", "a concert in the park",
+]
+DETAILS = ["last week", "in May 2023", "with friends", "after work", "on the weekend", "for the first time", ""]
+
+
+def legacy_deduplicate_memories(memories, similarity_threshold=0.8):
+    """The all-pairs implementation deduplicate_memories replaced"""
+    if not memories:
+        return memories
+
+    deduplicated = []
+    seen_hashes = set()
+
+    for memory in memories:
+        memory_text = memory.get("memory", "") or memory.get("text", "") or str(memory)
+        memory_hash = hashlib.md5(memory_text.lower().encode()).hexdigest()
+        if memory_hash in seen_hashes:
+            continue
+
+        is_duplicate = False
+        for existing in deduplicated:
+            existing_text = existing.get("memory", "") or existing.get("text", "") or str(existing)
+            similarity = calculate_similarity(memory_text, existing_text)
+
+            if similarity >= similarity_threshold:
+                existing_score = existing.get("score", 0.0)
+                memory_score = memory.get("score", 0.0)
+
+                if memory_score > existing_score:
+                    deduplicated.remove(existing)
+                    deduplicated.append(memory)
+                    seen_hashes.add(memory_hash)
+                is_duplicate = True
+                break
+
+        if not is_duplicate:
+            deduplicated.append(memory)
+            seen_hashes.add(memory_hash)
+
+    return deduplicated
+
+
+def make_memories(n, duplicate_rate, rng):
+    memories = []
+    for i in range(n):
+        if memories and rng.random() < duplicate_rate:
+            words = rng.choice(memories)["memory"].split()
+            # Drop or append a word so the copy is near, not exact
+            if len(words) > 4 and rng.random() < 0.5:
+                del words[rng.randrange(len(words))]
+            else:
+                words.append(rng.choice(DETAILS) or "again")
+            text = " ".join(words)
+        else:
+            text = f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} {rng.choice(DETAILS)} (#{i})"
+        memories.append({"id": str(i), "memory": text.strip(), "score": round(rng.random(), 3)})
+    return memories
+
+
+def timed(fn, memories, threshold):
+    start = time.perf_counter()
+    result = fn([dict(memory) for memory in memories], similarity_threshold=threshold)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark memory deduplication")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--duplicate_rate", type=float, default=0.4)
+    parser.add_argument("--threshold", type=float, default=0.75, help="Threshold used by the search pipeline")
+    parser.add_argument("--legacy_max_size", type=int, default=10000, help="Skip the all-pairs run above this size")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for n in args.sizes:
+        memories = make_memories(n, args.duplicate_rate, rng)
+        result, elapsed = timed(deduplicate_memories, memories, args.threshold)
+        line = f"n={n:>6}: prefix-filter {elapsed * 1000:9.1f} ms, kept {len(result)}"
+        if n <= args.legacy_max_size:
+            legacy, legacy_elapsed = timed(legacy_deduplicate_memories, memories, args.threshold)
+            if [m["id"] for m in legacy] != [m["id"] for m in result]:
+                raise AssertionError(f"n={n}: deduplicated memories differ from the all-pairs implementation")
+            line += f" | all-pairs {legacy_elapsed * 1000:9.1f} ms ({legacy_elapsed / elapsed:.1f}x)"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Encoder throughput at batch 1 vs batched, on CPU
+
+Uses the same sentence-transformers model as config_local_models.get_local_ollama_config, so
+the numbers reflect what per-query Memory.search embedding costs compared with embedding all
+expanded queries of a question (or of many questions) in one call.
+"""
+import argparse
+import time
+
+from sentence_transformers import SentenceTransformer
+
+SAMPLE_QUERIES = [
+    "When did Caroline go to the LGBTQ support group?",
+    "What date did Caroline attend the support group meeting?",
+    "Which events did Caroline and Melanie discuss in May 2023?",
+    "What does Melanie like to paint?",
+    "How long has Caroline been practicing art?",
+    "Who did Melanie go camping with last summer?",
+    "What career is Caroline pursuing after her counseling course?",
+    "Where did Melanie take her kids on vacation?",
+]
+
+
+def measure(model, texts, batch_size, repeats):
+    # Warm-up so model loading / first-call allocation is not timed
+    model.encode(texts[:batch_size], batch_size=batch_size, convert_to_numpy=True)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        if batch_size == 1:
+            for text in texts:
+                model.encode(text, convert_to_numpy=True)
+        else:
+            model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+    elapsed = time.perf_counter() - start
+    return len(texts) * repeats / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark query encoder throughput by batch size")
+    parser.add_argument("--model", type=str, default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--num_queries", type=int, default=256, help="Number of queries to embed per repeat")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--batch_sizes", type=int, nargs="+", default=[1, 8, 32])
+    args = parser.parse_args()
+
+    model = SentenceTransformer(args.model, device="cpu")
+    texts = [SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)] + f" ({i})" for i in range(args.num_queries)]
+
+    baseline = None
+    for batch_size in args.batch_sizes:
+        throughput = measure(model, texts, batch_size, args.repeats)
+        baseline = baseline or throughput
+        print(f"batch {batch_size:>3}: {throughput:8.1f} queries/s ({throughput / baseline:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Compare the deque / bidirectional MemoryGraph traversals with the previous list-queue BFS
+
+Graphs are synthetic power-law entity graphs (preferential attachment, so a few hub entities
+collect most of the edges, as names do in LoCoMo conversations) with repeated edge mentions.
+The previous implementations run over per-mention edge lists, the way MemoryGraph used to store
+them. Without a fan-out cap both must return the same related entities and paths of the same
+length; capped runs show how far hubs are trimmed, frozen runs the CSR form of the graph. Ranked
+relations must come out in the direction they were stated, never as the stored reverse edge.
+"""
+import argparse
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.improved_mem0.memory_graph import MemoryGraph
+
+REL_TYPES = ["related_to", "works_with", "lives_in", "likes", "visited"]
+
+
+def legacy_get_related_entities(graph, relationships, entity, max_depth=2):
+    """The list-queue implementation get_related_entities replaced"""
+    if entity not in graph.entities:
+        return set()
+
+    related = set()
+    visited = set()
+    queue = [(entity, 0)]
+
+    while queue:
+        current_entity, depth = queue.pop(0)
+
+        if depth >= max_depth or current_entity in visited:
+            continue
+
+        visited.add(current_entity)
+        related.add(current_entity)
+
+        for related_entity, rel_type, strength in relationships.get(current_entity, []):
+            if related_entity not in visited:
+                queue.append((related_entity, depth + 1))
+
+    related.discard(entity)
+    return related
+
+
+def legacy_find_memory_path(graph, relationships, entity1, entity2, max_depth=3):
+    """The path-copying implementation find_memory_path replaced"""
+    if entity1 not in graph.entities or entity2 not in graph.entities:
+        return None
+
+    if entity1 == entity2:
+        return [entity1]
+
+    queue = [(entity1, [entity1])]
+    visited = {entity1}
+
+    while queue:
+        current_entity, path = queue.pop(0)
+
+        if len(path) > max_depth:
+            continue
+
+        if current_entity == entity2:
+            return path
+
+        for related_entity, rel_type, strength in relationships.get(current_entity, []):
+            if related_entity not in visited:
+                visited.add(related_entity)
+                queue.append((related_entity, path + [related_entity]))
+
+    return None
+
+
+def make_graph(num_entities, edges_per_entity, rng):
+    """
+    Preferential-attachment graph, the per-mention edge lists the previous storage kept, and the set
+    of stated (source, relationship, target) relations
+    
+    Every edge is stored in both directions like add_memory does.
+    """
+    graph = MemoryGraph()
+    relationships = defaultdict(list)
+    stated = set()
+    endpoints = []  # One entry per edge end, so sampling from it favours high-degree entities
+    for i in range(num_entities):
+        entity = f"Entity{i}"
+        graph.entities[entity] = {"id": entity, "name": entity, "first_seen": "", "memory_count": 1}
+        targets = {rng.choice(endpoints) for _ in range(edges_per_entity)} if endpoints else set()
+        for target in targets:
+            rel_type = rng.choice(REL_TYPES)
+            # Zipf-like repeated mentions of the same relationship
+            for _ in range(min(int(rng.paretovariate(1.5)), 20)):
+                graph.add_edge(entity, target, rel_type)
+                graph.add_edge(target, entity, rel_type, forward=0)
+                stated.add((entity, rel_type, target))
+                relationships[entity].append((target, rel_type, 1.0))
+                relationships[target].append((entity, rel_type, 1.0))
+            endpoints.extend([entity, target])
+        if not endpoints:
+            endpoints.append(entity)
+    return graph, relationships, stated
+
+
+def check_relation_direction():
+    """Relations extracted from memory text are returned as stated, from either end"""
+    graph = MemoryGraph()
+    for memory_id, text in enumerate(["Bob likes Paris", "Alice went to Paris", "Carol met Bob", "Alice met Bob"]):
+        graph.add_memory(str(memory_id), text)
+    expected = {("Bob", "likes", "Paris"), ("Alice", "went_to", "Paris"), ("Carol", "met", "Bob"),
+                ("Alice", "met", "Bob")}
+    frozen_graph = MemoryGraph()
+    frozen_graph.from_dict(graph.to_dict())
+    frozen_graph.freeze()
+    for seeds in (["Paris"], ["Bob"], ["Paris", "Bob"], ["Alice", "Carol"]):
+        for g in (graph, frozen_graph):
+            relations = {(source, rel_type, target) for source, rel_type, target, _ in g.get_ranked_relations(seeds)}
+            if relations != expected:
+                raise AssertionError(f"relations from {seeds}: {sorted(relations)} instead of {sorted(expected)}")
+
+
+def timed(fn, queries):
+    start = time.perf_counter()
+    results = [fn(*query) for query in queries]
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark memory graph traversals")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--edges_per_entity", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--fanout", type=int, default=8, help="Per-entity edge cap for the capped runs")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    check_relation_direction()
+    rng = random.Random(args.seed)
+    for n in args.sizes:
+        graph, relationships, stated = make_graph(n, args.edges_per_entity, rng)
+        entities = list(graph.entities)
+        stats = graph.get_graph_stats()
+        print(f"n={n} entities, {stats['num_relationship_mentions']} relationship mentions stored as "
+              f"{stats['num_relationships']} edges")
+        frozen_graph = MemoryGraph()
+        frozen_graph.from_dict(graph.to_dict())
+        frozen_graph.freeze()
+
+        for depth in (2, 3):
+            queries = [(rng.choice(entities), depth) for _ in range(args.queries)]
+            new, new_time = timed(graph.get_related_entities, queries)
+            old, old_time = timed(lambda entity, d: legacy_get_related_entities(graph, relationships, entity, d), queries)
+            if new != old:
+                raise AssertionError(f"n={n} depth={depth}: related entities differ from the list-queue BFS")
+            capped, capped_time = timed(lambda entity, d: graph.get_related_entities(entity, d, args.fanout), queries)
+            frozen, frozen_time = timed(frozen_graph.get_related_entities, queries)
+            frozen_capped, frozen_capped_time = timed(
+                lambda entity, d: frozen_graph.get_related_entities(entity, d, args.fanout), queries
+            )
+            if frozen != new or frozen_capped != capped:
+                raise AssertionError(f"n={n} depth={depth}: frozen graph traversal differs")
+            print(f"  related depth={depth}: deque {new_time * 1000:8.1f} ms | list {old_time * 1000:8.1f} ms "
+                  f"({old_time / new_time:.1f}x) | frozen {frozen_time * 1000:8.1f} ms | fanout={args.fanout} "
+                  f"{capped_time * 1000:8.1f} ms, frozen {frozen_capped_time * 1000:8.1f} ms, "
+                  f"mean size {sum(map(len, new)) / len(new):.0f} -> {sum(map(len, capped)) / len(capped):.0f}")
+
+        queries = [([rng.choice(entities) for _ in range(3)], 2, args.fanout) for _ in range(args.queries)]
+        ranked, ranked_time = timed(graph.get_ranked_relations, queries)
+        frozen_ranked, frozen_ranked_time = timed(frozen_graph.get_ranked_relations, queries)
+        if frozen_ranked != ranked:
+            raise AssertionError(f"n={n}: frozen graph relations differ")
+        for relations in ranked:
+            for source, rel_type, target, _ in relations:
+                if (source, rel_type, target) not in stated:
+                    raise AssertionError(f"n={n}: relation {source} {rel_type} {target} was never stated")
+        print(f"  relations depth=2 fanout={args.fanout}: {ranked_time * 1000:8.1f} ms | frozen "
+              f"{frozen_ranked_time * 1000:8.1f} ms, mean {sum(map(len, ranked)) / len(ranked):.0f} relations")
+
+        for max_depth in (3, 5):
+            queries = [(rng.choice(entities), rng.choice(entities), max_depth) for _ in range(args.queries)]
+            new, new_time = timed(graph.find_memory_path, queries)
+            old, old_time = timed(lambda a, b, d: legacy_find_memory_path(graph, relationships, a, b, d), queries)
+            frozen, frozen_time = timed(frozen_graph.find_memory_path, queries)
+            if frozen != new:
+                raise AssertionError(f"n={n}: frozen graph paths differ")
+            for (a, b, _), path, reference in zip(queries, new, old):
+                if (path is None) != (reference is None) or (path and len(path) != len(reference)):
+                    raise AssertionError(f"n={n}: path {a} -> {b} differs from the list-queue BFS")
+                if path and (path[0], path[-1]) != (a, b):
+                    raise AssertionError(f"n={n}: path {a} -> {b} has wrong endpoints")
+            found = sum(path is not None for path in new)
+            print(f"  path max_depth={max_depth}: bidirectional {new_time * 1000:8.1f} ms | list "
+                  f"{old_time * 1000:8.1f} ms ({old_time / new_time:.1f}x) | frozen {frozen_time * 1000:8.1f} ms, "
+                  f"{found}/{len(queries)} found")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Compare the LLM reranker with the local cross-encoder reranker on LoCoMo
+
+Runs the search pipeline once per reranker over the same questions and reports per-question rerank
+latency (from the rerank_time recorded in each result) and LLM-judge accuracy of the final answers.
+Memories must already have been added (run_experiments_local.py --method add) with the same model
+configuration.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config_local_models import get_local_ollama_config, get_local_lmstudio_config, get_openai_config
+from metrics.llm_judge import evaluate_llm_judge
+from src.improved_mem0.rerankers import CrossEncoderReranker
+from src.improved_mem0.search import ImprovedMemorySearch
+
+
+def subset_dataset(data_path, questions_per_conversation):
+    """Write a copy of the dataset keeping the first N non-adversarial questions of each conversation"""
+    with open(data_path, "r") as f:
+        data = json.load(f)
+    for item in data:
+        item["qa"] = [qa for qa in item["qa"] if str(qa.get("category")) != "5"][:questions_per_conversation]
+    fd, path = tempfile.mkstemp(suffix=".json", prefix="locomo_subset_")
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f)
+    return path
+
+
+def summarize(name, results):
+    results = [result for question_results in results.values() for result in question_results]
+    rerank_ms = np.array([result["rerank_time"] * 1000 for result in results])
+    labels = [evaluate_llm_judge(r["question"], str(r["answer"]), str(r["response"])) for r in results]
+    return {
+        "reranker": name,
+        "questions": len(results),
+        "rerank_ms_mean": float(rerank_ms.mean()) if len(results) else 0.0,
+        "rerank_ms_p95": float(np.percentile(rerank_ms, 95)) if len(results) else 0.0,
+        "rerank_calls_mean": float(np.mean([r["rerank_calls"] for r in results])) if results else 0.0,
+        "llm_judge_accuracy": float(np.mean(labels)) if labels else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LLM vs cross-encoder reranking")
+    parser.add_argument("--data_path", type=str, default="dataset/locomo10.json")
+    parser.add_argument("--questions_per_conversation", type=int, default=20)
+    parser.add_argument("--model", type=str, default="llama3.2:latest")
+    parser.add_argument("--model_type", choices=["ollama", "lmstudio", "openai"], default="ollama")
+    parser.add_argument("--top_k", type=int, default=30)
+    parser.add_argument("--cross_encoder_model", type=str, default="cross-encoder/ms-marco-MiniLM-L-6-v2")
+    parser.add_argument("--reranker_threads", type=int, default=None)
+    parser.add_argument("--max_workers", type=int, default=4)
+    parser.add_argument("--output_folder", type=str, default="results/bench_reranker/")
+    args = parser.parse_args()
+
+    if args.model_type == "ollama":
+        config = get_local_ollama_config(model_name=args.model)
+    elif args.model_type == "lmstudio":
+        config = get_local_lmstudio_config()
+    else:
+        config = get_openai_config()
+
+    os.makedirs(args.output_folder, exist_ok=True)
+    data_path = subset_dataset(args.data_path, args.questions_per_conversation)
+    rerankers = {
+        "llm-listwise": {"rerank_mode": "listwise"},
+        "llm-chunked": {"rerank_mode": "chunked"},
+        "cross-encoder": {
+            "reranker": CrossEncoderReranker(model_name=args.cross_encoder_model, num_threads=args.reranker_threads)
+        },
+    }
+
+    summaries = []
+    try:
+        for name, kwargs in rerankers.items():
+            searcher = ImprovedMemorySearch(
+                output_path=os.path.join(args.output_folder, f"{name}.json"),
+                top_k=args.top_k,
+                config=config,
+                **kwargs
+            )
+            searcher.process_data_file(data_path, max_workers=args.max_workers)
+            summaries.append(summarize(name, searcher.results))
+    finally:
+        os.remove(data_path)
+
+    print(f"{'reranker':<16} {'questions':>9} {'rerank ms':>10} {'p95 ms':>9} {'requests':>9} {'judge acc':>10}")
+    for s in summaries:
+        print(f"{s['reranker']:<16} {s['questions']:>9} {s['rerank_ms_mean']:>10.1f} {s['rerank_ms_p95']:>9.1f} "
+              f"{s['rerank_calls_mean']:>9.1f} {s['llm_judge_accuracy']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Compare the precompiled temporal parser with the previous pattern-by-pattern implementation
+
+The corpus mirrors what the search pipeline parses: LoCoMo session timestamps of candidate memories
+(repeated, since every memory of a session carries the same one), plus questions, relative
+expressions and absolute dates. Outside LoCoMo timestamps, which the previous parser did not
+recognize, both parsers must return the same datetimes for a fixed reference date.
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.improved_mem0.temporal import _parse_spec, parse_locomo_timestamp, parse_temporal_expression
+
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August", "September",
+          "October", "November", "December"]
+QUESTIONS = [
+    "When did Caroline go to the LGBTQ support group?",
+    "What did Melanie paint last week?",
+    "How long ago was Caroline's 18th birthday? It was 10 years ago",
+    "What happened yesterday at the pottery class?",
+    "Where did Jon go 3 days ago and 2 weeks ago?",
+    "What is Gina's favourite dance style?",
+    "Did John visit the museum last month or last year?",
+    "When is Tim planning the camping trip with 5 friends?",
+]
+OTHER_DATES = ["2023-05-08", "05/08/2023", "25/12/2023", "May 8, 2023", "Aug 14, 2023", "2023-05-08 13:56:00",
+               "13/13/2023", "2023-02-30", ""]
+
+
+def legacy_parse_temporal_expression(text, reference_date=None):
+    """The implementation parse_temporal_expression replaced"""
+    if reference_date is None:
+        reference_date = datetime.now()
+
+    text_lower = text.lower()
+
+    patterns = [
+        (r'(\d+)\s*(?:seconds?|secs?)\s*ago', lambda m: reference_date - timedelta(seconds=int(m.group(1)))),
+        (r'(\d+)\s*(?:minutes?|mins?)\s*ago', lambda m: reference_date - timedelta(minutes=int(m.group(1)))),
+        (r'(\d+)\s*(?:hours?|hrs?)\s*ago', lambda m: reference_date - timedelta(hours=int(m.group(1)))),
+        (r'(\d+)\s*(?:days?)\s*ago', lambda m: reference_date - timedelta(days=int(m.group(1)))),
+        (r'(\d+)\s*(?:weeks?)\s*ago', lambda m: reference_date - timedelta(weeks=int(m.group(1)))),
+        (r'(\d+)\s*(?:months?)\s*ago', lambda m: reference_date - timedelta(days=int(m.group(1)) * 30)),
+        (r'(\d+)\s*(?:years?)\s*ago', lambda m: reference_date - timedelta(days=int(m.group(1)) * 365)),
+        (r'yesterday', lambda m: reference_date - timedelta(days=1)),
+        (r'today', lambda m: reference_date),
+        (r'last\s+week', lambda m: reference_date - timedelta(weeks=1)),
+        (r'last\s+month', lambda m: reference_date - timedelta(days=30)),
+        (r'last\s+year', lambda m: reference_date - timedelta(days=365)),
+    ]
+
+    for pattern, func in patterns:
+        match = re.search(pattern, text_lower)
+        if match:
+            try:
+                return func(match)
+            except:
+                continue
+
+    date_formats = [
+        "%Y-%m-%d",
+        "%m/%d/%Y",
+        "%d/%m/%Y",
+        "%B %d, %Y",
+        "%b %d, %Y",
+        "%Y-%m-%d %H:%M:%S",
+    ]
+
+    for fmt in date_formats:
+        try:
+            return datetime.strptime(text, fmt)
+        except:
+            continue
+
+    return None
+
+
+def locomo_timestamps(data_path, rng, sessions):
+    """Session timestamps from the dataset, or generated in the same format when it is not available"""
+    if data_path and Path(data_path).exists():
+        with open(data_path, "r") as f:
+            data = json.load(f)
+        return [
+            value for item in data for key, value in item["conversation"].items()
+            if key.endswith("_date_time")
+        ]
+    return [
+        f"{rng.randint(1, 12)}:{rng.randint(0, 59):02d} {rng.choice(['am', 'pm'])} on "
+        f"{rng.randint(1, 28)} {rng.choice(MONTHS)}, {rng.randint(2022, 2024)}"
+        for _ in range(sessions)
+    ]
+
+
+def make_corpus(timestamps, size, rng):
+    """Mostly memory timestamps, with questions and other date strings mixed in"""
+    corpus = []
+    for _ in range(size):
+        roll = rng.random()
+        if roll < 0.8:
+            corpus.append(rng.choice(timestamps))
+        elif roll < 0.9:
+            corpus.append(rng.choice(QUESTIONS))
+        else:
+            corpus.append(rng.choice(OTHER_DATES))
+    return corpus
+
+
+def timed(fn, corpus, reference_date):
+    start = time.perf_counter()
+    results = [fn(text, reference_date) for text in corpus]
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark temporal expression parsing")
+    parser.add_argument("--data_path", type=str, default="dataset/locomo10.json")
+    parser.add_argument("--sessions", type=int, default=300, help="Generated timestamps when the dataset is absent")
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    timestamps = locomo_timestamps(args.data_path, rng, args.sessions)
+    corpus = make_corpus(timestamps, args.size, rng)
+    reference_date = datetime(2023, 6, 1, 12, 0)
+
+    legacy, legacy_time = timed(legacy_parse_temporal_expression, corpus, reference_date)
+    _, unmemoized_time = timed(lambda text, _: _parse_spec.__wrapped__(text), corpus, reference_date)
+    _parse_spec.cache_clear()
+    cold, cold_time = timed(parse_temporal_expression, corpus, reference_date)
+    warm, warm_time = timed(parse_temporal_expression, corpus, reference_date)
+
+    for text, old, new in zip(corpus, legacy, cold):
+        if parse_locomo_timestamp(text) is not None:
+            if new is None:
+                raise AssertionError(f"LoCoMo timestamp not parsed: {text!r}")
+        elif old != new:
+            raise AssertionError(f"{text!r}: {new} differs from the previous parser's {old}")
+    if cold != warm:
+        raise AssertionError("memoized parses differ")
+
+    parsed = sum(result is not None for result in cold)
+    print(f"{len(corpus)} strings ({len(set(corpus))} distinct), {parsed} parsed "
+          f"(previous parser: {sum(result is not None for result in legacy)})")
+    print(f"previous  {legacy_time * 1e6 / len(corpus):8.2f} us/parse")
+    print(f"no memo   {unmemoized_time * 1e6 / len(corpus):8.2f} us/parse ({legacy_time / unmemoized_time:.1f}x)")
+    print(f"memo cold {cold_time * 1e6 / len(corpus):8.2f} us/parse ({legacy_time / cold_time:.1f}x)")
+    print(f"memo warm {warm_time * 1e6 / len(corpus):8.2f} us/parse ({legacy_time / warm_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
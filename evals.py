@@ -9,7 +9,7 @@ from pathlib import Path
 # Add parent directory to path to import metrics
 sys.path.insert(0, str(Path(__file__).parent))
 
-from metrics.llm_judge import evaluate_llm_judge
+from metrics.llm_judge import evaluate_llm_judge, set_judge_cache
 from metrics.utils import calculate_bleu_scores, calculate_metrics
 from tqdm import tqdm
 
@@ -56,9 +56,16 @@ def main():
         "--output_file", type=str, default="evaluation_improved_metrics.json", help="Path to save the evaluation results"
     )
     parser.add_argument("--max_workers", type=int, default=10, help="Maximum number of worker threads")
+    parser.add_argument("--llm_cache", type=str, default=None, help="SQLite file for caching judge responses")
+    parser.add_argument("--llm_cache_ttl", type=float, default=None, help="Cache entry lifetime in seconds")
 
     args = parser.parse_args()
 
+    if args.llm_cache:
+        from src.improved_mem0.cache import TieredCache
+        judge_cache = TieredCache(db_path=args.llm_cache, ttl=args.llm_cache_ttl)
+        set_judge_cache(judge_cache)
+
     with open(args.input_file, "r") as f:
         data = json.load(f)
 
@@ -80,6 +87,8 @@ def main():
         json.dump(results, f, indent=4)
 
     print(f"Results saved to {args.output_file}")
+    if args.llm_cache:
+        print(f"Judge cache: {judge_cache.stats()}")
 
 
 if __name__ == "__main__":
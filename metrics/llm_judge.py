@@ -1,13 +1,23 @@
 import argparse
 import json
+import sys
 from collections import defaultdict
+from pathlib import Path
 
 import numpy as np
 from openai import OpenAI
 
 from mem0.memory.utils import extract_json
 
+# Add parent directory to path to import the shared response cache
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.improved_mem0.cache import TieredCache, make_cache_key
+
 client = OpenAI()
+JUDGE_MODEL = "gpt-4o-mini"
+
+# Optional TieredCache for judge responses, set with set_judge_cache()
+_judge_cache = None
 
 ACCURACY_PROMPT = """
 Your task is to label an answer to a question as ’CORRECT’ or ’WRONG’. You will be given the following data:
@@ -36,22 +46,52 @@ Just return the label CORRECT or WRONG in a json format with the key as "label".
 """
 
 
+def set_judge_cache(cache):
+    """Serve repeated (question, gold, response) judgements from a TieredCache; None disables caching."""
+    global _judge_cache
+    _judge_cache = cache
+
+
+def _judge_label(content):
+    """CORRECT / WRONG label of a judge reply, or None if the reply is malformed"""
+    try:
+        label = json.loads(extract_json(content))["label"]
+    except (TypeError, ValueError, KeyError):
+        return None
+    return label if label in ("CORRECT", "WRONG") else None
+
+
 def evaluate_llm_judge(question, gold_answer, generated_answer):
     """Evaluate the generated answer against the gold answer using an LLM judge."""
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {
-                "role": "user",
-                "content": ACCURACY_PROMPT.format(
-                    question=question, gold_answer=gold_answer, generated_answer=generated_answer
-                ),
-            }
-        ],
-        response_format={"type": "json_object"},
-        temperature=0.0,
-    )
-    label = json.loads(extract_json(response.choices[0].message.content))["label"]
+    messages = [
+        {
+            "role": "user",
+            "content": ACCURACY_PROMPT.format(
+                question=question, gold_answer=gold_answer, generated_answer=generated_answer
+            ),
+        }
+    ]
+    response_format = {"type": "json_object"}
+    cache_key = make_cache_key(model=JUDGE_MODEL, messages=messages, temperature=0.0, response_format=response_format)
+
+    content = _judge_cache.get(cache_key) if _judge_cache is not None else None
+    if content is not None and _judge_label(content) is None:
+        # Stored before judgements were validated; ask again
+        _judge_cache.delete(cache_key)
+        content = None
+    if content is None:
+        response = client.chat.completions.create(
+            model=JUDGE_MODEL,
+            messages=messages,
+            response_format=response_format,
+            temperature=0.0,
+        )
+        content = response.choices[0].message.content
+        # Only well-formed judgements are cached, so a malformed reply is not replayed on every rerun
+        if _judge_cache is not None and _judge_label(content) is not None:
+            _judge_cache.set(cache_key, content)
+
+    label = json.loads(extract_json(content))["label"]
     return 1 if label == "CORRECT" else 0
 
 
@@ -64,8 +104,11 @@ def main():
         default="results/default_run_v4_k30_new_graph.json",
         help="Path to the input dataset file",
     )
+    parser.add_argument("--llm_cache", type=str, default=None, help="SQLite file for caching judge responses")
 
     args = parser.parse_args()
+    if args.llm_cache:
+        set_judge_cache(TieredCache(db_path=args.llm_cache))
 
     dataset_path = args.input_file
     output_path = f"results/llm_judge_{dataset_path.split('/')[-1]}"
@@ -17,6 +17,7 @@ def main():
     parser.add_argument("--filter_memories", action="store_true", default=False, help="Whether to filter memories")
     parser.add_argument("--is_graph", action="store_true", default=False, help="Whether to use graph-based search")
     parser.add_argument("--data_path", type=str, default="dataset/locomo10.json", help="Path to dataset")
+    parser.add_argument("--graph_path", type=str, default="memory_graph.db", help="SQLite file of the per-user memory graphs, written by add and read by search with --is_graph")
 
     args = parser.parse_args()
 
@@ -24,7 +25,10 @@ def main():
 
     if args.technique_type == "improved_mem0":
         if args.method == "add":
-            memory_manager = ImprovedMemoryADD(data_path=args.data_path, is_graph=args.is_graph)
+            memory_manager = ImprovedMemoryADD(
+                data_path=args.data_path, is_graph=args.is_graph,
+                graph_path=args.graph_path if args.is_graph else None
+            )
             memory_manager.process_all_conversations()
         elif args.method == "search":
             output_file_path = os.path.join(
@@ -35,7 +39,8 @@ def main():
                 output_path=output_file_path, 
                 top_k=args.top_k, 
                 filter_memories=args.filter_memories, 
-                is_graph=args.is_graph
+                is_graph=args.is_graph,
+                graph_path=args.graph_path
             )
             memory_searcher.process_data_file(args.data_path)
     else:
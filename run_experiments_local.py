@@ -12,6 +12,10 @@ sys.path.insert(0, str(Path(__file__).parent))
 from config_local_models import get_local_ollama_config, get_local_lmstudio_config, get_openai_config
 from src.improved_mem0.add_local import ImprovedMemoryADD
 from src.improved_mem0.search import ImprovedMemorySearch
+from src.improved_mem0.cache import TieredCache
+from src.improved_mem0.limits import ConcurrencyLimiter
+from src.improved_mem0.rerankers import CrossEncoderReranker
+from src.improved_mem0.snapshot import MemoryVersions
 
 
 def main():
@@ -25,6 +29,29 @@ def main():
     parser.add_argument("--data_path", type=str, default="dataset/locomo10.json", help="Path to dataset")
     parser.add_argument("--model", type=str, default="llama3.2:latest", help="Ollama model name (e.g., llama3.2:latest, llama3.1:8b, mistral:7b)")
     parser.add_argument("--model_type", choices=["ollama", "lmstudio", "openai"], default="ollama", help="Model provider type")
+    parser.add_argument("--async_pipeline", action="store_true", default=False, help="Use the asyncio search pipeline")
+    parser.add_argument("--max_in_flight", type=int, default=8, help="Questions processed concurrently by the search pipeline")
+    parser.add_argument("--scheduler", choices=["queue", "batch"], default="queue", help="Question scheduler for the threaded pipeline (the async pipeline only streams, like queue)")
+    parser.add_argument("--resume", action="store_true", default=False, help="Skip questions already answered under the same config in the checkpoint log")
+    parser.add_argument("--llm_cache", type=str, default=None, help="SQLite file for caching expansion / rerank / answer LLM responses")
+    parser.add_argument("--llm_cache_ttl", type=float, default=None, help="Cache entry lifetime in seconds")
+    parser.add_argument("--embedding_cache", type=str, default=None, help="SQLite file for persisting query embeddings")
+    parser.add_argument("--rerank_mode", choices=["chunked", "listwise"], default="chunked", help="One LLM rerank request per batch (chunked) or per question (listwise)")
+    parser.add_argument("--rerank_token_budget", type=int, default=3000, help="Prompt token budget of a listwise rerank request")
+    parser.add_argument("--reranker", choices=["llm", "cross-encoder"], default="llm", help="Score candidates with the LLM or a local cross-encoder")
+    parser.add_argument("--cross_encoder_model", type=str, default="cross-encoder/ms-marco-MiniLM-L-6-v2", help="Cross-encoder model for --reranker cross-encoder")
+    parser.add_argument("--reranker_threads", type=int, default=None, help="CPU threads for cross-encoder inference")
+    parser.add_argument("--dedup", choices=["jaccard", "semantic", "none"], default="jaccard", help="Candidate deduplication: word overlap, embedding similarity, or off")
+    parser.add_argument("--semantic_dedup_threshold", type=float, default=0.9, help="Cosine similarity for --dedup semantic")
+    parser.add_argument("--memory_versions", type=str, default=None, help="SQLite file of per-user write counters shared by add and search runs")
+    parser.add_argument("--graph_path", type=str, default="memory_graph.db", help="SQLite file of the per-user memory graphs, written by add and read by search with --is_graph")
+    parser.add_argument("--ingest_workers", type=int, default=10, help="Memory adds in flight across all users (add method)")
+    parser.add_argument("--ingestion_mode", choices=["per_speaker", "shared"], default="per_speaker", help="Extract facts per speaker, or once per session batch for both speakers (shared skips mem0's update/dedup of existing memories, trading update semantics for throughput)")
+    parser.add_argument("--manifest", type=str, default=None, help="SQLite ingestion manifest: re-runs skip unchanged sessions and replace changed ones (replacing a session also drops updates later sessions merged into its memories, unless those sessions are re-ingested too)")
+    parser.add_argument("--llm_concurrency", type=int, default=4, help="LLM calls in flight across all ingestion workers")
+    parser.add_argument("--embedder_concurrency", type=int, default=8, help="Embedding calls in flight across all ingestion workers")
+    parser.add_argument("--vector_store_concurrency", type=int, default=8, help="Vector-store operations in flight across all ingestion workers")
+    parser.add_argument("--question_timeout", type=float, default=None, help="Per-question deadline in seconds (queue scheduler and async pipeline)")
     
     args = parser.parse_args()
 
@@ -43,24 +70,57 @@ def main():
     else:
         raise ValueError(f"Invalid model type: {args.model_type}")
 
+    memory_versions = MemoryVersions(db_path=args.memory_versions) if args.memory_versions else None
+
     if args.technique_type == "improved_mem0":
         if args.method == "add":
-            memory_manager = ImprovedMemoryADD(data_path=args.data_path, is_graph=args.is_graph, config=config)
-            memory_manager.process_all_conversations()
+            memory_manager = ImprovedMemoryADD(
+                data_path=args.data_path, is_graph=args.is_graph, config=config, memory_versions=memory_versions,
+                graph_path=args.graph_path if args.is_graph else None,
+                limiter=ConcurrencyLimiter(
+                    llm=args.llm_concurrency, embedder=args.embedder_concurrency,
+                    vector_store=args.vector_store_concurrency
+                ),
+                ingestion_mode=args.ingestion_mode,
+                manifest_path=args.manifest
+            )
+            memory_manager.process_all_conversations(max_workers=args.ingest_workers)
         elif args.method == "search":
             output_file_path = os.path.join(
                 args.output_folder,
                 f"improved_mem0_local_{args.model_type}_{args.model.replace(':', '_')}_top_{args.top_k}_filter_{args.filter_memories}_graph_{args.is_graph}.json",
             )
-            from src.improved_mem0.search import ImprovedMemorySearch
-            memory_searcher = ImprovedMemorySearch(
+            if args.async_pipeline:
+                from src.improved_mem0.async_search import AsyncImprovedMemorySearch as searcher_class
+            else:
+                searcher_class = ImprovedMemorySearch
+            llm_cache = TieredCache(db_path=args.llm_cache, ttl=args.llm_cache_ttl) if args.llm_cache else None
+            embedding_cache = (
+                TieredCache(db_path=args.embedding_cache, namespace="query_embeddings") if args.embedding_cache else None
+            )
+            reranker = None
+            if args.reranker == "cross-encoder":
+                reranker = CrossEncoderReranker(model_name=args.cross_encoder_model, num_threads=args.reranker_threads)
+            memory_searcher = searcher_class(
                 output_path=output_file_path, 
                 top_k=args.top_k, 
                 filter_memories=args.filter_memories, 
                 is_graph=args.is_graph,
-                config=config
+                config=config,
+                llm_cache=llm_cache,
+                embedding_cache=embedding_cache,
+                rerank_mode=args.rerank_mode,
+                rerank_token_budget=args.rerank_token_budget,
+                reranker=reranker,
+                enable_deduplication=True if args.dedup == "jaccard" else (args.dedup if args.dedup == "semantic" else False),
+                semantic_dedup_threshold=args.semantic_dedup_threshold,
+                memory_versions=memory_versions,
+                graph_path=args.graph_path
+            )
+            memory_searcher.process_data_file(
+                args.data_path, max_workers=args.max_in_flight, scheduler=args.scheduler,
+                question_timeout=args.question_timeout, resume=args.resume
             )
-            memory_searcher.process_data_file(args.data_path)
     else:
         raise ValueError(f"Invalid technique type: {args.technique_type}")
 
@@ -5,13 +5,19 @@ import json
 import os
 import threading
 import time
-from concurrent.futures import ThreadPoolExecutor
 
 from dotenv import load_dotenv
-from tqdm import tqdm
 
 from mem0 import Memory
 
+from src.improved_mem0.graph_store import GraphStore
+from src.improved_mem0.cache import CachedEmbedder, TieredCache, make_cache_key
+from src.improved_mem0.extraction import SessionFactExtractor
+from src.improved_mem0.ingestion import INGESTION_MODES, IngestionScheduler, format_ingestion_throughput
+from src.improved_mem0.limits import ConcurrencyLimiter, backoff_delay, format_limiter_stats
+from src.improved_mem0.manifest import IngestionManifest, SessionIngest, format_manifest_stats, session_content_hash
+from src.improved_mem0.snapshot import memory_versions as default_memory_versions
+
 load_dotenv()
 
 
@@ -61,10 +67,18 @@ Generate personal memories that follow these guidelines:
 """
 
 
+def _call(fn, *args):
+    return fn(*args)
+
+
 class ImprovedMemoryADD:
     """Enhanced memory addition with hierarchical consolidation and importance scoring"""
     
-    def __init__(self, data_path=None, batch_size=2, is_graph=False, config=None):
+    def __init__(self, data_path=None, batch_size=2, is_graph=False, config=None, memory_versions=None,
+                 graph_path=None, limiter=None, ingestion_mode="per_speaker",
+                 manifest_path=None):
+        if is_graph and not graph_path:
+            raise ValueError("is_graph needs a graph_path: graph search reads the memory graphs from that file")
         # Use provided config or default
         if config is None:
             from mem0.configs.base import MemoryConfig
@@ -72,10 +86,46 @@ class ImprovedMemoryADD:
             config.custom_fact_extraction_prompt = custom_instructions
         
         self.memory = Memory(config=config)
+        # LLM / embedder / vector-store calls of all ingestion workers share one set of limits
+        self.limiter = limiter or ConcurrencyLimiter()
+        self.limiter.wrap_memory(self.memory)
+        if ingestion_mode not in INGESTION_MODES:
+            raise ValueError(f"Invalid ingestion mode: {ingestion_mode}")
+        self.ingestion_mode = ingestion_mode
+        self.fact_extractor = None
+        if ingestion_mode == "shared":
+            # One extraction pass per session batch; a fact stored for both speakers is embedded once
+            self.fact_extractor = SessionFactExtractor(
+                self.memory.llm, config.custom_fact_extraction_prompt or custom_instructions
+            )
+            embedder = self.memory.embedding_model
+            self.memory.embedding_model = CachedEmbedder(
+                embedder, TieredCache(namespace="fact_embeddings"),
+                model=getattr(getattr(embedder, "config", None), "model", None)
+            )
+        # Write counters that invalidate search-side snapshots of a user's memories
+        self.memory_versions = memory_versions or default_memory_versions
         self.batch_size = batch_size
+        # Sessions already ingested with the same content, extraction prompt and model are skipped on
+        # re-runs; changed ones have their earlier memories removed and are ingested again
+        self.manifest = IngestionManifest(manifest_path) if manifest_path else None
+        self.manifest_stats = {"unchanged": 0, "changed": 0, "new": 0, "removed_memories": 0}
+        self._manifest_lock = threading.Lock()
+        self.extraction_model = getattr(getattr(self.memory.llm, "config", None), "model", None)
+        self.extraction_prompt_hash = make_cache_key(
+            prompt=(
+                self.fact_extractor.build_prompt("", "", []) if self.fact_extractor is not None
+                else config.custom_fact_extraction_prompt
+            ),
+            ingestion_mode=ingestion_mode,
+            batch_size=batch_size,
+            embedder=getattr(getattr(self.memory.embedding_model, "config", None), "model", None),
+        )
         self.data_path = data_path
         self.data = None
         self.is_graph = is_graph
+        # Per-user entity graphs, persisted incrementally for graph retrieval at search time
+        self.graph_store = GraphStore(graph_path) if is_graph else None
         if data_path:
             self.load_data()
 
@@ -84,31 +134,148 @@ class ImprovedMemoryADD:
             self.data = json.load(f)
         return self.data
 
-    def add_memory(self, user_id, message, metadata, retries=3):
+    def add_memory(self, user_id, message, metadata, retries=3, infer=True):
         """Add memory with retry logic"""
         for attempt in range(retries):
             try:
-                _ = self.memory.add(
+                result = self.memory.add(
                     message, 
                     user_id=user_id, 
-                    metadata=metadata
+                    metadata=metadata,
+                    infer=infer
                 )
-                return
+                break
             except Exception as e:
                 if attempt < retries - 1:
-                    time.sleep(1)
+                    time.sleep(backoff_delay(attempt))
                     continue
                 else:
                     raise e
+        
+        # Add the stored memories to the user's graph, then invalidate search-side snapshots
+        if self.graph_store is not None:
+            self.graph_store.record_add_result(user_id, result, metadata)
+        self.memory_versions.bump(user_id)
+        return result
 
-    def add_memories_for_speaker(self, speaker, messages, timestamp, desc):
-        """Add memories for a speaker with batching"""
-        for i in tqdm(range(0, len(messages), self.batch_size), desc=desc):
-            batch_messages = messages[i : i + self.batch_size]
-            self.add_memory(speaker, batch_messages, metadata={"timestamp": timestamp})
+    def add_session_facts(self, user_ids, chats, timestamp, retries=3):
+        """
+        Extract the facts of a batch of chat turns once and store them for the speakers they are about
+        
+        Args:
+            user_ids: {speaker name: user id} of the two speakers
+            chats: Chat turns of the batch
+            timestamp: Session timestamp
+        
+        Returns:
+            {user id: Memory.add result} of the speakers that had facts
+        """
+        speaker_a, speaker_b = user_ids.keys()
+        for attempt in range(retries):
+            try:
+                facts = self.fact_extractor.extract(speaker_a, speaker_b, chats)
+                break
+            except Exception as e:
+                if attempt < retries - 1:
+                    time.sleep(backoff_delay(attempt))
+                    continue
+                else:
+                    raise e
+        
+        # Facts are already extracted, so they are stored as-is (infer=False) without a second LLM pass;
+        # this also skips mem0's reconciliation with existing memories, so repeated facts are not merged
+        results = {}
+        for speaker, user_id in user_ids.items():
+            if facts[speaker]:
+                results[user_id] = self.add_memory(
+                    user_id, [{"role": "user", "content": fact} for fact in facts[speaker]],
+                    metadata={"timestamp": timestamp}, retries=retries, infer=False
+                )
+        return results
+
+    def add_speaker_batch(self, user_id, messages, metadata):
+        """add_memory for one speaker's batch, keyed by user id like add_session_facts"""
+        return {user_id: self.add_memory(user_id, messages, metadata)}
+
+    def begin_session(self, user_ids, session_key, content_hash, batches, scheduler, queue_key):
+        """
+        Check a session against the manifest before its batches are queued
+        
+        Args:
+            user_ids: Users the session's memories are written to
+            session_key: Session key of the conversation (e.g. "session_3")
+            content_hash: Hash of the session's turns and timestamp
+            batches: Number of batches the session is written in
+            scheduler: IngestionScheduler the session's batches are queued on
+            queue_key: Ordered queue the session's batches are submitted under
+        
+        Returns:
+            None if every user already has the current content of the session, otherwise a SessionIngest
+            recording the new write. Memories from the earlier ingest are removed by a call queued here on
+            queue_key, so it runs after the users' earlier sessions and before this session's batches.
+        """
+        entries = {user_id: self.manifest.get(user_id, session_key) for user_id in user_ids}
+        current = all(
+            self.manifest.is_current(user_id, session_key, content_hash, self.extraction_prompt_hash,
+                                     self.extraction_model)
+            for user_id in user_ids
+        )
+        with self._manifest_lock:
+            if current:
+                self.manifest_stats["unchanged"] += len(user_ids)
+                return None
+            for entry in entries.values():
+                self.manifest_stats["changed" if entry is not None else "new"] += 1
+        
+        session = SessionIngest(
+            self.manifest, list(user_ids), session_key, content_hash, self.extraction_prompt_hash,
+            self.extraction_model, batches,
+            stale_ids={user_id: entry["memory_ids"] for user_id, entry in entries.items() if entry is not None}
+        )
+        if session.stale_ids:
+            scheduler.submit(queue_key, session.remove_stale, self.remove_session_memories, messages=0)
+        return session
+
+    def remove_session_memories(self, user_id, memory_ids):
+        """
+        Delete the memories an earlier ingest of a session created for the user
+        
+        Returns:
+            Ids that could not be deleted
+        """
+        removed = 0
+        failed = []
+        for memory_id in memory_ids:
+            try:
+                # Already gone (e.g. deleted before an interrupted run could update the manifest)
+                if self.memory.get(memory_id) is not None:
+                    self.memory.delete(memory_id)
+            except Exception as e:
+                print(f"Error deleting memory {memory_id}: {e}")
+                failed.append(memory_id)
+                continue
+            if self.graph_store is not None:
+                self.graph_store.remove_memory(user_id, memory_id)
+            removed += 1
+        if removed:
+            self.memory_versions.bump(user_id)
+        with self._manifest_lock:
+            self.manifest_stats["removed_memories"] += removed
+        return failed
+
+    def process_conversation(self, item, idx, scheduler=None):
+        """
+        Process a single conversation
+        
+        Args:
+            item: Conversation record of the dataset
+            idx: Conversation index, part of the speakers' user ids
+            scheduler: IngestionScheduler to queue the adds on (None runs them here, waiting for completion)
+        """
+        own_scheduler = scheduler is None
+        if own_scheduler:
+            scheduler = IngestionScheduler(max_workers=2)
 
-    def process_conversation(self, item, idx):
-        """Process a single conversation"""
         conversation = item["conversation"]
         speaker_a = conversation["speaker_a"]
         speaker_b = conversation["speaker_b"]
@@ -116,8 +283,8 @@ class ImprovedMemoryADD:
         speaker_a_user_id = f"{speaker_a}_{idx}"
         speaker_b_user_id = f"{speaker_b}_{idx}"
 
-        # Note: Memory will overwrite/replace memories as needed
-        # No need to delete_all for local Memory class
+        # Memories are not cleared up front: with a manifest, only sessions whose content changed since
+        # the last run are replaced; without one, every session is added again
 
         for key in conversation.keys():
             if key in ["speaker_a", "speaker_b"] or "date" in key or "timestamp" in key:
@@ -139,30 +306,81 @@ class ImprovedMemoryADD:
                 else:
                     raise ValueError(f"Unknown speaker: {chat['speaker']}")
 
-            # Add memories for the two users on different threads
-            thread_a = threading.Thread(
-                target=self.add_memories_for_speaker,
-                args=(speaker_a_user_id, messages, timestamp, "Adding Memories for Speaker A"),
-            )
-            thread_b = threading.Thread(
-                target=self.add_memories_for_speaker,
-                args=(speaker_b_user_id, messages_reverse, timestamp, "Adding Memories for Speaker B"),
-            )
+            content_hash = session_content_hash(chats, timestamp) if self.manifest is not None else None
+            batch_count = (len(chats) + self.batch_size - 1) // self.batch_size
+
+            if self.ingestion_mode == "shared":
+                # Both speakers' facts come from one pass: the session is skipped only if it is current for
+                # both, and their writes share one ordered queue
+                queue_key = f"{speaker_a_user_id}|{speaker_b_user_id}"
+                session = None
+                if self.manifest is not None:
+                    session = self.begin_session(
+                        [speaker_a_user_id, speaker_b_user_id], key, content_hash, batch_count, scheduler, queue_key
+                    )
+                    if session is None:
+                        continue
+                write = session.run if session is not None else _call
+                for i in range(0, len(chats), self.batch_size):
+                    batch_chats = chats[i : i + self.batch_size]
+                    scheduler.submit(
+                        queue_key, write, self.add_session_facts,
+                        {speaker_a: speaker_a_user_id, speaker_b: speaker_b_user_id}, batch_chats, timestamp,
+                        messages=2 * len(batch_chats)  # Each turn is ingested for both speakers
+                    )
+                continue
 
-            thread_a.start()
-            thread_b.start()
-            thread_a.join()
-            thread_b.join()
+            # Each speaker's batches are applied in session order; the two speakers, and other
+            # conversations sharing the scheduler, proceed in parallel
+            for speaker_user_id, speaker_messages in (
+                (speaker_a_user_id, messages), (speaker_b_user_id, messages_reverse)
+            ):
+                session = None
+                if self.manifest is not None:
+                    session = self.begin_session(
+                        [speaker_user_id], key, content_hash, batch_count, scheduler, speaker_user_id
+                    )
+                    if session is None:
+                        continue
+                write = session.run if session is not None else _call
+                for i in range(0, len(speaker_messages), self.batch_size):
+                    batch_messages = speaker_messages[i : i + self.batch_size]
+                    scheduler.submit(
+                        speaker_user_id, write, self.add_speaker_batch, speaker_user_id, batch_messages,
+                        {"timestamp": timestamp}, messages=len(batch_messages)
+                    )
 
-        print("Messages added successfully")
+        if own_scheduler:
+            stats = scheduler.join()
+            print(format_ingestion_throughput(stats))
+            if stats["failed"]:
+                raise RuntimeError(f"{stats['failed']} memory adds failed; see the errors above")
+            print("Messages added successfully")
 
     def process_all_conversations(self, max_workers=10):
-        """Process all conversations in parallel"""
+        """
+        Process all conversations in parallel
+        
+        Args:
+            max_workers: Memory adds in flight across all users
+        
+        Returns:
+            Ingestion statistics (messages, adds, users, failed, elapsed, throughput in messages/sec)
+        
+        Raises:
+            RuntimeError: If any memory add failed, once every other add has finished
+        """
         if not self.data:
             raise ValueError("No data loaded. Please set data_path and call load_data() first.")
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = [executor.submit(self.process_conversation, item, idx) for idx, item in enumerate(self.data)]
-
-            for future in futures:
-                future.result()
+        scheduler = IngestionScheduler(max_workers=max_workers, desc="Adding memories")
+        for idx, item in enumerate(self.data):
+            self.process_conversation(item, idx, scheduler=scheduler)
+        stats = scheduler.join()
+        print(format_ingestion_throughput(stats))
+        print(format_limiter_stats(self.limiter.stats()))
+        if self.manifest is not None:
+            print(format_manifest_stats(self.manifest_stats))
+        if stats["failed"]:
+            raise RuntimeError(f"{stats['failed']} memory adds failed; see the errors above")
+        return stats
 
@@ -0,0 +1,320 @@
+"""
+Asyncio variant of the improved memory search pipeline
+Keeps a bounded number of questions in flight across the whole dataset so that
+one question's LLM stages overlap with other questions' retrieval
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tqdm import tqdm
+
+from src.improved_mem0.results_writer import compact_log
+from src.improved_mem0.scheduler import _finish_stats, _new_stats, format_throughput
+from src.improved_mem0.search import ImprovedMemorySearch, QueryPlan, TimedSearch
+
+
+class AsyncImprovedMemorySearch(ImprovedMemorySearch):
+    """Improved memory search with awaitable LLM / vector-store stages and a semaphore-bounded scheduler"""
+
+    def __init__(self, *args, max_in_flight=8, io_workers=32, **kwargs):
+        """
+        Initialize async search
+
+        Args:
+            max_in_flight: Maximum number of questions processed concurrently
+            io_workers: Threads backing the blocking LLM and vector-store clients
+        """
+        super().__init__(*args, **kwargs)
+        self.max_in_flight = max_in_flight
+        self.io_workers = io_workers
+
+    async def _agenerate(self, **kwargs):
+        """Awaitable wrapper around the configured LLM"""
+        return await asyncio.to_thread(self.llm.generate_response, **kwargs)
+
+    async def aexpand_query(self, query, max_expansions=None, max_retries=3):
+        """Async version of expand_query"""
+        max_expansions = self._resolve_max_expansions(query, max_expansions)
+        expansion_prompt = self._build_expansion_prompt(query, max_expansions)
+
+        for attempt in range(max_retries):
+            try:
+                response = await self._agenerate(
+                    messages=[{"role": "user", "content": expansion_prompt}],
+                    response_format={"type": "json_object"},
+                    temperature=0.3,
+                    **self._validated(lambda text: self._parse_expansion_response(text, query, max_expansions)),
+                )
+                return self._parse_expansion_response(response, query, max_expansions)
+            except Exception as e:
+                if attempt < max_retries - 1:
+                    await asyncio.sleep(0.5)
+                    continue
+                return [query]
+
+    async def abuild_query_plan(self, query):
+        """Async version of build_query_plan"""
+        top_k, max_expansions, complexity_info, temporal_info = self._plan_search(query)
+        expanded_queries = await self.aexpand_query(query, max_expansions=max_expansions)
+        plan = QueryPlan(query, top_k, complexity_info, temporal_info, expanded_queries)
+        plan.query_vectors = await asyncio.to_thread(self._embed_queries, expanded_queries)
+        return plan
+
+    async def _asearch_single_query(self, user_id, query, limit, max_retries=3, retry_delay=1, vector=None):
+        """Run one vector search with its own retry and timeout budget, timed like the sync pipeline"""
+        search = TimedSearch(self._search_single_query, user_id, query, limit, max_retries, retry_delay, vector)
+        task = asyncio.ensure_future(asyncio.to_thread(search))
+        if not self.search_timeout:
+            return await task
+        while True:
+            # The budget starts when a worker thread picks the search up, not while it is queued
+            done, _ = await asyncio.wait({task}, timeout=search.remaining(self.search_timeout))
+            if done:
+                return task.result()
+            if search.expired(self.search_timeout):
+                task.cancel()
+                print(f"Memory search timed out after {self.search_timeout}s, skipping query")
+                return []
+
+    async def _aretrieve(self, user_id, queries, limit, max_retries=3, retry_delay=1, vectors=None):
+        """Search all expanded queries concurrently and merge them in query order"""
+        vectors = vectors or [None] * len(queries)
+        results = await asyncio.gather(*[
+            self._asearch_single_query(user_id, query, limit, max_retries, retry_delay, vector)
+            for query, vector in zip(queries, vectors)
+        ])
+        all_memories = []
+        seen_memory_ids = set()
+        for memory_list in results:
+            for memory in memory_list:
+                if not isinstance(memory, dict):
+                    continue
+                mem_id = memory.get("id") or memory.get("memory_id") or str(hash(memory.get("memory", "")))
+                if mem_id not in seen_memory_ids:
+                    seen_memory_ids.add(mem_id)
+                    all_memories.append(memory)
+        return all_memories
+
+    async def _arerank_batch(self, query, memories):
+        """Async version of _rerank_batch"""
+        if not memories:
+            return memories
+
+        try:
+            response = await self._agenerate(
+                messages=[{"role": "user", "content": self._build_rerank_prompt(query, memories)}],
+                response_format={"type": "json_object"},
+                temperature=0.0,
+                **self._validated(self._parse_rerank_scores),
+            )
+            self._apply_rerank_response(response, memories)
+        except Exception as e:
+            print(f"Reranking failed: {e}, using original scores")
+            memories.sort(key=lambda x: x.get("score", 0.0), reverse=True)
+
+        return memories
+
+    async def _arequest_rerank_scores(self, query, group_memories):
+        """Async version of _request_rerank_scores"""
+        try:
+            response = await self._agenerate(
+                messages=[{"role": "user", "content": self._build_rerank_prompt(query, group_memories)}],
+                response_format={"type": "json_object"},
+                temperature=0.0,
+                **self._validated(self._parse_rerank_scores),
+            )
+            return self._parse_rerank_scores(response)
+        except Exception as e:
+            print(f"Reranking failed: {e}, using original scores")
+            return None
+
+    async def arerank_memories(self, query, memories, batch_size=None, stats=None):
+        """Async version of rerank_memories; batches / listwise requests are scored concurrently"""
+        if not memories:
+            return memories
+
+        if self.reranker is not None:
+            # Local model inference is CPU-bound; keep it off the event loop
+            self._count_rerank_calls(stats, 1)
+            return await asyncio.to_thread(self._rerank_with_reranker, query, memories)
+
+        if self.rerank_mode == "listwise":
+            groups, anchors = self._listwise_groups(query, memories)
+            group_scores = await asyncio.gather(*[
+                self._arequest_rerank_scores(query, [memories[i] for i in group]) for group in groups
+            ])
+            self._count_rerank_calls(stats, len(groups))
+            return self._apply_listwise_scores(memories, groups, anchors, group_scores)
+
+        batch_size = batch_size or self.batch_size
+        if len(memories) <= batch_size:
+            self._count_rerank_calls(stats, 1)
+            return await self._arerank_batch(query, memories)
+
+        batches = await asyncio.gather(*[
+            self._arerank_batch(query, memories[i:i + batch_size])
+            for i in range(0, len(memories), batch_size)
+        ])
+        self._count_rerank_calls(stats, len(batches))
+        reranked_memories = [memory for batch in batches for memory in batch]
+        reranked_memories.sort(key=lambda x: x.get("rerank_score", x.get("score", 0.0)), reverse=True)
+        return reranked_memories
+
+    async def _afinalize_search(self, user_id, plan, all_memories):
+        """Async version of _finalize_search"""
+        if self.dedup_mode == "semantic":
+            # Semantic dedup fetches or computes candidate embeddings; keep that off the event loop
+            all_memories = await asyncio.to_thread(self._prepare_candidates, all_memories, plan)
+        else:
+            all_memories = self._prepare_candidates(all_memories, plan)
+        rerank_start = time.time()
+        all_memories = await self.arerank_memories(plan.query, all_memories, stats=plan.rerank_stats)
+        plan.rerank_stats["time"] += time.time() - rerank_start
+        # Multi-hop reasoning fetches the user's memories from the vector store
+        return await asyncio.to_thread(self._complete_search, user_id, plan, all_memories)
+
+    async def asearch_memory_with_expansion(self, user_id, query, max_retries=3, retry_delay=1, plan=None):
+        """Async version of search_memory_with_expansion"""
+        start_time = time.time()
+        if plan is None:
+            plan = await self.abuild_query_plan(query)
+        all_memories = await self._aretrieve(
+            user_id, plan.expanded_queries, plan.top_k * 2, max_retries, retry_delay, vectors=plan.query_vectors
+        )
+        semantic_memories, graph_memories = await self._afinalize_search(user_id, plan, all_memories)
+        return semantic_memories, graph_memories, time.time() - start_time
+
+    async def aanswer_question(self, speaker_1_user_id, speaker_2_user_id, question, answer, category):
+        """Async version of answer_question; the query plan is shared and both speakers are searched concurrently"""
+        plan_start = time.time()
+        plan = await self.abuild_query_plan(question)
+        plan_time = time.time() - plan_start
+
+        (
+            (speaker_1_memories, speaker_1_graph_memories, speaker_1_memory_time),
+            (speaker_2_memories, speaker_2_graph_memories, speaker_2_memory_time),
+        ) = await asyncio.gather(
+            self.asearch_memory_with_expansion(speaker_1_user_id, question, plan=plan),
+            self.asearch_memory_with_expansion(speaker_2_user_id, question, plan=plan),
+        )
+        speaker_1_memory_time += plan_time
+        speaker_2_memory_time += plan_time
+
+        # Apply temporal attention
+        speaker_1_memories = self.apply_temporal_attention(speaker_1_memories, question, plan.temporal_info)
+        speaker_2_memories = self.apply_temporal_attention(speaker_2_memories, question, plan.temporal_info)
+
+        answer_prompt = self._render_answer_prompt(
+            speaker_1_user_id, speaker_2_user_id, question,
+            speaker_1_memories, speaker_2_memories,
+            speaker_1_graph_memories, speaker_2_graph_memories,
+        )
+
+        t1 = time.time()
+        response = await self._agenerate(
+            messages=[{"role": "system", "content": answer_prompt}],
+            temperature=0.0
+        )
+        response_time = time.time() - t1
+
+        return (
+            self._response_text(response),
+            speaker_1_memories,
+            speaker_2_memories,
+            speaker_1_memory_time,
+            speaker_2_memory_time,
+            speaker_1_graph_memories,
+            speaker_2_graph_memories,
+            response_time,
+            plan.rerank_stats,
+        )
+
+    async def aprocess_question(self, val, speaker_a_user_id, speaker_b_user_id):
+        """Async version of process_question"""
+        answer_output = await self.aanswer_question(
+            speaker_a_user_id, speaker_b_user_id,
+            val.get("question", ""), val.get("answer", ""), val.get("category", -1)
+        )
+        return self._build_result(val, answer_output)
+
+    async def aprocess_data_file(self, file_path, max_in_flight=None, question_timeout=None, resume=False):
+        """
+        Process all questions keeping at most max_in_flight questions running at any time
+
+        Args:
+            file_path: Path to the dataset
+            max_in_flight: Questions running concurrently (defaults to self.max_in_flight)
+            question_timeout: Per-question deadline in seconds, counted once the question starts
+            resume: Skip questions already answered under the same config in the checkpoint log
+
+        Returns:
+            Run statistics in the format of the threaded schedulers (mode "async")
+        """
+        all_questions = self._load_questions(file_path)
+        writer, pending_questions = self._start_results_log(all_questions, resume=resume)
+        semaphore = asyncio.Semaphore(max_in_flight or self.max_in_flight)
+        stats = _new_stats("async", len(pending_questions))
+        start_time = time.time()
+
+        # Blocking LLM / vector-store clients run on a pool sized for the in-flight stages
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="memory-io"))
+
+        async def run(item):
+            async with semaphore:
+                try:
+                    result = await asyncio.wait_for(
+                        self.aprocess_question(
+                            item["question_item"],
+                            item["speaker_a_user_id"],
+                            item["speaker_b_user_id"]
+                        ),
+                        timeout=question_timeout,
+                    )
+                    return item, result
+                except asyncio.TimeoutError:
+                    # Blocking calls already handed to threads finish in the background; the result is ignored
+                    print(f"Question exceeded {question_timeout}s deadline, skipping")
+                    stats["timed_out"] += 1
+                    return item, None
+                except Exception as e:
+                    print(f"Error processing question: {e}")
+                    stats["failed"] += 1
+                    return item, None
+
+        try:
+            tasks = [asyncio.create_task(run(item)) for item in pending_questions]
+            for completed, task in enumerate(
+                tqdm(asyncio.as_completed(tasks), total=len(tasks), desc="Processing questions"), 1
+            ):
+                item, result = await task
+                if result is not None:
+                    stats["completed"] += 1
+                    writer.write(self._log_record(item, result))
+                if completed % self.batch_size == 0:
+                    writer.checkpoint()
+        finally:
+            writer.close()
+
+        self.results = compact_log(self.checkpoint_path, self.output_path)
+        stats = _finish_stats(stats, start_time)
+        print(format_throughput(stats))
+        self._report_run_stats()
+        return stats
+
+    def process_data_file(self, file_path, max_workers=None, scheduler="queue", question_timeout=None, resume=False):
+        """
+        Run the async pipeline with the signature of ImprovedMemorySearch.process_data_file
+
+        max_workers maps to the number of questions in flight. The pipeline always streams questions
+        like the "queue" scheduler, so scheduler="batch" is rejected.
+
+        Returns:
+            Run statistics (throughput, failures, timeouts)
+        """
+        if scheduler != "queue":
+            raise ValueError(f"The async pipeline only supports the queue scheduler, not {scheduler!r}")
+        return asyncio.run(self.aprocess_data_file(
+            file_path, max_in_flight=max_workers, question_timeout=question_timeout, resume=resume
+        ))
@@ -0,0 +1,232 @@
+"""
+Content-addressed response caching
+A tiered cache (in-memory LRU in front of an optional SQLite file) and LLM / embedder wrappers
+that serve repeated prompts and texts from it
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+_MISSING = object()
+
+
+def make_cache_key(**parts) -> str:
+    """Stable content hash of the given key parts"""
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TieredCache:
+    """Thread-safe LRU cache with an optional persistent SQLite tier and TTL"""
+
+    def __init__(self, max_entries: int = 10000, db_path: Optional[str] = None, ttl: Optional[float] = None,
+                 namespace: str = "responses"):
+        """
+        Initialize cache
+
+        Args:
+            max_entries: Capacity of the in-memory LRU tier
+            db_path: SQLite file for the persistent tier (None keeps the cache in memory only)
+            ttl: Seconds after which an entry is treated as missing (None never expires)
+            namespace: Table name, so several caches can share one file
+        """
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.ttl = ttl
+        self.namespace = namespace
+        self._lru = OrderedDict()  # key -> (created_at, value)
+        self._lock = threading.Lock()
+        self._conn = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if db_path:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {namespace} "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl is not None and time.time() - created_at > self.ttl
+
+    def _remember(self, key: str, created_at: float, value: Any):
+        self._lru[key] = (created_at, value)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                created_at, value = entry
+                if not self._expired(created_at):
+                    self._lru.move_to_end(key)
+                    self.memory_hits += 1
+                    return value
+                del self._lru[key]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    f"SELECT value, created_at FROM {self.namespace} WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and not self._expired(row[1]):
+                    value = json.loads(row[0])
+                    self._remember(key, row[1], value)
+                    self.disk_hits += 1
+                    return value
+
+            self.misses += 1
+            return default
+
+    def set(self, key: str, value: Any):
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, created_at, value)
+            if self._conn is not None:
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO {self.namespace} (key, value, created_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), created_at),
+                )
+                self._conn.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._lru.pop(key, None)
+            if self._conn is not None:
+                self._conn.execute(f"DELETE FROM {self.namespace} WHERE key = ?", (key,))
+                self._conn.commit()
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit / miss counters"""
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._lru),
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class CachedLLM:
+    """Wraps a mem0 LLM so identical generate_response calls are served from a TieredCache"""
+
+    def __init__(self, llm, cache: TieredCache, model: Optional[str] = None):
+        """
+        Initialize wrapper
+
+        Args:
+            llm: Object with a generate_response(messages, response_format=None, **kwargs) method
+            cache: Response cache
+            model: Model name included in every cache key
+        """
+        self.llm = llm
+        self.cache = cache
+        self.model = model
+
+    def generate_response(self, messages, response_format=None, validate=None, **kwargs):
+        """
+        Cached generate_response
+
+        Args:
+            validate: Callable raising on a response text the caller cannot use (e.g. its JSON parser);
+                rejected responses are returned but never cached, so the caller's retry reaches the LLM.
+                Defaults to json.loads for JSON response formats.
+        """
+        # Tool calls return structured objects rather than text, so they bypass the cache
+        if kwargs.get("tools"):
+            return self.llm.generate_response(messages=messages, response_format=response_format, **kwargs)
+        if validate is None and (response_format or {}).get("type") == "json_object":
+            validate = json.loads
+
+        key = make_cache_key(
+            model=self.model,
+            messages=messages,
+            temperature=kwargs.get("temperature"),
+            response_format=response_format,
+        )
+        cached = self.cache.get(key, _MISSING)
+        if cached is not _MISSING:
+            if self._valid(cached, validate):
+                return cached
+            # Stored before the caller validated its responses
+            self.cache.delete(key)
+
+        response = self.llm.generate_response(messages=messages, response_format=response_format, **kwargs)
+        if isinstance(response, str):
+            text = response
+        elif getattr(response, "choices", None):
+            # Chat-completion objects are stored as their text, which every caller also accepts
+            text = response.choices[0].message.content
+        else:
+            return response
+        if self._valid(text, validate):
+            self.cache.set(key, text)
+        return response
+
+    @staticmethod
+    def _valid(text, validate) -> bool:
+        if validate is None:
+            return True
+        try:
+            validate(text)
+            return True
+        except Exception:
+            return False
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+
+class CachedEmbedder:
+    """Wraps a mem0 embedder so repeated embed calls for the same text are served from a TieredCache"""
+
+    def __init__(self, embedder, cache: TieredCache, model: Optional[str] = None):
+        """
+        Initialize wrapper
+
+        Args:
+            embedder: Object with an embed(text, memory_action=None) method
+            cache: Vector cache (vectors are kept as returned, so an in-memory cache needs no conversion)
+            model: Model name included in every cache key
+        """
+        self.embedder = embedder
+        self.cache = cache
+        self.model = model
+
+    def embed(self, text, memory_action=None):
+        key = make_cache_key(model=self.model, text=text, memory_action=memory_action)
+        cached = self.cache.get(key, _MISSING)
+        if cached is not _MISSING:
+            return cached
+
+        vector = self.embedder.embed(text, memory_action)
+        self.cache.set(key, vector if self.cache.db_path is None else [float(x) for x in vector])
+        return vector
+
+    def __getattr__(self, name):
+        return getattr(self.embedder, name)
@@ -0,0 +1,150 @@
+"""
+Batched query embedding for retrieval
+Embeds all expanded queries of a question in one encoder call (skipping texts already in the
+embedding cache) and formats raw vector-store hits the same way mem0's Memory.search does, so
+searches can reuse precomputed vectors
+"""
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+from src.improved_mem0.cache import TieredCache, make_cache_key
+
+# Payload keys mem0 keeps at the top level of a memory item; everything else becomes metadata
+_CORE_PAYLOAD_KEYS = {"data", "hash", "created_at", "updated_at", "id"}
+_PROMOTED_PAYLOAD_KEYS = ["user_id", "agent_id", "run_id", "actor_id", "role"]
+
+
+def normalize_query(text: str) -> str:
+    """Canonical form of a query for embedding and cache lookup (NFC, collapsed whitespace)"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class QueryEmbedder:
+    """Embeds lists of query strings with as few encoder calls as the mem0 embedder allows"""
+
+    def __init__(self, embedder, batch_size: int = 32, cache: Optional[TieredCache] = None):
+        """
+        Initialize query embedder
+
+        Args:
+            embedder: mem0 embedding model (memory.embedding_model)
+            batch_size: Encoder batch size for local sentence-transformers models
+            cache: Embedding cache keyed on (embedder model, normalized text); None disables caching
+        """
+        self.embedder = embedder
+        self.batch_size = batch_size
+        self.cache = cache
+        self.model_name = getattr(getattr(embedder, "config", None), "model", None) or type(embedder).__name__
+        self.encoder_calls = 0
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, encoding only those not already cached, in one batched call"""
+        if not texts:
+            return []
+
+        normalized = [normalize_query(text) for text in texts]
+        vectors = {}
+        if self.cache is not None:
+            for text in set(normalized):
+                vector = self.cache.get(make_cache_key(model=self.model_name, text=text))
+                if vector is not None:
+                    vectors[text] = vector
+
+        # Repeated texts within the batch are encoded once
+        missing = [text for text in dict.fromkeys(normalized) if text not in vectors]
+        if missing:
+            for text, vector in zip(missing, self._encode(missing)):
+                vectors[text] = vector
+                if self.cache is not None:
+                    self.cache.set(make_cache_key(model=self.model_name, text=text), vector)
+
+        return [vectors[text] for text in normalized]
+
+    def stats(self) -> Dict[str, Any]:
+        """Encoder call count and cache hit rate"""
+        stats = {"encoder_calls": self.encoder_calls}
+        if self.cache is not None:
+            stats.update(self.cache.stats())
+        return stats
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in one batched call where the backend supports it"""
+
+        # HuggingFace embedder: a local sentence-transformers model
+        model = getattr(self.embedder, "model", None)
+        if model is not None and hasattr(model, "encode"):
+            self.encoder_calls += 1
+            vectors = model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True)
+            return [vector.tolist() for vector in vectors]
+
+        # OpenAI embedder: the embeddings endpoint accepts a list of inputs
+        if type(self.embedder).__name__ == "OpenAIEmbedding":
+            config = self.embedder.config
+            self.encoder_calls += 1
+            response = self.embedder.client.embeddings.create(
+                input=[text.replace("\n", " ") for text in texts],
+                model=config.model,
+                dimensions=config.embedding_dims,
+            )
+            return [item.embedding for item in response.data]
+
+        # Any other backend: one call per text, same as Memory.search
+        self.encoder_calls += len(texts)
+        return [self.embedder.embed(text, "search") for text in texts]
+
+
+def fetch_memory_embeddings(vector_store, memory_ids: List[str]) -> Dict[str, List[float]]:
+    """
+    Stored embeddings of the given memories, for vector stores that can return them
+
+    Returns:
+        Dict of memory id to embedding; ids the store could not provide are missing
+    """
+    if not memory_ids:
+        return {}
+
+    # Chroma: the collection returns stored embeddings by id
+    collection = getattr(vector_store, "collection", None)
+    if collection is not None and hasattr(collection, "get"):
+        try:
+            stored = collection.get(ids=list(memory_ids), include=["embeddings"])
+            embeddings = stored.get("embeddings")
+            if embeddings is not None:
+                return {memory_id: list(vector) for memory_id, vector in zip(stored["ids"], embeddings)}
+        except Exception as e:
+            print(f"Fetching stored embeddings failed: {e}, re-embedding memories")
+        return {}
+
+    # Qdrant: points are retrieved with their vectors
+    client = getattr(vector_store, "client", None)
+    collection_name = getattr(vector_store, "collection_name", None)
+    if client is not None and collection_name and hasattr(client, "retrieve"):
+        try:
+            points = client.retrieve(collection_name=collection_name, ids=list(memory_ids), with_vectors=True)
+            return {str(point.id): point.vector for point in points if point.vector is not None}
+        except Exception as e:
+            print(f"Fetching stored embeddings failed: {e}, re-embedding memories")
+    return {}
+
+
+def format_vector_hit(hit) -> Dict[str, Any]:
+    """Convert a raw vector-store hit into the memory dict format returned by Memory.search"""
+    payload = getattr(hit, "payload", None) or {}
+    item = {
+        "id": hit.id,
+        "memory": payload.get("data", ""),
+        "hash": payload.get("hash"),
+        "created_at": payload.get("created_at"),
+        "updated_at": payload.get("updated_at"),
+        "score": hit.score,
+    }
+    for key in _PROMOTED_PAYLOAD_KEYS:
+        if key in payload:
+            item[key] = payload[key]
+    metadata = {
+        key: value for key, value in payload.items()
+        if key not in _CORE_PAYLOAD_KEYS and key not in _PROMOTED_PAYLOAD_KEYS
+    }
+    if metadata:
+        item["metadata"] = metadata
+    return item
@@ -0,0 +1,104 @@
+"""
+Shared per-session fact extraction
+In per-speaker ingestion every session batch goes through Memory.add twice, once from each speaker's
+point of view, so the LLM reads the same turns twice. The shared extractor reads a batch once and
+returns facts attributed to the speaker(s) they are about, which are then stored for those speakers
+without a second extraction pass.
+
+The facts are stored as-is, without mem0's ADD/UPDATE/DELETE reconciliation against the speaker's
+existing memories, so a fact repeated or contradicted in a later session is stored again rather
+than merged or replaced. Shared mode trades those update semantics for throughput.
+"""
+import json
+from typing import Any, Dict, List, Sequence
+
+_SHARED_EXTRACTION_PROMPT = """{instructions}
+
+The conversation excerpt below is between {speaker_a} and {speaker_b}. Extract memories for both
+people, following the guidelines above with each person's own messages taken as that person's user
+messages: a memory of {speaker_a} comes only from what {speaker_a} says, and a memory of
+{speaker_b} only from what {speaker_b} says, never from the other person's messages. Attribute a
+memory to both only if each of them says it in their own messages.
+
+Conversation:
+{conversation}
+
+Return JSON of the form:
+{{"facts": [{{"speaker": "<{speaker_a}, {speaker_b} or both>", "fact": "<memory>"}}]}}
+Return {{"facts": []}} if there is nothing worth remembering."""
+
+
+def _response_text(response: Any) -> str:
+    """Text of a generate_response result (plain string or chat-completion object)"""
+    if isinstance(response, str):
+        return response
+    if getattr(response, "choices", None):
+        return response.choices[0].message.content
+    return str(response)
+
+
+def _strip_code_fence(text: str) -> str:
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rsplit("```", 1)[0]
+    return text.strip()
+
+
+class SessionFactExtractor:
+    """One LLM pass per conversation batch, producing facts attributed to the speakers"""
+
+    def __init__(self, llm, instructions: str):
+        """
+        Initialize extractor
+
+        Args:
+            llm: mem0 LLM (generate_response(messages, response_format=None, **kwargs))
+            instructions: Memory-writing guidelines shared with per-speaker extraction
+        """
+        self.llm = llm
+        self.instructions = instructions
+
+    def build_prompt(self, speaker_a: str, speaker_b: str, chats: Sequence[Dict[str, Any]]) -> str:
+        conversation = "\n".join(f"{chat['speaker']}: {chat['text']}" for chat in chats)
+        return _SHARED_EXTRACTION_PROMPT.format(
+            instructions=self.instructions.strip(),
+            speaker_a=speaker_a,
+            speaker_b=speaker_b,
+            conversation=conversation,
+        )
+
+    def extract(self, speaker_a: str, speaker_b: str, chats: Sequence[Dict[str, Any]]) -> Dict[str, List[str]]:
+        """
+        Extract the facts of a batch of chat turns
+
+        Args:
+            speaker_a: Name of the first speaker
+            speaker_b: Name of the second speaker
+            chats: Turns as {"speaker", "text"} dicts, in conversation order
+
+        Returns:
+            {speaker name: [facts]} for both speakers; facts attributed to both appear in both lists
+        """
+        response = self.llm.generate_response(
+            messages=[{"role": "user", "content": self.build_prompt(speaker_a, speaker_b, chats)}],
+            response_format={"type": "json_object"},
+        )
+        return self.parse_facts(response, speaker_a, speaker_b)
+
+    @staticmethod
+    def parse_facts(response: Any, speaker_a: str, speaker_b: str) -> Dict[str, List[str]]:
+        """Route the facts of an extraction response to speakers, skipping malformed or unattributed entries"""
+        facts = {speaker_a: [], speaker_b: []}
+        speakers = {speaker_a.lower(): [speaker_a], speaker_b.lower(): [speaker_b], "both": [speaker_a, speaker_b]}
+        for entry in json.loads(_strip_code_fence(_response_text(response))).get("facts", []):
+            if not isinstance(entry, dict):
+                continue
+            fact = str(entry.get("fact") or "").strip()
+            targets = speakers.get(str(entry.get("speaker") or "").strip().lower())
+            if not fact or not targets:
+                continue
+            for speaker in targets:
+                if fact not in facts[speaker]:
+                    facts[speaker].append(fact)
+        return facts
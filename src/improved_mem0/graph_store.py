@@ -0,0 +1,263 @@
+"""
+Persistent memory graph store
+Entities, relationship edges and memory-entity mappings of each user's MemoryGraph, kept in an
+indexed SQLite file and updated incrementally as memories are added, updated or deleted
+"""
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src.improved_mem0.memory_graph import MemoryGraph
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS memories (
+        user_id TEXT NOT NULL,
+        memory_id TEXT NOT NULL,
+        memory TEXT NOT NULL,
+        timestamp TEXT,
+        PRIMARY KEY (user_id, memory_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS entities (
+        user_id TEXT NOT NULL,
+        entity TEXT NOT NULL,
+        first_seen TEXT,
+        memory_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, entity)
+    )""",
+    """CREATE TABLE IF NOT EXISTS edges (
+        user_id TEXT NOT NULL,
+        src TEXT NOT NULL,
+        dst TEXT NOT NULL,
+        rel_type TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        strength REAL NOT NULL,
+        forward_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, src, dst, rel_type)
+    )""",
+    """CREATE TABLE IF NOT EXISTS memory_entities (
+        user_id TEXT NOT NULL,
+        memory_id TEXT NOT NULL,
+        entity TEXT NOT NULL,
+        PRIMARY KEY (user_id, memory_id, entity)
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_memory_entities_entity ON memory_entities (user_id, entity)",
+]
+
+
+class GraphStore:
+    """SQLite-backed per-user memory graphs with adjacency tables"""
+
+    def __init__(self, db_path: str = "memory_graph.db"):
+        """
+        Open (or create) a graph store
+
+        Args:
+            db_path: SQLite file holding the graphs of all users (":memory:" keeps them in memory only)
+        """
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        self._conn.commit()
+        self._lock = threading.Lock()
+        # Entity / relationship extraction rules are shared with the in-memory graph
+        self._extractor = MemoryGraph()
+        self._migrate_edge_directions()
+
+    def _migrate_edge_directions(self):
+        """Rebuild the edges of stores written before edges recorded their stated direction"""
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(edges)")]
+        if "forward_count" in columns:
+            return
+        with self._conn:
+            self._conn.execute("ALTER TABLE edges ADD COLUMN forward_count INTEGER NOT NULL DEFAULT 0")
+            self._conn.execute("DELETE FROM edges")
+            for user_id, memory_text in self._conn.execute("SELECT user_id, memory FROM memories").fetchall():
+                entities = self._extractor.extract_entities(memory_text)
+                for entity1, entity2, rel_type in self._extractor.extract_relationships(memory_text, entities):
+                    self._add_edge(user_id, entity1, entity2, rel_type, 1, 1)
+                    self._add_edge(user_id, entity2, entity1, rel_type, 1, 0)
+
+    def add_memory(self, user_id: str, memory_id: str, memory_text: str, metadata: Optional[Dict] = None):
+        """Add a memory's entities and relationships; re-adding an id replaces its earlier contribution"""
+        timestamp = metadata.get("timestamp", "") if metadata else ""
+        entities = self._extractor.extract_entities(memory_text)
+        relationships = self._extractor.extract_relationships(memory_text, entities)
+
+        with self._lock, self._conn:
+            self._remove_memory(user_id, memory_id)
+            self._conn.execute(
+                "INSERT INTO memories (user_id, memory_id, memory, timestamp) VALUES (?, ?, ?, ?)",
+                (user_id, memory_id, memory_text, timestamp),
+            )
+            for entity in entities:
+                self._conn.execute(
+                    "INSERT INTO memory_entities (user_id, memory_id, entity) VALUES (?, ?, ?)",
+                    (user_id, memory_id, entity),
+                )
+                self._upsert_entity(user_id, entity, timestamp, 1)
+            for entity1, entity2, rel_type in relationships:
+                self._upsert_entity(user_id, entity1, timestamp, 0)
+                self._upsert_entity(user_id, entity2, timestamp, 0)
+                # Bidirectional, like MemoryGraph.add_memory; only entity1 -> entity2 is stated
+                self._add_edge(user_id, entity1, entity2, rel_type, 1, 1)
+                self._add_edge(user_id, entity2, entity1, rel_type, 1, 0)
+
+    def record_add_result(self, user_id: str, result: Any, metadata: Optional[Dict] = None):
+        """
+        Apply the memory events of a Memory.add result to the user's graph
+
+        Handles both {"results": [...]} and bare-list results; ADD / UPDATE events (re)index the
+        memory text, DELETE events remove it.
+        """
+        events = result.get("results", []) if isinstance(result, dict) else result
+        for event in events or []:
+            if not isinstance(event, dict) or not event.get("id"):
+                continue
+            kind = event.get("event", "ADD")
+            if kind in ("ADD", "UPDATE") and event.get("memory"):
+                self.add_memory(user_id, event["id"], event["memory"], metadata)
+            elif kind == "DELETE":
+                self.remove_memory(user_id, event["id"])
+
+    def remove_memory(self, user_id: str, memory_id: str):
+        """Remove a memory's contribution (entity counts, mappings and edges) from the graph"""
+        with self._lock, self._conn:
+            self._remove_memory(user_id, memory_id)
+
+    def _remove_memory(self, user_id: str, memory_id: str):
+        row = self._conn.execute(
+            "SELECT memory FROM memories WHERE user_id = ? AND memory_id = ?", (user_id, memory_id)
+        ).fetchone()
+        if row is None:
+            return
+        entities = [
+            entity for (entity,) in self._conn.execute(
+                "SELECT entity FROM memory_entities WHERE user_id = ? AND memory_id = ?", (user_id, memory_id)
+            )
+        ]
+        for entity in entities:
+            self._conn.execute(
+                "UPDATE entities SET memory_count = memory_count - 1 WHERE user_id = ? AND entity = ?",
+                (user_id, entity),
+            )
+            self._conn.execute(
+                "DELETE FROM entities WHERE user_id = ? AND entity = ? AND memory_count <= 0", (user_id, entity)
+            )
+        for entity1, entity2, rel_type in self._extractor.extract_relationships(row[0], set(entities)):
+            self._add_edge(user_id, entity1, entity2, rel_type, -1, -1)
+            self._add_edge(user_id, entity2, entity1, rel_type, -1, 0)
+        self._conn.execute(
+            "DELETE FROM memory_entities WHERE user_id = ? AND memory_id = ?", (user_id, memory_id)
+        )
+        self._conn.execute("DELETE FROM memories WHERE user_id = ? AND memory_id = ?", (user_id, memory_id))
+
+    def _upsert_entity(self, user_id: str, entity: str, first_seen: str, memory_count: int):
+        self._conn.execute(
+            "INSERT INTO entities (user_id, entity, first_seen, memory_count) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(user_id, entity) DO UPDATE SET memory_count = memory_count + excluded.memory_count",
+            (user_id, entity, first_seen, memory_count),
+        )
+
+    def _add_edge(self, user_id: str, src: str, dst: str, rel_type: str, count: int, forward: int):
+        """
+        Accumulate (or with a negative count, retract) mentions of an edge; each mention has strength 1.0
+
+        forward of the mentions state "src rel_type dst"; the others are the reverse edge of "dst rel_type src".
+        """
+        self._conn.execute(
+            "INSERT INTO edges (user_id, src, dst, rel_type, count, strength, forward_count) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(user_id, src, dst, rel_type) DO UPDATE SET "
+            "count = count + excluded.count, strength = strength + excluded.strength, "
+            "forward_count = forward_count + excluded.forward_count",
+            (user_id, src, dst, rel_type, count, float(count), forward),
+        )
+        if count < 0:
+            self._conn.execute(
+                "DELETE FROM edges WHERE user_id = ? AND src = ? AND dst = ? AND rel_type = ? AND count <= 0",
+                (user_id, src, dst, rel_type),
+            )
+
+    def iter_neighbors(self, user_id: str, entity: str) -> Iterator[Tuple[str, str, int, float]]:
+        """(neighbor, rel_type, count, strength) of an entity's edges, strongest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT dst, rel_type, count, strength FROM edges WHERE user_id = ? AND src = ? "
+                "ORDER BY strength DESC, dst",
+                (user_id, entity),
+            ).fetchall()
+        return iter(rows)
+
+    def entity_memories(self, user_id: str, entity: str) -> List[str]:
+        """Ids of the user's memories mentioning an entity"""
+        with self._lock:
+            return [
+                memory_id for (memory_id,) in self._conn.execute(
+                    "SELECT memory_id FROM memory_entities WHERE user_id = ? AND entity = ?", (user_id, entity)
+                )
+            ]
+
+    def get_memories(self, user_id: str, memory_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Stored text and timestamp of the given memories"""
+        memories = {}
+        with self._lock:
+            for memory_id in memory_ids:
+                row = self._conn.execute(
+                    "SELECT memory, timestamp FROM memories WHERE user_id = ? AND memory_id = ?",
+                    (user_id, memory_id),
+                ).fetchone()
+                if row is not None:
+                    memories[memory_id] = {"id": memory_id, "memory": row[0], "timestamp": row[1] or ""}
+        return memories
+
+    def load_graph(self, user_id: str) -> MemoryGraph:
+        """Build the user's in-memory MemoryGraph from the store"""
+        graph = MemoryGraph()
+        with self._lock:
+            for entity, first_seen, memory_count in self._conn.execute(
+                "SELECT entity, first_seen, memory_count FROM entities WHERE user_id = ?", (user_id,)
+            ):
+                graph.entities[entity] = {
+                    "id": entity,
+                    "name": entity,
+                    "first_seen": first_seen or "",
+                    "memory_count": memory_count,
+                }
+            # Both directions are stored as rows
+            for src, dst, rel_type, count, strength, forward in self._conn.execute(
+                "SELECT src, dst, rel_type, count, strength, forward_count FROM edges WHERE user_id = ?", (user_id,)
+            ):
+                graph.add_edge(src, dst, rel_type, count, strength, forward)
+            for memory_id, entity in self._conn.execute(
+                "SELECT memory_id, entity FROM memory_entities WHERE user_id = ?", (user_id,)
+            ):
+                graph.memory_entities[memory_id].add(entity)
+                graph.entity_memories[entity].add(memory_id)
+        return graph
+
+    def get_graph_stats(self, user_id: str) -> Dict[str, Any]:
+        """Entity, edge and memory counts of a user's graph"""
+        with self._lock:
+            count = lambda table: self._conn.execute(
+                f"SELECT COUNT(*) FROM {table} WHERE user_id = ?", (user_id,)
+            ).fetchone()[0]
+            mentions = self._conn.execute(
+                "SELECT COALESCE(SUM(count), 0) FROM edges WHERE user_id = ?", (user_id,)
+            ).fetchone()[0]
+            return {
+                "num_entities": count("entities"),
+                "num_relationships": count("edges") // 2,  # Divide by 2 for bidirectional
+                "num_relationship_mentions": mentions // 2,
+                "num_memories": count("memories"),
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,119 @@
+"""
+Graph traversal engine for memory graphs
+Breadth-first expansion and bidirectional shortest-path search over any graph exposed as a
+neighbors(node) function yielding (neighbor, rel_type, strength), strongest edges first. Queues
+are deques, paths are rebuilt from parent pointers, and hub nodes can be capped to their strongest
+edges so depth-bounded traversals do not flood the whole graph.
+"""
+import time
+from collections import deque
+from itertools import islice
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+Neighbors = Callable[[Hashable], Iterable[Tuple[Hashable, str, float]]]
+
+
+def breadth_first(neighbors: Neighbors, sources: Iterable[Hashable], max_depth: int,
+                  fanout: Optional[int] = None, max_nodes: Optional[int] = None,
+                  deadline: Optional[float] = None) -> Dict[Hashable, Tuple[int, Optional[Hashable]]]:
+    """
+    Nodes within max_depth hops of the sources
+
+    Args:
+        neighbors: Adjacency function, strongest edges first
+        sources: Start nodes (depth 0)
+        max_depth: Maximum hops from the nearest source
+        fanout: Follow at most this many (strongest) edges per node (None follows all)
+        max_nodes: Stop once this many nodes have been reached
+        deadline: time.time() value after which expansion stops
+
+    Returns:
+        Dict of node to (depth, parent); sources have parent None
+    """
+    reached = {}
+    queue = deque()
+    for source in sources:
+        if source not in reached:
+            reached[source] = (0, None)
+            queue.append(source)
+
+    while queue:
+        if deadline is not None and time.time() > deadline:
+            break
+        node = queue.popleft()
+        depth = reached[node][0]
+        if depth >= max_depth:
+            continue
+        for neighbor, _, _ in islice(neighbors(node), fanout):
+            if neighbor in reached:
+                continue
+            reached[neighbor] = (depth + 1, node)
+            if max_nodes is not None and len(reached) >= max_nodes:
+                return reached
+            queue.append(neighbor)
+    return reached
+
+
+def reconstruct_path(parents: Dict[Hashable, Optional[Hashable]], node: Hashable) -> List[Hashable]:
+    """Path from the root of a parent-pointer tree to node"""
+    path = []
+    while node is not None:
+        path.append(node)
+        node = parents[node]
+    path.reverse()
+    return path
+
+
+def bidirectional_path(neighbors: Neighbors, start: Hashable, goal: Hashable, max_edges: int,
+                       fanout: Optional[int] = None) -> Optional[List[Hashable]]:
+    """
+    Shortest path between two nodes of an undirected graph, searching from both ends
+
+    Each round expands one full level of the smaller frontier, so the work is bounded by the
+    neighbourhoods of both ends at about half the path length instead of one end at the full length.
+
+    Args:
+        neighbors: Adjacency function (edges must be symmetric), strongest edges first
+        start: First node of the path
+        goal: Last node of the path
+        max_edges: Longest path (in edges) to look for
+        fanout: Follow at most this many (strongest) edges per node (None follows all)
+
+    Returns:
+        List of nodes from start to goal, or None if there is no path within max_edges
+    """
+    if start == goal:
+        return [start]
+
+    parents = ({start: None}, {goal: None})
+    depths = ({start: 0}, {goal: 0})
+    frontiers = ([start], [goal])
+    level = [0, 0]
+
+    while frontiers[0] and frontiers[1] and level[0] + level[1] < max_edges:
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        other = 1 - side
+        best = None
+        next_frontier = []
+        for node in frontiers[side]:
+            for neighbor, _, _ in islice(neighbors(node), fanout):
+                if neighbor in parents[side]:
+                    continue
+                parents[side][neighbor] = node
+                depths[side][neighbor] = level[side] + 1
+                next_frontier.append(neighbor)
+                if neighbor in depths[other]:
+                    length = level[side] + 1 + depths[other][neighbor]
+                    if best is None or length < best[0]:
+                        best = (length, neighbor)
+        level[side] += 1
+        frontiers = (next_frontier, frontiers[1]) if side == 0 else (frontiers[0], next_frontier)
+
+        if best is not None:
+            length, meeting = best
+            if length > max_edges:
+                return None
+            forward = reconstruct_path(parents[0], meeting)
+            backward = reconstruct_path(parents[1], meeting)
+            return forward + backward[-2::-1]
+    return None
@@ -0,0 +1,125 @@
+"""
+Memory ingestion scheduler
+Every user id gets an ordered queue of memory adds, so a user's facts are applied in the order they
+were submitted (session by session), while different users and conversations share one bounded
+worker pool instead of waiting on each other at session boundaries
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from tqdm import tqdm
+
+# per_speaker: full Memory.add extraction for each speaker; shared: one extraction pass per session batch,
+# stored without mem0's ADD/UPDATE/DELETE reconciliation (faster, but repeated facts are not merged)
+INGESTION_MODES = ("per_speaker", "shared")
+
+
+def format_ingestion_throughput(stats: Dict[str, Any]) -> str:
+    """One-line throughput summary for an ingestion run"""
+    return (
+        f"[ingest] {stats['messages']} messages ({stats['adds']} adds, {stats['users']} users) in "
+        f"{stats['elapsed']:.1f}s ({stats['throughput']:.2f} msg/s, failed={stats['failed']})"
+    )
+
+
+class IngestionScheduler:
+    """Per-user ordered queues drained by a bounded global worker pool"""
+
+    def __init__(self, max_workers: int = 10, desc: Optional[str] = None):
+        """
+        Initialize scheduler
+
+        Args:
+            max_workers: Number of worker threads (= adds in flight across all users)
+            desc: Progress bar label (None disables the bar)
+        """
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest-worker")
+        self._queues = {}  # user_id -> deque of (fn, args, messages) not yet started
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0
+        self._users = set()
+        self._progress = tqdm(total=0, desc=desc, unit="add") if desc else None
+        self._start_time = time.time()
+        self.stats = {"users": 0, "adds": 0, "messages": 0, "failed": 0, "elapsed": 0.0, "throughput": 0.0}
+
+    def submit(self, user_id: str, fn: Callable[..., Any], *args, messages: int = 1):
+        """
+        Queue fn(*args) behind the user's earlier submissions
+
+        Args:
+            user_id: Queue the call is ordered in
+            fn: Memory add to run
+            messages: Number of messages the call ingests, for throughput
+        """
+        with self._lock:
+            self._pending += 1
+            self._users.add(user_id)
+            if self._progress is not None:
+                self._progress.total += 1
+                self._progress.refresh()
+            queue = self._queues.get(user_id)
+            if queue is not None:
+                # A worker is already draining this user; it picks the call up in order
+                queue.append((fn, args, messages))
+                return
+            self._queues[user_id] = deque([(fn, args, messages)])
+            self._executor.submit(self._run_next, user_id)
+
+    def _run_next(self, user_id: str):
+        """Run the user's oldest queued call, then requeue the user behind the other users"""
+        with self._lock:
+            fn, args, messages = self._queues[user_id][0]
+
+        failed = False
+        try:
+            fn(*args)
+        except Exception as e:
+            print(f"Error adding memories for {user_id}: {e}")
+            failed = True
+
+        with self._lock:
+            queue = self._queues[user_id]
+            queue.popleft()
+            if failed:
+                self.stats["failed"] += 1
+            else:
+                self.stats["adds"] += 1
+                self.stats["messages"] += messages
+            if self._progress is not None:
+                self._progress.update(1)
+
+            if queue:
+                # Back of the pool's queue, so users take turns on the workers
+                self._executor.submit(self._run_next, user_id)
+            else:
+                del self._queues[user_id]
+            self._pending -= 1
+            if self._pending == 0:
+                self._idle.notify_all()
+
+    def join(self) -> Dict[str, Any]:
+        """
+        Wait for every submitted call and shut the pool down
+
+        Returns:
+            Run statistics, with throughput in messages per second; failed counts calls that raised,
+            which were printed and did not stop the run, so callers should fail the run on it
+        """
+        with self._idle:
+            while self._pending:
+                self._idle.wait()
+        self._executor.shutdown(wait=True)
+        if self._progress is not None:
+            self._progress.close()
+
+        self.stats["users"] = len(self._users)
+        self.stats["elapsed"] = time.time() - self._start_time
+        self.stats["throughput"] = (
+            self.stats["messages"] / self.stats["elapsed"] if self.stats["elapsed"] > 0 else 0.0
+        )
+        return self.stats
@@ -0,0 +1,139 @@
+"""
+Shared concurrency limits for memory backends
+One limiter bounds how many LLM, embedder and vector-store calls run at once across every
+ingestion worker, queues the rest, and records queue depth and wait time per resource. Retries back
+off exponentially with jitter so failures under load do not come back as synchronized storms.
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict
+
+# Memory attribute holding the component of each resource
+_MEMORY_ATTRIBUTES = {"llm": "llm", "embedder": "embedding_model", "vector_store": "vector_store"}
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    """Seconds to wait before retry number attempt + 1: full jitter over an exponentially growing window"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class _ResourceLimit:
+    """Semaphore plus queue metrics for one resource"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.semaphore = threading.BoundedSemaphore(limit)
+        self.in_flight = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.calls = 0
+        self.wait_time = 0.0
+
+
+class ConcurrencyLimiter:
+    """Per-resource concurrency limits shared by all threads using the wrapped components"""
+
+    def __init__(self, llm: int = 4, embedder: int = 8, vector_store: int = 8):
+        """
+        Initialize limiter
+
+        Args:
+            llm: Concurrent LLM calls
+            embedder: Concurrent embedding calls
+            vector_store: Concurrent vector-store operations
+        """
+        self._limits = {
+            "llm": _ResourceLimit(llm),
+            "embedder": _ResourceLimit(embedder),
+            "vector_store": _ResourceLimit(vector_store),
+        }
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, resource: str):
+        """Hold one of the resource's slots, queueing until one is free"""
+        limit = self._limits[resource]
+        with self._lock:
+            limit.waiting += 1
+            limit.max_waiting = max(limit.max_waiting, limit.waiting)
+        start = time.time()
+        limit.semaphore.acquire()
+        waited = time.time() - start
+        with self._lock:
+            limit.waiting -= 1
+            limit.in_flight += 1
+            limit.calls += 1
+            limit.wait_time += waited
+        try:
+            yield
+        finally:
+            with self._lock:
+                limit.in_flight -= 1
+            limit.semaphore.release()
+
+    def wrap(self, component, resource: str):
+        """Proxy of component whose public method calls each take a slot of the resource"""
+        return LimitedComponent(component, self, resource)
+
+    def wrap_memory(self, memory):
+        """Route a mem0 Memory's LLM, embedder and vector-store calls through the limiter"""
+        for resource, attribute in _MEMORY_ATTRIBUTES.items():
+            component = getattr(memory, attribute, None)
+            if component is not None and not isinstance(component, LimitedComponent):
+                setattr(memory, attribute, self.wrap(component, resource))
+        return memory
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per resource: limit, calls, current in-flight / waiting counts, peak queue depth and wait time"""
+        with self._lock:
+            return {
+                resource: {
+                    "limit": limit.limit,
+                    "calls": limit.calls,
+                    "in_flight": limit.in_flight,
+                    "waiting": limit.waiting,
+                    "max_waiting": limit.max_waiting,
+                    "wait_time": limit.wait_time,
+                    "avg_wait": limit.wait_time / limit.calls if limit.calls else 0.0,
+                }
+                for resource, limit in self._limits.items()
+            }
+
+
+def format_limiter_stats(stats: Dict[str, Dict[str, Any]]) -> str:
+    """One line per resource summarizing a limiter's queueing"""
+    return "\n".join(
+        f"[limits] {resource}: {s['calls']} calls, limit {s['limit']}, peak queue {s['max_waiting']}, "
+        f"avg wait {s['avg_wait'] * 1000:.1f} ms"
+        for resource, s in stats.items()
+    )
+
+
+class LimitedComponent:
+    """Wraps an LLM, embedder or vector store so its method calls run under a ConcurrencyLimiter slot"""
+
+    def __init__(self, component, limiter: ConcurrencyLimiter, resource: str):
+        """
+        Initialize wrapper
+
+        Args:
+            component: Wrapped mem0 component
+            limiter: Shared limiter
+            resource: Which of the limiter's resources the calls count against
+        """
+        self.component = component
+        self.limiter = limiter
+        self.resource = resource
+
+    def __getattr__(self, name):
+        attribute = getattr(self.component, name)
+        if name.startswith("_") or not callable(attribute):
+            return attribute
+
+        def limited(*args, **kwargs):
+            with self.limiter.slot(self.resource):
+                return attribute(*args, **kwargs)
+
+        return limited
@@ -0,0 +1,199 @@
+"""
+Ingestion manifest
+Records, per user and session, which content was ingested with which extraction prompt and model and
+the memory ids that produced, so a re-run of ingestion can skip unchanged sessions and replace
+changed ones instead of re-adding everything on top of the existing memories
+
+Only memories a session created are tracked. UPDATE and DELETE events it applied to memories of
+other sessions are not, so replacing a session does not undo them; and removing a changed session's
+memories also drops what later sessions merged into them, unless those sessions are re-ingested too.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from src.improved_mem0.cache import make_cache_key
+
+
+class IngestionManifest:
+    """SQLite record of ingested sessions, keyed by (user_id, session_key)"""
+
+    def __init__(self, db_path: str = "ingestion_manifest.db"):
+        """
+        Open (or create) a manifest
+
+        Args:
+            db_path: SQLite file for the manifest
+        """
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS ingested_sessions (
+                user_id TEXT NOT NULL,
+                session_key TEXT NOT NULL,
+                content_hash TEXT,
+                prompt_hash TEXT NOT NULL,
+                model TEXT,
+                memory_ids TEXT NOT NULL,
+                ingested_at REAL NOT NULL,
+                PRIMARY KEY (user_id, session_key)
+            )"""
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str, session_key: str) -> Optional[Dict[str, Any]]:
+        """The session's manifest entry, or None if it was never ingested"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash, prompt_hash, model, memory_ids FROM ingested_sessions "
+                "WHERE user_id = ? AND session_key = ?",
+                (user_id, session_key),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"content_hash": row[0], "prompt_hash": row[1], "model": row[2], "memory_ids": json.loads(row[3])}
+
+    def is_current(self, user_id: str, session_key: str, content_hash: str, prompt_hash: str,
+                   model: Optional[str]) -> bool:
+        """Whether the session was fully ingested from the same content, prompt and model"""
+        entry = self.get(user_id, session_key)
+        return entry is not None and (entry["content_hash"], entry["prompt_hash"], entry["model"]) == (
+            content_hash, prompt_hash, model
+        )
+
+    def record(self, user_id: str, session_key: str, content_hash: Optional[str], prompt_hash: str,
+               model: Optional[str], memory_ids: List[str]):
+        """
+        Store the session's entry, replacing any earlier one
+
+        A content_hash of None marks a partial ingest: its memory ids are known, so the next run
+        removes them, but the session never counts as current.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ingested_sessions "
+                "(user_id, session_key, content_hash, prompt_hash, model, memory_ids, ingested_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (user_id, session_key, content_hash, prompt_hash, model, json.dumps(memory_ids), time.time()),
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def session_content_hash(chats: List[Dict[str, Any]], timestamp: Any) -> str:
+    """Hash of a session's turns and timestamp"""
+    return make_cache_key(chats=chats, timestamp=timestamp)
+
+
+def added_memory_ids(result: Any) -> List[str]:
+    """
+    Ids of the memories a Memory.add result created (ADD events)
+
+    UPDATE and DELETE events change memories owned by other sessions and are not returned.
+    """
+    events = result.get("results", []) if isinstance(result, dict) else result
+    return [
+        event["id"] for event in events or []
+        if isinstance(event, dict) and event.get("id") and event.get("event", "ADD") == "ADD"
+    ]
+
+
+def format_manifest_stats(stats: Dict[str, int]) -> str:
+    """One-line summary of what an incremental ingestion run skipped and redid"""
+    return (
+        f"[manifest] skipped {stats['unchanged']} unchanged user sessions, re-ingested {stats['changed']} changed, "
+        f"ingested {stats['new']} new, removed {stats['removed_memories']} stale memories"
+    )
+
+
+class SessionIngest:
+    """
+    Collects the memory ids created by one session's batches and records them after every batch
+
+    Until the last batch the entry is partial (content_hash None), so a run interrupted mid-session
+    leaves the ids it wrote in the manifest and the next run removes them before re-ingesting. The
+    earlier entry is kept until remove_stale or the first batch replaces it.
+    """
+
+    def __init__(self, manifest: IngestionManifest, user_ids: List[str], session_key: str, content_hash: str,
+                 prompt_hash: str, model: Optional[str], batches: int,
+                 stale_ids: Optional[Dict[str, List[str]]] = None):
+        """
+        Initialize tracker
+
+        Args:
+            manifest: Manifest to record the session in
+            user_ids: Users the session's memories are written to
+            session_key: Session being ingested
+            content_hash: Hash of the session content (see session_content_hash)
+            prompt_hash: Hash of the extraction prompt and settings
+            model: Extraction model
+            batches: Number of batches the session is written in
+            stale_ids: {user_id: ids} of the memories the session's earlier ingest created, for remove_stale
+        """
+        self.manifest = manifest
+        self.session_key = session_key
+        self.content_hash = content_hash
+        self.prompt_hash = prompt_hash
+        self.model = model
+        self.stale_ids = stale_ids or {}
+        self.memory_ids = {user_id: [] for user_id in user_ids}
+        self.remaining = batches
+        self.failed = False
+        self._lock = threading.Lock()
+
+    def remove_stale(self, remove: Callable[[str, List[str]], List[str]]):
+        """
+        Remove the memories of the session's earlier ingest and replace its entry
+
+        Meant to be queued ahead of the session's batches on the same ordered queue, so it runs after
+        the user's earlier sessions and before any new write.
+
+        Args:
+            remove: remove(user_id, memory_ids), returning the ids that could not be deleted
+        """
+        with self._lock:
+            for user_id, memory_ids in self.stale_ids.items():
+                # Ids that could not be deleted stay in the entry, so a later run tries again
+                self.memory_ids[user_id] = remove(user_id, memory_ids) + self.memory_ids[user_id]
+            self.stale_ids = {}
+            self._record()
+
+    def run(self, fn: Callable[..., Dict[str, Any]], *args):
+        """
+        Run one batch write and collect the memory ids it created
+
+        Args:
+            fn: Batch write returning {user_id: Memory.add result}
+        """
+        try:
+            results = fn(*args)
+        except Exception:
+            with self._lock:
+                self.failed = True
+            raise
+        else:
+            with self._lock:
+                for user_id, result in results.items():
+                    self.memory_ids[user_id].extend(added_memory_ids(result))
+        finally:
+            with self._lock:
+                self.remaining -= 1
+                self._record()
+
+    def _record(self):
+        """Store the entry; called with self._lock held"""
+        # Unfinished sessions, and sessions with a failed batch, are partial, so the next run replaces them
+        content_hash = self.content_hash if self.remaining == 0 and not self.failed else None
+        for user_id, memory_ids in self.memory_ids.items():
+            self.manifest.record(user_id, self.session_key, content_hash, self.prompt_hash, self.model, memory_ids)
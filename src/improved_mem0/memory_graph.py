@@ -4,10 +4,13 @@ Builds and maintains an entity-relationship graph from memories
 """
 import json
 import re
-from typing import Dict, List, Set, Tuple, Any, Optional
+from array import array
+from typing import Dict, Iterator, List, Set, Tuple, Any, Optional
 from collections import defaultdict
 import hashlib
 
+from src.improved_mem0.graph_traversal import bidirectional_path, breadth_first
+
 
 class MemoryGraph:
     """Entity-relationship graph for memories"""
@@ -15,9 +18,78 @@ class MemoryGraph:
     def __init__(self):
         """Initialize empty graph"""
         self.entities = {}  # entity_id -> entity_info
-        self.relationships = defaultdict(list)  # entity_id -> [(related_entity_id, relationship_type, strength)]
         self.memory_entities = defaultdict(set)  # memory_id -> set of entity_ids
         self.entity_memories = defaultdict(set)  # entity_id -> set of memory_ids
+        
+        # Edges are kept once per (neighbor, relationship_type) with their mention count, summed
+        # strength and how many of the mentions were stated in that direction, over entity ids
+        # interned to ints
+        self._node_ids = {}  # entity_id -> node
+        self._node_names = []  # node -> entity_id
+        self._adjacency = []  # node -> {(neighbor node, relationship_type): [count, strength, forward]}
+        self._frozen = None  # CSR arrays built by freeze(), dropped on the next edge change
+    
+    def _node(self, entity: str) -> int:
+        """Interned node of an entity, allocated on first use"""
+        node = self._node_ids.get(entity)
+        if node is None:
+            node = len(self._node_names)
+            self._node_ids[entity] = node
+            self._node_names.append(entity)
+            self._adjacency.append({})
+        return node
+    
+    def add_edge(self, entity1: str, entity2: str, rel_type: str, count: int = 1, strength: float = 1.0,
+                 forward: Optional[int] = None):
+        """
+        Accumulate mentions of the directed edge entity1 -> entity2
+        
+        Args:
+            forward: How many of the mentions state "entity1 rel_type entity2"; the others are the
+                stored reverse of "entity2 rel_type entity1" (defaults to all of them)
+        """
+        self._frozen = None
+        edge = self._adjacency[self._node(entity1)].setdefault((self._node(entity2), rel_type), [0, 0.0, 0])
+        edge[0] += count
+        edge[1] += strength
+        edge[2] += count if forward is None else forward
+    
+    def freeze(self):
+        """
+        Pack the edges into CSR arrays sorted strongest-first, for read-heavy traversal
+        
+        Edge changes after freezing drop the packed form again.
+        """
+        offsets = array("l", [0])
+        targets = array("l")
+        rel_ids = array("l")
+        counts = array("l")
+        strengths = array("d")
+        forwards = array("l")
+        rel_types = {}
+        for edges in self._adjacency:
+            for (neighbor, rel_type), (count, strength, forward) in sorted(
+                edges.items(), key=lambda item: (-item[1][1], self._node_names[item[0][0]], item[0][1])
+            ):
+                targets.append(neighbor)
+                rel_ids.append(rel_types.setdefault(rel_type, len(rel_types)))
+                counts.append(count)
+                strengths.append(strength)
+                forwards.append(forward)
+            offsets.append(len(targets))
+        self._frozen = (offsets, targets, rel_ids, counts, strengths, forwards, list(rel_types))
+        return self
+    
+    @property
+    def relationships(self) -> Dict[str, List[Tuple[str, str, float]]]:
+        """entity_id -> [(related_entity_id, relationship_type, strength)], one entry per distinct edge"""
+        return {
+            self._node_names[node]: [
+                (self._node_names[neighbor], rel_type, strength)
+                for (neighbor, rel_type), (count, strength, forward) in edges.items()
+            ]
+            for node, edges in enumerate(self._adjacency) if edges
+        }
     
     def extract_entities(self, text: str) -> Set[str]:
         """Extract entities from text (simple: capitalized words, proper nouns)"""
@@ -115,39 +187,63 @@ class MemoryGraph:
                     "memory_count": 0
                 }
             
-            # Add relationship (bidirectional)
-            self.relationships[entity1].append((entity2, rel_type, 1.0))
-            self.relationships[entity2].append((entity1, rel_type, 1.0))
+            # Add relationship (bidirectional); repeated mentions strengthen the existing edge. The
+            # reverse edge is for traversal only and does not state "entity2 rel_type entity1"
+            self.add_edge(entity1, entity2, rel_type)
+            self.add_edge(entity2, entity1, rel_type, forward=0)
     
-    def get_related_entities(self, entity: str, max_depth: int = 2) -> Set[str]:
-        """Get entities related to the given entity through graph traversal"""
-        if entity not in self.entities:
-            return set()
+    def iter_directed_edges(self, entity: str) -> Iterator[Tuple[str, str, int, float, int]]:
+        """
+        (neighbor, rel_type, count, strength, forward) edges of an entity, strongest first
         
-        related = set()
-        visited = set()
-        queue = [(entity, 0)]  # (entity, depth)
+        forward of the count mentions state "entity rel_type neighbor"; the rest state
+        "neighbor rel_type entity".
+        """
+        node = self._node_ids.get(entity)
+        if node is None:
+            return
+        names = self._node_names
+        if self._frozen is not None:
+            offsets, targets, rel_ids, counts, strengths, forwards, rel_types = self._frozen
+            for i in range(offsets[node], offsets[node + 1]):
+                yield names[targets[i]], rel_types[rel_ids[i]], counts[i], strengths[i], forwards[i]
+            return
+        for (neighbor, rel_type), (count, strength, forward) in sorted(
+            self._adjacency[node].items(), key=lambda item: (-item[1][1], names[item[0][0]], item[0][1])
+        ):
+            yield names[neighbor], rel_type, count, strength, forward
+    
+    def iter_edges(self, entity: str) -> Iterator[Tuple[str, str, int, float]]:
+        """(neighbor, rel_type, count, strength) edges of an entity, strongest first"""
+        for neighbor, rel_type, count, strength, forward in self.iter_directed_edges(entity):
+            yield neighbor, rel_type, count, strength
+    
+    def iter_neighbors(self, entity: str) -> Iterator[Tuple[str, str, float]]:
+        """(neighbor, rel_type, strength) edges of an entity, strongest first"""
+        for neighbor, rel_type, count, strength in self.iter_edges(entity):
+            yield neighbor, rel_type, strength
+    
+    def get_related_entities(self, entity: str, max_depth: int = 2, fanout: Optional[int] = None,
+                             max_nodes: Optional[int] = None) -> Set[str]:
+        """
+        Get entities related to the given entity through graph traversal
         
-        while queue:
-            current_entity, depth = queue.pop(0)
-            
-            if depth >= max_depth or current_entity in visited:
-                continue
-            
-            visited.add(current_entity)
-            related.add(current_entity)
-            
-            # Get directly related entities
-            for related_entity, rel_type, strength in self.relationships.get(current_entity, []):
-                if related_entity not in visited:
-                    queue.append((related_entity, depth + 1))
+        Args:
+            entity: Start entity
+            max_depth: Traversal depth; entities first reached at max_depth hops are not included
+            fanout: Follow only the strongest N edges of each entity (None follows all)
+            max_nodes: Stop expanding once this many entities have been reached
+        """
+        if entity not in self.entities:
+            return set()
         
-        related.discard(entity)  # Remove self
-        return related
+        reached = breadth_first(self.iter_neighbors, [entity], max(0, max_depth - 1), fanout, max_nodes)
+        reached.pop(entity)  # Remove self
+        return set(reached)
     
-    def get_related_memories(self, entity: str, max_depth: int = 2) -> Set[str]:
+    def get_related_memories(self, entity: str, max_depth: int = 2, fanout: Optional[int] = None) -> Set[str]:
         """Get memories related to an entity through the graph"""
-        related_entities = self.get_related_entities(entity, max_depth)
+        related_entities = self.get_related_entities(entity, max_depth, fanout)
         related_memories = set()
         
         # Get memories for all related entities
@@ -156,42 +252,79 @@ class MemoryGraph:
         
         return related_memories
     
-    def find_memory_path(self, entity1: str, entity2: str, max_depth: int = 3) -> Optional[List[str]]:
-        """Find a path between two entities through the graph"""
+    def find_memory_path(self, entity1: str, entity2: str, max_depth: int = 3,
+                         fanout: Optional[int] = None) -> Optional[List[str]]:
+        """
+        Find a shortest path between two entities through the graph
+        
+        Args:
+            entity1: First entity of the path
+            entity2: Last entity of the path
+            max_depth: Maximum number of entities on the path
+            fanout: Follow only the strongest N edges of each entity (None follows all)
+        """
         if entity1 not in self.entities or entity2 not in self.entities:
             return None
         
-        if entity1 == entity2:
-            return [entity1]
+        # Relationships are stored in both directions, so the search can run from both ends
+        return bidirectional_path(self.iter_neighbors, entity1, entity2, max_depth - 1, fanout)
+    
+    def get_ranked_relations(self, entities: List[str], max_depth: int = 2, fanout: Optional[int] = None,
+                             max_nodes: Optional[int] = None, deadline: Optional[float] = None,
+                             top_k: Optional[int] = None) -> List[Tuple[str, str, str, float]]:
+        """
+        Relations around the given entities, strongest and closest first
         
-        # BFS to find path
-        queue = [(entity1, [entity1])]
-        visited = {entity1}
+        Entities are expanded breadth-first; a relation scores the strength of its stated direction
+        discounted by the hop distance it was reached at.
         
-        while queue:
-            current_entity, path = queue.pop(0)
-            
-            if len(path) > max_depth:
-                continue
-            
-            if current_entity == entity2:
-                return path
-            
-            # Explore neighbors
-            for related_entity, rel_type, strength in self.relationships.get(current_entity, []):
-                if related_entity not in visited:
-                    visited.add(related_entity)
-                    queue.append((related_entity, path + [related_entity]))
+        Args:
+            entities: Seed entities (unknown ones are ignored)
+            max_depth: Hops expanded from the seeds
+            fanout: Follow only the strongest N edges of each entity (None follows all)
+            max_nodes: Stop expanding once this many entities have been reached
+            deadline: time.time() value after which expansion stops
+            top_k: Number of relations returned (None returns all)
+        
+        Returns:
+            (source, relationship, target, score) tuples, in the direction the memories state them
+        """
+        # Record the edges the traversal follows, to score them by the depth it reached their source at
+        traversed = []
+        
+        def neighbors(entity):
+            for neighbor, rel_type, count, strength, forward in self.iter_directed_edges(entity):
+                traversed.append((entity, rel_type, neighbor, count, strength, forward))
+                yield neighbor, rel_type, strength
+        
+        reached = breadth_first(
+            neighbors, [entity for entity in entities if entity in self.entities], max_depth,
+            fanout=fanout, max_nodes=max_nodes, deadline=deadline
+        )
+        
+        relations = {}  # (source, relationship, target) -> score
+        for entity, rel_type, neighbor, count, strength, forward in traversed:
+            # The edge's strength sums its mentions; each stated direction gets its share of them
+            score = strength / (reached[entity][0] + 1)
+            for source, target, mentions in ((entity, neighbor, forward), (neighbor, entity, count - forward)):
+                if mentions > 0:
+                    key = (source, rel_type, target)
+                    # A relation reached from both of its entities keeps its closer (higher) score
+                    relations[key] = max(relations.get(key, 0.0), score * mentions / count)
         
-        return None
+        ranked = sorted(relations.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+        return [(source, rel_type, target, score) for (source, rel_type, target), score in ranked]
     
     def get_graph_stats(self) -> Dict[str, Any]:
         """Get statistics about the graph"""
-        total_relationships = sum(len(rels) for rels in self.relationships.values()) // 2  # Divide by 2 for bidirectional
+        # Divide by 2 for bidirectional
+        total_relationships = sum(len(edges) for edges in self._adjacency) // 2
+        total_mentions = sum(edge[0] for edges in self._adjacency for edge in edges.values()) // 2
         
         return {
             "num_entities": len(self.entities),
             "num_relationships": total_relationships,
+            "num_relationship_mentions": total_mentions,
             "num_memories": len(self.memory_entities),
             "avg_entities_per_memory": sum(len(entities) for entities in self.memory_entities.values()) / len(self.memory_entities) if self.memory_entities else 0,
             "avg_memories_per_entity": sum(len(memories) for memories in self.entity_memories.values()) / len(self.entity_memories) if self.entity_memories else 0
@@ -201,7 +334,13 @@ class MemoryGraph:
         """Convert graph to dictionary for serialization"""
         return {
             "entities": self.entities,
-            "relationships": {k: v for k, v in self.relationships.items()},
+            "relationships": {
+                self._node_names[node]: [
+                    [self._node_names[neighbor], rel_type, count, strength, forward]
+                    for (neighbor, rel_type), (count, strength, forward) in edges.items()
+                ]
+                for node, edges in enumerate(self._adjacency) if edges
+            },
             "memory_entities": {k: list(v) for k, v in self.memory_entities.items()},
             "entity_memories": {k: list(v) for k, v in self.entity_memories.items()}
         }
@@ -209,7 +348,19 @@ class MemoryGraph:
     def from_dict(self, data: Dict[str, Any]):
         """Load graph from dictionary"""
         self.entities = data.get("entities", {})
-        self.relationships = defaultdict(list, data.get("relationships", {}))
+        self._node_ids, self._node_names, self._adjacency, self._frozen = {}, [], [], None
+        for entity, edges in data.get("relationships", {}).items():
+            for edge in edges:
+                # Earlier formats carry no direction, so their mentions count as stated both ways
+                forward = None
+                if len(edge) == 3:  # One (neighbor, rel_type, strength) entry per mention
+                    neighbor, rel_type, strength = edge
+                    count = 1
+                elif len(edge) == 4:
+                    neighbor, rel_type, count, strength = edge
+                else:
+                    neighbor, rel_type, count, strength, forward = edge
+                self.add_edge(entity, neighbor, rel_type, count, strength, forward)
         self.memory_entities = defaultdict(set, {k: set(v) for k, v in data.get("memory_entities", {}).items()})
         self.entity_memories = defaultdict(set, {k: set(v) for k, v in data.get("entity_memories", {}).items()})
 
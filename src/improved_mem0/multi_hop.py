@@ -3,9 +3,92 @@ Multi-hop reasoning for complex queries
 Chains related memories to answer questions requiring multiple steps
 """
 import json
-from typing import List, Dict, Any, Set, Tuple
+import math
+import re
+from typing import List, Dict, Any, Optional, Set, Tuple
 from collections import defaultdict, deque
 
+_ENTITY_PATTERN = re.compile(r'\b[A-Z][a-z]+\b')
+_COMMON_WORDS = {"The", "This", "That", "These", "Those", "A", "An"}
+
+
+def _memory_text(memory: Dict[str, Any]) -> str:
+    return memory.get("memory", "") or memory.get("text", "")
+
+
+def _memory_id(memory: Dict[str, Any], text: str) -> str:
+    return memory.get("id") or str(hash(text))
+
+
+class MultiHopIndex:
+    """
+    Inverted index over a user's memories for related-memory lookup
+    
+    Entity sets, word sets and ids are computed once per memory. Memories sharing an entity are
+    found through entity postings; memories that may reach the text-similarity threshold are found
+    through word postings restricted to each memory's prefix in a rarest-first word order (any pair
+    with Jaccard >= threshold shares a word within both prefixes). Lookup cost therefore depends on
+    posting sizes rather than on the number of memories.
+    """
+    
+    def __init__(self, memories: List[Dict[str, Any]], extract_entities, similarity_threshold: float = 0.3):
+        """
+        Build index
+        
+        Args:
+            memories: All memories of the user
+            extract_entities: Function mapping a text to its entity set
+            similarity_threshold: Minimum word-overlap similarity to consider memories related
+        """
+        self.memories = memories
+        self.extract_entities = extract_entities
+        self.similarity_threshold = similarity_threshold
+        self.texts = [_memory_text(memory) for memory in memories]
+        self.ids = [_memory_id(memory, text) for memory, text in zip(memories, self.texts)]
+        self.entities = [extract_entities(text) for text in self.texts]
+        self.words = [set(text.lower().split()) for text in self.texts]
+        self.positions = {id(memory): position for position, memory in enumerate(memories)}
+        
+        self.word_frequency = defaultdict(int)
+        for words in self.words:
+            for word in words:
+                self.word_frequency[word] += 1
+        
+        self.entity_postings = defaultdict(list)
+        self.prefix_postings = defaultdict(list)
+        for position, (entities, words) in enumerate(zip(self.entities, self.words)):
+            for entity in entities:
+                self.entity_postings[entity].append(position)
+            for word in self._prefix(words):
+                self.prefix_postings[word].append(position)
+    
+    def _prefix(self, words: Set[str]) -> List[str]:
+        ordered = sorted(words, key=lambda word: (self.word_frequency.get(word, 0), word))
+        # The small epsilon only lengthens the prefix, so float error can never drop a true match
+        size = len(ordered) - math.ceil(self.similarity_threshold * len(ordered) - 1e-9) + 1
+        return ordered[:max(0, size)]
+    
+    def features(self, memory: Dict[str, Any]) -> Tuple[str, Set[str], Set[str]]:
+        """(text, entities, words) of a memory, from the index when it is one of the indexed memories"""
+        position = self.positions.get(id(memory))
+        if position is not None:
+            return self.texts[position], self.entities[position], self.words[position]
+        text = _memory_text(memory)
+        return text, self.extract_entities(text), set(text.lower().split())
+    
+    def candidates(self, entities: Set[str], words: Set[str]) -> Set[int]:
+        """Positions of memories that share an entity or may reach the similarity threshold"""
+        if self.similarity_threshold <= 0:
+            # Every memory reaches a non-positive threshold
+            return set(range(len(self.memories)))
+        positions = set()
+        for entity in entities:
+            positions.update(self.entity_postings.get(entity, ()))
+        if words:
+            for word in self._prefix(words):
+                positions.update(self.prefix_postings.get(word, ()))
+        return positions
+
 
 class MultiHopReasoning:
     """Multi-hop reasoning engine for chaining related memories"""
@@ -23,13 +106,12 @@ class MultiHopReasoning:
     
     def extract_entities(self, text: str) -> Set[str]:
         """Extract entities (simple: capitalized words, proper nouns)"""
-        import re
-        # Find capitalized words (potential entities)
-        entities = set(re.findall(r'\b[A-Z][a-z]+\b', text))
-        # Remove common words
-        common_words = {"The", "This", "That", "These", "Those", "A", "An"}
-        entities = entities - common_words
-        return entities
+        # Find capitalized words (potential entities), removing common words
+        return set(_ENTITY_PATTERN.findall(text)) - _COMMON_WORDS
+    
+    def build_index(self, all_memories: List[Dict[str, Any]]) -> MultiHopIndex:
+        """Index a memory set once so every hop over it is a posting-list lookup"""
+        return MultiHopIndex(all_memories, self.extract_entities, self.similarity_threshold)
     
     def calculate_text_similarity(self, text1: str, text2: str) -> float:
         """Calculate simple text similarity"""
@@ -42,40 +124,50 @@ class MultiHopReasoning:
         return len(intersection) / len(union) if union else 0.0
     
     def find_related_memories(self, current_memory: Dict[str, Any], all_memories: List[Dict[str, Any]], 
-                             visited: Set[str]) -> List[Dict[str, Any]]:
-        """Find memories related to the current memory"""
-        current_text = current_memory.get("memory", "") or current_memory.get("text", "")
-        current_entities = self.extract_entities(current_text)
-        current_id = current_memory.get("id") or str(hash(current_text))
+                             visited: Set[str], index: Optional[MultiHopIndex] = None) -> List[Dict[str, Any]]:
+        """
+        Find memories related to the current memory
+        
+        Args:
+            current_memory: Memory to expand from
+            all_memories: All available memories
+            visited: Ids of memories already in the chain
+            index: Prebuilt index over all_memories (built here when not given)
+        """
+        if index is None:
+            index = self.build_index(all_memories)
+        _, current_entities, current_words = index.features(current_memory)
         
         related = []
-        for memory in all_memories:
-            memory_text = memory.get("memory", "") or memory.get("text", "")
-            memory_id = memory.get("id") or str(hash(memory_text))
-            
+        for position in index.candidates(current_entities, current_words):
             # Skip if already visited
-            if memory_id in visited:
+            if index.ids[position] in visited:
                 continue
             
             # Check entity overlap
-            memory_entities = self.extract_entities(memory_text)
-            entity_overlap = len(current_entities.intersection(memory_entities))
+            entity_overlap = len(current_entities & index.entities[position])
             
             # Check text similarity
-            similarity = self.calculate_text_similarity(current_text, memory_text)
+            memory_words = index.words[position]
+            if current_words and memory_words:
+                similarity = len(current_words & memory_words) / len(current_words | memory_words)
+            else:
+                similarity = 0.0
             
             # Consider related if entity overlap or high similarity
             if entity_overlap > 0 or similarity >= self.similarity_threshold:
+                # Copy, since indexed memories may be shared by concurrent questions
+                memory = dict(index.memories[position])
                 memory["relation_score"] = (entity_overlap * 0.5) + (similarity * 0.5)
-                related.append(memory)
+                related.append((position, memory))
         
-        # Sort by relation score
-        related.sort(key=lambda x: x.get("relation_score", 0.0), reverse=True)
-        return related[:5]  # Return top 5 related memories
+        # Sort by relation score, ties in memory order
+        related.sort(key=lambda item: (-item[1]["relation_score"], item[0]))
+        return [memory for _, memory in related[:5]]  # Return top 5 related memories
     
     def chain_memories(self, initial_memories: List[Dict[str, Any]], 
                       all_memories: List[Dict[str, Any]], 
-                      query: str) -> List[Dict[str, Any]]:
+                      query: str, index: Optional[MultiHopIndex] = None) -> List[Dict[str, Any]]:
         """
         Chain memories through multiple hops to find related information
         
@@ -83,6 +175,7 @@ class MultiHopReasoning:
             initial_memories: Starting set of memories from initial search
             all_memories: All available memories to search through
             query: Original query for context
+            index: Prebuilt index over all_memories (built once here when not given)
         
         Returns:
             List of chained memories including initial and related memories
@@ -90,6 +183,9 @@ class MultiHopReasoning:
         if not initial_memories:
             return []
         
+        if index is None:
+            index = self.build_index(all_memories)
+        
         chained_memories = []
         visited = set()
         queue = deque()
@@ -110,7 +206,7 @@ class MultiHopReasoning:
                 continue
             
             # Find related memories
-            related = self.find_related_memories(current_memory, all_memories, visited)
+            related = self.find_related_memories(current_memory, all_memories, visited, index)
             
             for related_memory in related:
                 memory_text = related_memory.get("memory", "") or related_memory.get("text", "")
@@ -125,10 +221,14 @@ class MultiHopReasoning:
         return chained_memories
     
     def answer_with_multi_hop(self, query: str, initial_memories: List[Dict[str, Any]], 
-                              all_memories: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], str]:
+                              all_memories: List[Dict[str, Any]],
+                              index: Optional[MultiHopIndex] = None) -> Tuple[List[Dict[str, Any]], str]:
         """
         Answer query using multi-hop reasoning
         
+        Args:
+            index: Prebuilt index over all_memories, reusable across queries on the same memory set
+        
         Returns:
             Tuple of (chained_memories, reasoning_path)
         """
@@ -145,7 +245,7 @@ class MultiHopReasoning:
             return initial_memories, "Single-hop reasoning sufficient"
         
         # Chain memories
-        chained_memories = self.chain_memories(initial_memories, all_memories, query)
+        chained_memories = self.chain_memories(initial_memories, all_memories, query, index)
         
         # Build reasoning path
         reasoning_path = f"Found {len(initial_memories)} initial memories, "
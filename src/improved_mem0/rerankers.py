@@ -0,0 +1,132 @@
+"""
+Pluggable memory rerankers
+A reranker scores (query, memory) pairs and reorders candidates by that score. The default search
+path asks the configured generative LLM for JSON scores; CrossEncoderReranker scores pairs locally
+with a sentence-transformers cross-encoder in large CPU batches.
+"""
+import abc
+import threading
+from typing import Any, Dict, List, Optional
+
+DEFAULT_CROSS_ENCODER = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+# Quantized ONNX export shipped with the ms-marco cross-encoders
+DEFAULT_ONNX_FILE = "onnx/model_qint8_avx512_vnni.onnx"
+
+# Loaded cross-encoders, shared by every reranker in the process
+_MODELS = {}
+_MODELS_LOCK = threading.Lock()
+
+
+def memory_text(memory: Dict[str, Any]) -> str:
+    """Text of a memory in any of the formats returned by search / get_all"""
+    return memory.get("memory", "") or memory.get("text", "") or memory.get("data", "")
+
+
+class Reranker(abc.ABC):
+    """Interface for memory rerankers"""
+
+    name = "reranker"
+
+    @abc.abstractmethod
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        """Relevance score of each text to the query (higher is more relevant)"""
+
+    def rerank(self, query: str, memories: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Attach rerank_score to each memory and sort by it"""
+        if not memories:
+            return memories
+        scores = self.score(query, [memory_text(memory) for memory in memories])
+        for memory, score in zip(memories, scores):
+            memory["rerank_score"] = float(score)
+        memories.sort(key=lambda x: x.get("rerank_score", 0.0), reverse=True)
+        return memories
+
+
+def load_cross_encoder(model_name: str = DEFAULT_CROSS_ENCODER, backend: str = "auto",
+                       onnx_file: Optional[str] = DEFAULT_ONNX_FILE, max_length: int = 256,
+                       num_threads: Optional[int] = None):
+    """
+    Load a cross-encoder once per process
+
+    Args:
+        model_name: HuggingFace model id or local path
+        backend: "onnx", "torch", or "auto" (quantized ONNX when onnxruntime and the export are available)
+        onnx_file: ONNX file inside the model repository (None uses the default export)
+        max_length: Maximum tokens of a (query, memory) pair
+        num_threads: Intra-op CPU threads for inference (None keeps the runtime default)
+
+    Returns:
+        Tuple of (CrossEncoder, backend actually loaded)
+    """
+    key = (model_name, backend, onnx_file, max_length, num_threads)
+    with _MODELS_LOCK:
+        if key in _MODELS:
+            return _MODELS[key]
+
+        from sentence_transformers import CrossEncoder
+
+        if num_threads:
+            import torch
+            torch.set_num_threads(num_threads)
+
+        loaded = None
+        if backend in ("auto", "onnx"):
+            model_kwargs = {"file_name": onnx_file} if onnx_file else {}
+            try:
+                if num_threads:
+                    import onnxruntime
+                    session_options = onnxruntime.SessionOptions()
+                    session_options.intra_op_num_threads = num_threads
+                    model_kwargs["session_options"] = session_options
+                loaded = (
+                    CrossEncoder(model_name, max_length=max_length, device="cpu", backend="onnx",
+                                 model_kwargs=model_kwargs),
+                    "onnx",
+                )
+            except Exception as e:
+                # Older sentence-transformers, no onnxruntime, or no ONNX export for this model
+                if backend == "onnx":
+                    raise
+                print(f"ONNX cross-encoder unavailable ({e}), using torch")
+        if loaded is None:
+            loaded = (CrossEncoder(model_name, max_length=max_length, device="cpu"), "torch")
+
+        _MODELS[key] = loaded
+        return loaded
+
+
+class CrossEncoderReranker(Reranker):
+    """Scores (query, memory) pairs with a local sentence-transformers CrossEncoder"""
+
+    def __init__(self, model_name: str = DEFAULT_CROSS_ENCODER, batch_size: int = 64,
+                 num_threads: Optional[int] = None, backend: str = "auto",
+                 onnx_file: Optional[str] = DEFAULT_ONNX_FILE, max_length: int = 256):
+        """
+        Initialize cross-encoder reranker
+
+        Args:
+            model_name: HuggingFace model id or local path
+            batch_size: Pairs scored per forward pass
+            num_threads: Intra-op CPU threads used for inference (None keeps the runtime default)
+            backend: "onnx", "torch", or "auto"
+            onnx_file: ONNX file inside the model repository
+            max_length: Maximum tokens of a (query, memory) pair
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        # Loaded eagerly so the first question does not pay the model load
+        self.model, self.backend = load_cross_encoder(model_name, backend, onnx_file, max_length, num_threads)
+        self.name = f"cross-encoder:{model_name}:{self.backend}"
+        # One forward pass at a time: concurrent passes only oversubscribe the CPU threads
+        self._lock = threading.Lock()
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        if not texts:
+            return []
+        pairs = [(query, text) for text in texts]
+        with self._lock:
+            scores = self.model.predict(
+                pairs, batch_size=self.batch_size, convert_to_numpy=True, show_progress_bar=False
+            )
+        return scores.tolist()
@@ -0,0 +1,181 @@
+"""
+Append-only results log
+Each answered question is appended as one JSONL record by a single writer thread; the nested
+results JSON consumed by evals.py is produced once at the end by compacting the log
+"""
+import hashlib
+import json
+import os
+import queue
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+_CLOSE = object()
+
+
+def checkpoint_path_for(output_path: str) -> str:
+    """Path of the JSONL checkpoint log that backs a results file"""
+    base, _ = os.path.splitext(output_path)
+    return f"{base}.checkpoint.jsonl"
+
+
+def question_key(idx: int, question: str, category: Any, fingerprint: str) -> str:
+    """Resume key of a question: (conversation idx, question hash, config fingerprint)"""
+    digest = hashlib.sha1(f"{question}\x1f{category}".encode()).hexdigest()[:16]
+    return f"{idx}:{digest}:{fingerprint}"
+
+
+class ResultsWriter:
+    """Single-threaded, buffered JSONL writer with fsync at checkpoints"""
+
+    def __init__(self, log_path: str, append: bool = False, flush_every: int = 20):
+        """
+        Initialize writer
+
+        Args:
+            log_path: Path of the JSONL log
+            append: Keep existing records (resume) instead of starting a fresh log
+            flush_every: Flush the file buffer every N records
+        """
+        self.log_path = log_path
+        self.append = append
+        self.flush_every = flush_every
+        self.records_written = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._error = None
+
+    def start(self):
+        directory = os.path.dirname(self.log_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="results-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, record: Dict[str, Any]):
+        """Queue one record; safe to call from any thread"""
+        if self._error:
+            raise self._error
+        self._queue.put(record)
+
+    def checkpoint(self, wait: bool = False):
+        """Flush and fsync everything queued so far"""
+        done = threading.Event()
+        self._queue.put(done)
+        if wait:
+            done.wait()
+
+    def close(self):
+        """Flush, fsync and stop the writer thread"""
+        if self._thread is None:
+            return
+        self._queue.put(_CLOSE)
+        self._thread.join()
+        self._thread = None
+        if self._error:
+            raise self._error
+
+    def _run(self):
+        try:
+            with open(self.log_path, "a" if self.append else "w") as f:
+                # Terminate a torn trailing line left by a crash so new records start on their own line
+                if self.append and f.tell() > 0 and not _ends_with_newline(self.log_path):
+                    f.write("\n")
+                pending = 0
+                while True:
+                    item = self._queue.get()
+                    if item is _CLOSE or isinstance(item, threading.Event):
+                        f.flush()
+                        os.fsync(f.fileno())
+                        pending = 0
+                        if item is _CLOSE:
+                            return
+                        item.set()
+                        continue
+                    f.write(json.dumps(item) + "\n")
+                    self.records_written += 1
+                    pending += 1
+                    if pending >= self.flush_every:
+                        f.flush()
+                        pending = 0
+        except Exception as e:
+            self._error = e
+            # Release anyone blocked on a checkpoint
+            while not self._queue.empty():
+                item = self._queue.get_nowait()
+                if isinstance(item, threading.Event):
+                    item.set()
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def read_log(log_path: str) -> List[Dict[str, Any]]:
+    """Read all complete records from a JSONL log, ignoring a torn trailing line"""
+    records = []
+    if not os.path.exists(log_path):
+        return records
+    with open(log_path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def rewrite_log(log_path: str, records: List[Dict[str, Any]]):
+    """Atomically replace a log with the given records"""
+    tmp_path = log_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, log_path)
+
+
+def load_completed_records(log_path: str) -> List[Dict[str, Any]]:
+    """
+    Records of already-answered questions from the checkpoint log
+
+    Only the log is trusted: each record's key carries the fingerprint of the config that produced it,
+    whereas a results file does not say which config wrote it.
+    """
+    return [record for record in read_log(log_path) if record.get("key")]
+
+
+def compact_log(log_path: str, output_path: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Rebuild the nested results layout ({conversation idx: [results in question order]}) from the log
+
+    Later records for the same question position replace earlier ones.
+    """
+    by_position = {}
+    for record in read_log(log_path):
+        by_position[(int(record["idx"]), record["position"])] = record
+
+    results = defaultdict(list)
+    for (idx, _), record in sorted(by_position.items(), key=lambda item: item[0]):
+        results[idx].append(record["result"])
+
+    if output_path:
+        tmp_path = output_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(results, f, indent=4)
+        os.replace(tmp_path, output_path)
+    return results
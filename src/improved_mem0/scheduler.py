@@ -0,0 +1,174 @@
+"""
+Question schedulers for dataset processing
+Batch mode mirrors the original per-chunk ThreadPoolExecutor barrier; queue mode feeds one
+long-lived worker pool and collects results as they finish
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+def _new_stats(mode: str, total: int) -> Dict[str, Any]:
+    return {
+        "mode": mode,
+        "submitted": total,
+        "completed": 0,
+        "failed": 0,
+        "timed_out": 0,
+        "cancelled": 0,
+        "elapsed": 0.0,
+        "throughput": 0.0,
+    }
+
+
+def _finish_stats(stats: Dict[str, Any], start_time: float) -> Dict[str, Any]:
+    stats["elapsed"] = time.time() - start_time
+    stats["throughput"] = stats["completed"] / stats["elapsed"] if stats["elapsed"] > 0 else 0.0
+    return stats
+
+
+def format_throughput(stats: Dict[str, Any]) -> str:
+    """One-line throughput summary for a scheduler run"""
+    return (
+        f"[{stats['mode']}] {stats['completed']}/{stats['submitted']} questions in {stats['elapsed']:.1f}s "
+        f"({stats['throughput']:.2f} q/s, failed={stats['failed']}, timed_out={stats['timed_out']}, "
+        f"cancelled={stats['cancelled']})"
+    )
+
+
+def run_batched(items: List[Any], fn: Callable[[Any], Any], batch_size: int, max_workers: int,
+                on_result: Optional[Callable[[int, Any], None]] = None) -> Dict[str, Any]:
+    """
+    Process items in fixed-size chunks, each on a fresh executor (the original behaviour)
+
+    Args:
+        items: Work items
+        fn: Function applied to each item
+        batch_size: Items per chunk; the next chunk starts only once the whole chunk is done
+        max_workers: Upper bound on threads per chunk
+        on_result: Called with (position, result) for every successful item
+
+    Returns:
+        Run statistics
+    """
+    stats = _new_stats("batch", len(items))
+    start_time = time.time()
+
+    for i in range(0, len(items), batch_size):
+        batch = items[i:i + batch_size]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(batch))) as executor:
+            futures = [executor.submit(fn, item) for item in batch]
+        for offset, future in enumerate(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Error processing question: {e}")
+                stats["failed"] += 1
+                continue
+            stats["completed"] += 1
+            if on_result:
+                on_result(i + offset, result)
+
+    return _finish_stats(stats, start_time)
+
+
+class StreamingScheduler:
+    """Long-lived worker pool fed from a queue, with per-item deadlines and cancellation"""
+
+    def __init__(self, max_workers: int = 4, timeout: Optional[float] = None, poll_interval: float = 0.5):
+        """
+        Initialize scheduler
+
+        Args:
+            max_workers: Number of worker threads (= items in flight)
+            timeout: Per-item deadline in seconds, measured from when the item starts running
+            poll_interval: How often running items are checked against their deadline
+        """
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        """Stop scheduling new items; items already running finish but their results are dropped"""
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def run(self, items: Iterable[Any], fn: Callable[[Any], Any],
+            on_result: Optional[Callable[[int, Any], None]] = None) -> Dict[str, Any]:
+        """
+        Process items as workers free up, reporting results in completion order
+
+        Args:
+            items: Work items
+            fn: Function applied to each item
+            on_result: Called with (position, result) for every successful item
+
+        Returns:
+            Run statistics
+        """
+        items = list(items)
+        stats = _new_stats("queue", len(items))
+        start_time = time.time()
+        started_at = {}
+
+        def run_item(position, item):
+            if self._cancel_event.is_set():
+                raise _Cancelled()
+            started_at[position] = time.time()
+            return fn(item)
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="question-worker")
+        try:
+            pending = {executor.submit(run_item, position, item): position for position, item in enumerate(items)}
+            while pending:
+                done, _ = wait(pending, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    position = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except _Cancelled:
+                        stats["cancelled"] += 1
+                        continue
+                    except Exception as e:
+                        print(f"Error processing question: {e}")
+                        stats["failed"] += 1
+                        continue
+                    if self._cancel_event.is_set():
+                        stats["cancelled"] += 1
+                        continue
+                    stats["completed"] += 1
+                    if on_result:
+                        on_result(position, result)
+
+                if self._cancel_event.is_set():
+                    for future in list(pending):
+                        if future.cancel():
+                            pending.pop(future)
+                            stats["cancelled"] += 1
+
+                if self.timeout is not None:
+                    now = time.time()
+                    for future, position in list(pending.items()):
+                        started = started_at.get(position)
+                        if started is not None and now - started > self.timeout and not future.done():
+                            # Threads cannot be interrupted; abandon the item and ignore its result
+                            pending.pop(future)
+                            stats["timed_out"] += 1
+                            print(f"Question {position} exceeded {self.timeout}s deadline, skipping")
+        except KeyboardInterrupt:
+            self.cancel()
+            raise
+        finally:
+            # Do not block on items that were abandoned after their deadline or a cancel
+            executor.shutdown(wait=not (self._cancel_event.is_set() or stats["timed_out"]), cancel_futures=True)
+
+        return _finish_stats(stats, start_time)
+
+
+class _Cancelled(Exception):
+    """Raised inside a worker when the scheduler was cancelled before the item started"""
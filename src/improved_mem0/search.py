@@ -1,14 +1,17 @@
 """
 Improved Mem0 Memory Search with Multi-Step Query Expansion and Cross-Encoder Reranking
 """
+import hashlib
 import json
 import os
 import sys
+import threading
 import time
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from pathlib import Path
 
+import numpy as np
 from dotenv import load_dotenv
 from jinja2 import Template
 from openai import OpenAI
@@ -22,56 +25,164 @@ sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from prompts_improved import ANSWER_PROMPT_IMPROVED, ANSWER_PROMPT_IMPROVED_GRAPH
 from src.improved_mem0.utils import (
     deduplicate_memories,
+    deduplicate_memories_semantic,
     consolidate_memories,
     extract_temporal_info,
-    calculate_temporal_proximity,
-    parse_temporal_expression,
     estimate_query_complexity
 )
+from src.improved_mem0.temporal import parse_epochs, temporal_proximity_scores
 from src.improved_mem0.multi_hop import MultiHopReasoning
+from src.improved_mem0.scheduler import StreamingScheduler, run_batched, format_throughput
+from src.improved_mem0.results_writer import (
+    ResultsWriter,
+    checkpoint_path_for,
+    compact_log,
+    load_completed_records,
+    question_key,
+    rewrite_log
+)
 from src.improved_mem0.memory_graph import MemoryGraph
+from src.improved_mem0.graph_store import GraphStore
+from src.improved_mem0.snapshot import SnapshotCache
+from src.improved_mem0.cache import CachedLLM, TieredCache
+from src.improved_mem0.embedding import QueryEmbedder, fetch_memory_embeddings, format_vector_hit
 
 load_dotenv()
 
+RERANK_MODES = ("chunked", "listwise")
+DEDUP_MODES = ("jaccard", "semantic")
+_CHARS_PER_TOKEN = 4  # Rough prompt-size estimate used for the listwise rerank token budget
+
+
+class TimedSearch:
+    """Callable wrapping one vector search that records when it actually starts running in a worker"""
+    
+    def __init__(self, fn, *args):
+        self.fn = fn
+        self.args = args
+        self.started = None  # Set by the worker, so time spent queued is not charged to the budget
+    
+    def __call__(self):
+        self.started = time.time()
+        return self.fn(*self.args)
+    
+    def remaining(self, timeout):
+        """Seconds left of the budget, or the whole budget while the search is still queued"""
+        if self.started is None:
+            return timeout
+        return max(0.0, self.started + timeout - time.time())
+    
+    def expired(self, timeout):
+        """Whether the search started and has run for at least timeout seconds"""
+        return self.started is not None and time.time() - self.started >= timeout
+
+
+class QueryPlan:
+    """Per-question retrieval plan, built once and shared by both speakers and later stages"""
+    
+    def __init__(self, query, top_k, complexity_info, temporal_info, expanded_queries):
+        self.query = query
+        self.top_k = top_k
+        self.complexity_info = complexity_info  # None when adaptive params are disabled
+        self.temporal_info = temporal_info
+        self.parsed_date = temporal_info.get("parsed_date")
+        self.expanded_queries = expanded_queries
+        self.rerank_stats = {"calls": 0, "time": 0.0}  # Summed over both speakers
+        self.query_vectors = None  # Embeddings of expanded_queries, computed in one batch
+
 
 class ImprovedMemorySearch:
     """Enhanced memory search with multi-step query expansion and cross-encoder reranking"""
     
     def __init__(self, output_path="results.json", top_k=10, filter_memories=False, is_graph=False, config=None, 
-                 enable_deduplication=True, enable_adaptive_params=True, batch_size=5, enable_multi_hop=True):
+                 enable_deduplication=True, enable_adaptive_params=True, batch_size=5, enable_multi_hop=True,
+                 search_workers=8, search_timeout=30, llm_cache=None, batch_embeddings=True, embedding_cache=None,
+                 rerank_mode="chunked", rerank_token_budget=3000, rerank_anchors=2, reranker=None,
+                 semantic_dedup_threshold=0.9, memory_versions=None, graph_path=None,
+                 graph_max_depth=2, graph_fanout=8, graph_top_k=20, graph_budget=0.2,
+                 graph_max_nodes=None, rerank_workers=4):
         # Use local Memory class instead of API client for local evaluation
         if config is None:
             config = MemoryConfig()
         self.memory = Memory(config=config)
-        self.base_top_k = top_k  # Base top_k, can be adjusted adaptively
+        self.base_top_k = top_k  # Base top_k, adjusted per query when adaptive params are enabled
         self.top_k = top_k
         # Use the LLM from config instead of OpenAI client
-        self.llm = self.memory.llm
+        self.llm_cache = llm_cache  # Optional TieredCache shared by expansion, rerank and answer calls
+        if llm_cache is not None:
+            self.llm = CachedLLM(self.memory.llm, llm_cache, model=self._llm_settings()[1])
+        else:
+            self.llm = self.memory.llm
         self.results = defaultdict(list)
         self.output_path = output_path
+        self.checkpoint_path = checkpoint_path_for(output_path)
         self.filter_memories = filter_memories
         self.is_graph = is_graph
+        # True / "jaccard": word-overlap dedup; "semantic": embedding cosine dedup; False disables
         self.enable_deduplication = enable_deduplication
+        self.dedup_mode = "jaccard" if enable_deduplication is True else (enable_deduplication or None)
+        if self.dedup_mode is not None and self.dedup_mode not in DEDUP_MODES:
+            raise ValueError(f"Invalid deduplication mode: {enable_deduplication}")
+        self.semantic_dedup_threshold = semantic_dedup_threshold
         self.enable_adaptive_params = enable_adaptive_params
         self.batch_size = batch_size  # For batch processing
+        # "listwise" scores all candidates in one request (or several concurrent, anchor-calibrated requests
+        # when the prompt would exceed rerank_token_budget); "chunked" sends one request per batch_size chunk
+        if rerank_mode not in RERANK_MODES:
+            raise ValueError(f"Invalid rerank mode: {rerank_mode}")
+        self.rerank_mode = rerank_mode
+        self.rerank_token_budget = rerank_token_budget
+        self.rerank_anchors = rerank_anchors
+        # Own small pool for listwise rerank requests split over the token budget, so LLM calls never
+        # queue behind (or hold up) other questions' vector searches on search_executor
+        self.rerank_executor = ThreadPoolExecutor(max_workers=rerank_workers, thread_name_prefix="memory-rerank")
+        # Optional rerankers.Reranker (e.g. CrossEncoderReranker) used instead of LLM scoring
+        self.reranker = reranker
         self.enable_multi_hop = enable_multi_hop
         self.multi_hop_reasoner = MultiHopReasoning(max_hops=2) if enable_multi_hop else None
+        # Each user's full memory set (and its multi-hop index) is fetched once per write version
+        self.snapshots = SnapshotCache(self.memory, versions=memory_versions)
+        # Graph store written by ImprovedMemoryADD, opened on first graph retrieval
+        self.graph_path = graph_path
+        self._graph_store = None
+        self._graph_store_lock = threading.Lock()
+        # Graph retrieval bounds: hops, strongest edges followed per node, relations returned, seconds,
+        # entities reached (None is unbounded)
+        self.graph_max_depth = graph_max_depth
+        self.graph_fanout = graph_fanout
+        self.graph_top_k = graph_top_k
+        self.graph_budget = graph_budget
+        self.graph_max_nodes = graph_max_nodes
+        # Shared, bounded pool for vector searches so expanded queries (for both speakers) run concurrently
+        # Seconds each expanded-query search (retries included) may run, counted from when a worker
+        # picks it up rather than from submission (None disables)
+        self.search_timeout = search_timeout
+        self.search_executor = ThreadPoolExecutor(max_workers=search_workers, thread_name_prefix="memory-search")
+        # Expanded queries are embedded together and searched with the precomputed vectors;
+        # embeddings are cached by normalized text (in memory unless a persistent TieredCache is given)
+        self.query_embedder = None
+        if batch_embeddings:
+            if embedding_cache is None:
+                embedding_cache = TieredCache(max_entries=10000, namespace="query_embeddings")
+            self.query_embedder = QueryEmbedder(self.memory.embedding_model, cache=embedding_cache)
+        self.scheduler = None  # StreamingScheduler of the current run, exposed so callers can cancel it
 
         if self.is_graph:
+            self._check_graph_path()
             self.ANSWER_PROMPT = ANSWER_PROMPT_IMPROVED_GRAPH
         else:
             self.ANSWER_PROMPT = ANSWER_PROMPT_IMPROVED
 
-    def expand_query(self, query, max_expansions=None, max_retries=3):
-        """Expand query into multiple related queries for better retrieval coverage"""
-        # Adaptive expansion count based on query complexity
+    def _resolve_max_expansions(self, query, max_expansions=None):
+        """Adaptive expansion count based on query complexity"""
         if self.enable_adaptive_params and max_expansions is None:
             complexity_info = estimate_query_complexity(query)
-            max_expansions = complexity_info["suggested_expansions"]
-        else:
-            max_expansions = max_expansions or 2
-        
-        expansion_prompt = f"""
+            return complexity_info["suggested_expansions"]
+        return max_expansions or 2
+
+    def _build_expansion_prompt(self, query, max_expansions):
+        """Build the query expansion prompt"""
+        return f"""
         Given the following question, generate {max_expansions} related queries that could help retrieve relevant information.
         Focus on:
         1. Temporal aspects (when, what date, time period)
@@ -83,6 +194,34 @@ class ImprovedMemorySearch:
         Return a JSON object with a "queries" key containing an array of query strings:
         {{"queries": ["query1", "query2", "query3"]}}
         """
+
+    def _parse_expansion_response(self, response, query, max_expansions):
+        """Parse an expansion response into the list of queries to search"""
+        expanded = json.loads(self._response_text(response))
+        queries = expanded.get("queries", [])
+        if not queries:
+            queries = [query]
+        # Always include original query
+        if query not in queries:
+            queries = [query] + queries
+        # Limit to max_expansions + 1 (original + expansions)
+        return queries[:max_expansions + 1]
+
+    @staticmethod
+    def _response_text(response):
+        """Handle different response formats"""
+        if isinstance(response, str):
+            return response
+        return response.choices[0].message.content
+
+    def _validated(self, parse):
+        """generate_response kwargs that keep responses parse() rejects out of the LLM cache"""
+        return {"validate": parse} if isinstance(self.llm, CachedLLM) else {}
+
+    def expand_query(self, query, max_expansions=None, max_retries=3):
+        """Expand query into multiple related queries for better retrieval coverage"""
+        max_expansions = self._resolve_max_expansions(query, max_expansions)
+        expansion_prompt = self._build_expansion_prompt(query, max_expansions)
         
         for attempt in range(max_retries):
             try:
@@ -91,79 +230,137 @@ class ImprovedMemorySearch:
                     messages=[{"role": "user", "content": expansion_prompt}],
                     response_format={"type": "json_object"},
                     temperature=0.3,
+                    **self._validated(lambda text: self._parse_expansion_response(text, query, max_expansions)),
                 )
-                # Handle different response formats
-                if isinstance(response, str):
-                    expanded = json.loads(response)
-                else:
-                    expanded = json.loads(response.choices[0].message.content)
-                queries = expanded.get("queries", [])
-                if not queries:
-                    queries = [query]
-                # Always include original query
-                if query not in queries:
-                    queries = [query] + queries
-                # Limit to max_expansions + 1 (original + expansions)
-                queries = queries[:max_expansions + 1]
-                return queries
+                return self._parse_expansion_response(response, query, max_expansions)
             except Exception as e:
                 if attempt < max_retries - 1:
                     time.sleep(0.5)
                     continue
                 return [query]
 
-    def search_memory_with_expansion(self, user_id, query, max_retries=3, retry_delay=1):
-        """Search memory with query expansion, deduplication, and enhanced temporal reasoning"""
-        start_time = time.time()
-        
+    def _plan_search(self, query):
+        """Compute adaptive parameters and temporal info for a question"""
         # Adaptive parameters based on query complexity
+        complexity_info = None
         if self.enable_adaptive_params:
             complexity_info = estimate_query_complexity(query)
-            self.top_k = complexity_info["suggested_top_k"]
+            top_k = complexity_info["suggested_top_k"]
             max_expansions = complexity_info["suggested_expansions"]
         else:
-            self.top_k = self.base_top_k
+            top_k = self.base_top_k
             max_expansions = None
         
         # Extract temporal information from query
         temporal_info = extract_temporal_info(query)
-        query_date = temporal_info.get("parsed_date")
+        
+        return top_k, max_expansions, complexity_info, temporal_info
+
+    def build_query_plan(self, query):
+        """Compute adaptive parameters, temporal info and expanded queries for a question once"""
+        top_k, max_expansions, complexity_info, temporal_info = self._plan_search(query)
         
         # Expand query
         expanded_queries = self.expand_query(query, max_expansions=max_expansions)
         
-        # Search with all queries (can be parallelized)
+        plan = QueryPlan(query, top_k, complexity_info, temporal_info, expanded_queries)
+        plan.query_vectors = self._embed_queries(expanded_queries)
+        return plan
+
+    def _embed_queries(self, queries):
+        """Embed all expanded queries in one batched encoder call (None when disabled or unavailable)"""
+        if self.query_embedder is None:
+            return None
+        try:
+            return self.query_embedder.embed_batch(queries)
+        except Exception as e:
+            print(f"Batched query embedding failed: {e}, embedding per search")
+            return None
+
+    def _run_vector_search(self, user_id, query, limit, vector=None):
+        """One vector-store lookup, reusing a precomputed query embedding when available"""
+        if vector is not None:
+            try:
+                # Memory.search always scopes results to the user_id
+                hits = self.memory.vector_store.search(
+                    query=query, vectors=vector, limit=limit, filters={"user_id": user_id}
+                )
+                return [format_vector_hit(hit) for hit in hits]
+            except (AttributeError, TypeError):
+                # Vector store without a compatible search(query, vectors, ...) API
+                pass
+        
+        memories = self.memory.search(
+            query, 
+            user_id=user_id, 
+            limit=limit,
+            filters={"user_id": user_id} if self.filter_memories else None
+        )
+        # Handle both list and dict formats from Memory class
+        if isinstance(memories, dict):
+            return memories.get("results", [])
+        return memories if isinstance(memories, list) else []
+
+    def _search_single_query(self, user_id, query, limit, max_retries=3, retry_delay=1, vector=None):
+        """Run one vector search with its own retry budget"""
+        retries = 0
+        while True:
+            try:
+                return self._run_vector_search(user_id, query, limit, vector)
+            except Exception as e:
+                retries += 1
+                if retries >= max_retries:
+                    raise e
+                time.sleep(retry_delay)
+
+    def _submit_searches(self, user_id, queries, limit, max_retries=3, retry_delay=1, vectors=None):
+        """
+        Submit the vector searches for all expanded queries to the shared search executor
+
+        Returns:
+            List of (future, TimedSearch) pairs in query order
+        """
+        vectors = vectors or [None] * len(queries)
+        submitted = []
+        for query, vector in zip(queries, vectors):
+            search = TimedSearch(
+                self._search_single_query, user_id, query, limit, max_retries, retry_delay, vector
+            )
+            submitted.append((self.search_executor.submit(search), search))
+        return submitted
+
+    def _wait_for_search(self, future, search):
+        """
+        Wait for one search within its own search_timeout budget
+
+        Returns:
+            The search's memories, or None if it ran past the budget. A timed-out search cannot be
+            cancelled once started: it keeps running, and holding a search_executor worker, until the
+            vector store returns.
+        """
+        if not self.search_timeout:
+            return future.result()
+        while True:
+            try:
+                return future.result(timeout=search.remaining(self.search_timeout))
+            except FutureTimeoutError:
+                # Still queued, or started partway through the wait: keep waiting on its own budget
+                if search.expired(self.search_timeout):
+                    future.cancel()
+                    print(f"Memory search timed out after {self.search_timeout}s, skipping query")
+                    return None
+
+    def _collect_searches(self, submitted):
+        """Merge search results in query order, dropping queries that exceed their timeout"""
         all_memories = []
         seen_memory_ids = set()
-        graph_relations = []  # Store graph relations if available
-        
-        for expanded_query in expanded_queries:
-            retries = 0
-            while retries < max_retries:
-                try:
-                    memories = self.memory.search(
-                        expanded_query, 
-                        user_id=user_id, 
-                        limit=self.top_k * 2,  # Get more for deduplication
-                        filters={"user_id": user_id} if self.filter_memories else None
-                    )
-                    # Convert to dict format for consistency
-                    if isinstance(memories, dict):
-                        memories = memories.get("results", [])
-                    break
-                except Exception as e:
-                    retries += 1
-                    if retries >= max_retries:
-                        raise e
-                    time.sleep(retry_delay)
+        
+        for future, search in submitted:
+            memory_list = self._wait_for_search(future, search)
+            if memory_list is None:
+                continue
             
             # Collect unique memories
-            # Handle both list and dict formats from Memory class
-            if isinstance(memories, dict):
-                memory_list = memories.get("results", [])
-            else:
-                memory_list = memories if isinstance(memories, list) else []
-            
             for memory in memory_list:
                 if not isinstance(memory, dict):
                     continue
@@ -176,53 +373,139 @@ class ImprovedMemorySearch:
             # Graph relations not supported in local Memory class for now
             # graph_relations.extend(relations)
         
+        return all_memories
+
+    def search_memory_with_expansion(self, user_id, query, max_retries=3, retry_delay=1, plan=None):
+        """Search memory with query expansion, deduplication, and enhanced temporal reasoning"""
+        start_time = time.time()
+        
+        if plan is None:
+            plan = self.build_query_plan(query)
+        
+        # Search with all queries concurrently
+        submitted = self._submit_searches(
+            user_id, plan.expanded_queries, plan.top_k * 2, max_retries, retry_delay,  # Get more for deduplication
+            vectors=plan.query_vectors
+        )
+        all_memories = self._collect_searches(submitted)
+        
+        semantic_memories, graph_memories = self._finalize_search(user_id, plan, all_memories)
+        
+        return semantic_memories, graph_memories, time.time() - start_time
+
+    def _finalize_search(self, user_id, plan, all_memories):
+        """Deduplicate, temporally boost, rerank and format retrieved memories"""
+        all_memories = self._prepare_candidates(all_memories, plan)
+        
+        # Rerank memories by relevance (simple scoring based on query match)
+        rerank_start = time.time()
+        all_memories = self.rerank_memories(plan.query, all_memories, stats=plan.rerank_stats)
+        plan.rerank_stats["time"] += time.time() - rerank_start
+        
+        return self._complete_search(user_id, plan, all_memories)
+
+    def _prepare_candidates(self, all_memories, plan):
+        """Deduplicate candidates and apply the temporal proximity boost"""
+        temporal_info = plan.temporal_info
+        query_date = plan.parsed_date
+        
         # Deduplicate memories
-        if self.enable_deduplication:
+        if self.dedup_mode == "semantic":
+            all_memories = self._semantic_deduplicate(all_memories)
+        elif self.dedup_mode == "jaccard":
             all_memories = deduplicate_memories(all_memories, similarity_threshold=0.75)
+        if self.dedup_mode is not None:
             all_memories = consolidate_memories(all_memories, max_consolidation=3)
         
         # Enhanced temporal reasoning - calculate temporal proximity scores
-        if temporal_info["has_temporal"] and query_date:
+        if temporal_info["has_temporal"] and query_date and all_memories:
+            timestamps = []
             for memory in all_memories:
                 metadata = memory.get("metadata", {})
-                if not isinstance(metadata, dict):
-                    metadata = {}
-                memory_timestamp = metadata.get("timestamp", "")
-                
-                if memory_timestamp:
-                    # Try to parse memory timestamp
-                    memory_date = parse_temporal_expression(memory_timestamp)
-                    if memory_date:
-                        temporal_proximity = calculate_temporal_proximity(memory_date, query_date)
-                        # Boost score with temporal proximity
-                        current_score = memory.get("score", 0.0)
-                        memory["temporal_proximity"] = temporal_proximity
-                        memory["score"] = current_score * (1 + temporal_proximity * 0.5)
+                timestamps.append(metadata.get("timestamp", "") if isinstance(metadata, dict) else "")
+            
+            # All candidates are scored in one pass; only memories with a parseable timestamp are boosted
+            epochs, parsed = parse_epochs(timestamps)
+            if parsed.any():
+                proximity = temporal_proximity_scores(epochs, query_date)
+                scores = np.array([memory.get("score", 0.0) for memory in all_memories], dtype=float)
+                boosted = scores * (1 + proximity * 0.5)
+                for i in np.flatnonzero(parsed):
+                    all_memories[i]["temporal_proximity"] = float(proximity[i])
+                    all_memories[i]["score"] = float(boosted[i])
         
-        # Rerank memories by relevance (simple scoring based on query match)
-        all_memories = self.rerank_memories(query, all_memories)
+        return all_memories
+
+    def _semantic_deduplicate(self, memories):
+        """Embedding dedup using the vectors the store already holds, embedding only what it cannot return"""
+        if len(memories) <= 1:
+            return memories
+        try:
+            embeddings = self._candidate_embeddings(memories)
+        except Exception as e:
+            print(f"Semantic deduplication failed: {e}, using word overlap")
+            return deduplicate_memories(memories, similarity_threshold=0.75)
+        return deduplicate_memories_semantic(memories, embeddings, similarity_threshold=self.semantic_dedup_threshold)
+
+    def _candidate_embeddings(self, memories):
+        """One embedding per candidate memory, attached to the memory dict or fetched from the vector store"""
+        ids = [memory.get("id") for memory in memories if memory.get("id") and memory.get("embedding") is None]
+        stored = fetch_memory_embeddings(self.memory.vector_store, ids)
+        
+        missing = [
+            i for i, memory in enumerate(memories)
+            if memory.get("embedding") is None and memory.get("id") not in stored
+        ]
+        computed = {}
+        if missing:
+            embedder = self.query_embedder or QueryEmbedder(self.memory.embedding_model)
+            texts = [memories[i].get("memory", "") or memories[i].get("text", "") for i in missing]
+            computed = dict(zip(missing, embedder.embed_batch(texts)))
         
+        return [
+            memory.get("embedding") if memory.get("embedding") is not None
+            else computed[i] if i in computed else stored[memory.get("id")]
+            for i, memory in enumerate(memories)
+        ]
+
+    def _check_graph_path(self):
+        """Fail instead of opening (and so creating) an empty graph store"""
+        if not self.graph_path or not os.path.exists(self.graph_path):
+            raise FileNotFoundError(
+                f"Memory graph store not found: {self.graph_path!r}; pass the graph_path the add run wrote"
+            )
+
+    @property
+    def graph_store(self):
+        """GraphStore with the users' entity graphs, opened lazily"""
+        with self._graph_store_lock:
+            if self._graph_store is None:
+                self._check_graph_path()
+                self._graph_store = GraphStore(self.graph_path)
+            return self._graph_store
+
+    def user_graph(self, user_id):
+        """The user's MemoryGraph, loaded from the graph store once per write version"""
+        return self.snapshots.get(user_id).memory_graph(self.graph_store)
+
+    def _complete_search(self, user_id, plan, all_memories):
+        """Apply multi-hop reasoning to reranked memories and format the final memory lists"""
+        query = plan.query
+        top_k = plan.top_k
         # Multi-hop reasoning if enabled
         if self.enable_multi_hop and self.multi_hop_reasoner:
             try:
-                # Get all memories for multi-hop reasoning
-                all_available_memories = self.memory.get_all(user_id=user_id) if hasattr(self.memory, 'get_all') else all_memories
-                
-                # Convert to format expected by multi-hop reasoner
-                formatted_memories = []
-                for mem in all_available_memories:
-                    if isinstance(mem, dict):
-                        formatted_memories.append(mem)
-                    else:
-                        formatted_memories.append({"memory": str(mem), "text": str(mem)})
+                # All of the user's memories, with the multi-hop index, from the per-user snapshot
+                snapshot = self.snapshots.get(user_id)
                 
                 # Perform multi-hop reasoning
                 chained_memories, reasoning_path = self.multi_hop_reasoner.answer_with_multi_hop(
-                    query, all_memories[:self.top_k], formatted_memories
+                    query, all_memories[:top_k], snapshot.memories,
+                    index=snapshot.multi_hop_index(self.multi_hop_reasoner)
                 )
                 
                 # Merge chained memories with original (deduplicate)
-                seen_ids = {mem.get("id") or str(hash(mem.get("memory", ""))) for mem in all_memories[:self.top_k]}
+                seen_ids = {mem.get("id") or str(hash(mem.get("memory", ""))) for mem in all_memories[:top_k]}
                 for chained_mem in chained_memories:
                     chained_id = chained_mem.get("id") or str(hash(chained_mem.get("memory", "")))
                     if chained_id not in seen_ids:
@@ -235,9 +518,7 @@ class ImprovedMemorySearch:
                 print(f"Multi-hop reasoning failed: {e}, using original memories")
         
         # Take top_k after reranking and multi-hop
-        all_memories = all_memories[:self.top_k]
-        
-        end_time = time.time()
+        all_memories = all_memories[:top_k]
         
         # Format semantic memories
         semantic_memories = []
@@ -261,37 +542,68 @@ class ImprovedMemorySearch:
         # Graph-based memory retrieval if available
         graph_memories = None
         if self.is_graph:
-            # Try to get graph from memory instance if available
-            # For now, we'll use entity-based search from graph
             try:
-                # Extract entities from query
-                query_entities = set()
-                for memory in semantic_memories[:5]:  # Use top memories to find entities
-                    memory_text = memory.get("memory", "")
-                    # Simple entity extraction
-                    import re
-                    entities = set(re.findall(r'\b[A-Z][a-z]+\b', memory_text))
-                    query_entities.update(entities)
-                
-                # If we have a memory graph, use it to find related memories
-                # This would require passing the graph from add.py
-                # For now, graph_memories remains None
-                graph_memories = []
+                graph_memories = self.retrieve_graph_relations(user_id, query, semantic_memories)
             except Exception as e:
                 print(f"Graph memory retrieval failed: {e}")
                 graph_memories = None
         
-        return semantic_memories, graph_memories, end_time - start_time
+        return semantic_memories, graph_memories
 
-    def rerank_memories(self, query, memories, batch_size=None):
-        """Rerank memories using cross-encoder style scoring with batch processing"""
+    def retrieve_graph_relations(self, user_id, query, semantic_memories):
+        """
+        Ranked relations around the question's entities from the user's memory graph
+        
+        Entities of the query and of the top 5 memories are mapped to graph nodes and expanded
+        breadth-first up to graph_max_depth hops, following at most graph_fanout of the strongest
+        edges per node, until graph_max_nodes entities are reached. A relation is returned in the
+        direction its memories state it and scores its edge strength discounted by hop distance;
+        expansion stops early once graph_budget seconds have passed.
+        
+        Returns:
+            Up to graph_top_k relations as {"source", "relationship", "target", "score"} dicts
+        """
+        deadline = time.time() + self.graph_budget if self.graph_budget else None
+        graph = self.user_graph(user_id)
+        
+        seeds = list(graph.extract_entities(query))
+        for memory in semantic_memories[:5]:  # Use top memories to find entities
+            seeds.extend(graph.extract_entities(memory.get("memory", "")))
+        
+        relations = graph.get_ranked_relations(
+            seeds, self.graph_max_depth, fanout=self.graph_fanout, max_nodes=self.graph_max_nodes,
+            deadline=deadline, top_k=self.graph_top_k
+        )
+        return [
+            {"source": source, "relationship": rel_type, "target": target, "score": round(score, 2)}
+            for source, rel_type, target, score in relations
+        ]
+
+    def rerank_memories(self, query, memories, batch_size=None, stats=None):
+        """
+        Rerank memories with the configured reranker, or LLM relevance scores
+
+        Args:
+            query: Original question
+            memories: Candidate memories
+            batch_size: Chunk size in chunked mode (defaults to self.batch_size)
+            stats: Optional dict whose "calls" counter is incremented by the number of rerank requests made
+        """
         if not memories:
             return memories
         
+        if self.reranker is not None:
+            self._count_rerank_calls(stats, 1)
+            return self._rerank_with_reranker(query, memories)
+        
+        if self.rerank_mode == "listwise":
+            return self._rerank_listwise(query, memories, stats)
+        
         batch_size = batch_size or self.batch_size
         
         # If memories fit in one batch, process all at once
         if len(memories) <= batch_size:
+            self._count_rerank_calls(stats, 1)
             return self._rerank_batch(query, memories)
         
         # Process in batches and merge results
@@ -300,18 +612,29 @@ class ImprovedMemorySearch:
             batch = memories[i:i + batch_size]
             reranked_batch = self._rerank_batch(query, batch)
             reranked_memories.extend(reranked_batch)
+            self._count_rerank_calls(stats, 1)
         
         # Final sort across all batches
         reranked_memories.sort(key=lambda x: x.get("rerank_score", x.get("score", 0.0)), reverse=True)
         return reranked_memories
-    
-    def _rerank_batch(self, query, memories):
-        """Rerank a batch of memories"""
-        if not memories:
+
+    def _rerank_with_reranker(self, query, memories):
+        """Rerank with self.reranker, keeping the original order by score if it fails"""
+        try:
+            return self.reranker.rerank(query, memories)
+        except Exception as e:
+            print(f"Reranking failed: {e}, using original scores")
+            memories.sort(key=lambda x: x.get("score", 0.0), reverse=True)
             return memories
-        
-        # Use LLM to score relevance
-        scoring_prompt = f"""
+
+    @staticmethod
+    def _count_rerank_calls(stats, calls):
+        if stats is not None:
+            stats["calls"] += calls
+    
+    def _build_rerank_prompt(self, query, memories):
+        """Build the LLM relevance scoring prompt for a batch of memories"""
+        return f"""
         Given the query and a list of memories, score each memory's relevance to the query.
         Query: {query}
         
@@ -321,6 +644,35 @@ class ImprovedMemorySearch:
         Return a JSON object with memory IDs as keys and relevance scores (0-1) as values:
         {{"0": 0.9, "1": 0.7, ...}}
         """
+
+    def _parse_rerank_scores(self, response):
+        """Parse a rerank response into {position in batch: score}, skipping malformed entries"""
+        scores = {}
+        for key, value in json.loads(self._response_text(response)).items():
+            try:
+                scores[int(key)] = float(value)
+            except (TypeError, ValueError):
+                continue
+        return scores
+
+    def _apply_rerank_response(self, response, memories):
+        """Attach LLM relevance scores to a batch and sort it"""
+        scores = self._parse_rerank_scores(response)
+        
+        # Update memory scores and sort
+        for i, memory in enumerate(memories):
+            memory["rerank_score"] = scores.get(i, memory.get("score", 0.0))
+        
+        memories.sort(key=lambda x: x.get("rerank_score", 0.0), reverse=True)
+        return memories
+
+    def _rerank_batch(self, query, memories):
+        """Rerank a batch of memories"""
+        if not memories:
+            return memories
+        
+        # Use LLM to score relevance
+        scoring_prompt = self._build_rerank_prompt(query, memories)
         
         try:
             # Use the LLM from memory config
@@ -328,18 +680,9 @@ class ImprovedMemorySearch:
                 messages=[{"role": "user", "content": scoring_prompt}],
                 response_format={"type": "json_object"},
                 temperature=0.0,
+                **self._validated(self._parse_rerank_scores),
             )
-            # Handle different response formats
-            if isinstance(response, str):
-                scores = json.loads(response)
-            else:
-                scores = json.loads(response.choices[0].message.content)
-            
-            # Update memory scores and sort
-            for i, memory in enumerate(memories):
-                memory["rerank_score"] = scores.get(str(i), memory.get("score", 0.0))
-            
-            memories.sort(key=lambda x: x.get("rerank_score", 0.0), reverse=True)
+            self._apply_rerank_response(response, memories)
         except Exception as e:
             print(f"Reranking failed: {e}, using original scores")
             # Fallback to original scores
@@ -347,32 +690,124 @@ class ImprovedMemorySearch:
         
         return memories
 
-    def apply_temporal_attention(self, memories, query):
+    def _listwise_groups(self, query, memories):
+        """
+        Split candidates into as few rerank requests as fit the token budget
+
+        When more than one request is needed, the highest-scoring candidates are included in every
+        request as anchors so the requests' scores can be calibrated against each other.
+
+        Returns:
+            Tuple of (list of candidate index groups, anchor indices)
+        """
+        def tokens(text):
+            return len(text) // _CHARS_PER_TOKEN + 1
+
+        prompt_tokens = tokens(self._build_rerank_prompt(query, []))
+        memory_tokens = [
+            tokens(json.dumps({"id": i, "memory": m.get("memory", "") or m.get("text", "")}, indent=2))
+            for i, m in enumerate(memories)
+        ]
+        if prompt_tokens + sum(memory_tokens) <= self.rerank_token_budget:
+            return [list(range(len(memories)))], []
+
+        by_score = sorted(range(len(memories)), key=lambda i: memories[i].get("score", 0.0), reverse=True)
+        anchors = by_score[:self.rerank_anchors]
+        anchor_set = set(anchors)
+        base_tokens = prompt_tokens + sum(memory_tokens[i] for i in anchors)
+
+        groups = []
+        current = []
+        size = base_tokens
+        for i in range(len(memories)):
+            if i in anchor_set:
+                continue
+            if current and size + memory_tokens[i] > self.rerank_token_budget:
+                groups.append(anchors + current)
+                current = []
+                size = base_tokens
+            current.append(i)
+            size += memory_tokens[i]
+        if current:
+            groups.append(anchors + current)
+        return groups, anchors
+
+    def _request_rerank_scores(self, query, group_memories):
+        """Score one listwise request; None when the request or its response fails"""
+        try:
+            response = self.llm.generate_response(
+                messages=[{"role": "user", "content": self._build_rerank_prompt(query, group_memories)}],
+                response_format={"type": "json_object"},
+                temperature=0.0,
+                **self._validated(self._parse_rerank_scores),
+            )
+            return self._parse_rerank_scores(response)
+        except Exception as e:
+            print(f"Reranking failed: {e}, using original scores")
+            return None
+
+    def _apply_listwise_scores(self, memories, groups, anchors, group_scores):
+        """
+        Merge listwise scores into one calibrated ranking
+
+        Each request's scores are shifted so its anchors' mean matches that of the first successful
+        request. Candidates without a usable score keep their original score.
+        """
+        rerank_scores = {}
+        reference = None
+        for group, scores in zip(groups, group_scores):
+            if not scores:
+                continue
+            local = {i: scores[pos] for pos, i in enumerate(group) if pos in scores}
+            offset = 0.0
+            anchor_scores = [local[i] for i in anchors if i in local]
+            if anchor_scores:
+                anchor_mean = sum(anchor_scores) / len(anchor_scores)
+                if reference is None:
+                    reference = anchor_mean
+                offset = reference - anchor_mean
+            for i, score in local.items():
+                rerank_scores.setdefault(i, score + offset)
+
+        for i, memory in enumerate(memories):
+            memory["rerank_score"] = rerank_scores.get(i, memory.get("score", 0.0))
+        memories.sort(key=lambda x: x.get("rerank_score", 0.0), reverse=True)
+        return memories
+
+    def _rerank_listwise(self, query, memories, stats=None):
+        """Rerank all candidates in one request, or concurrent anchor-calibrated requests over the budget"""
+        groups, anchors = self._listwise_groups(query, memories)
+        group_memories = [[memories[i] for i in group] for group in groups]
+        if len(groups) == 1:
+            group_scores = [self._request_rerank_scores(query, group_memories[0])]
+        else:
+            group_scores = list(self.rerank_executor.map(
+                lambda group: self._request_rerank_scores(query, group), group_memories
+            ))
+        self._count_rerank_calls(stats, len(groups))
+        return self._apply_listwise_scores(memories, groups, anchors, group_scores)
+
+    def apply_temporal_attention(self, memories, query, temporal_info=None):
         """Apply enhanced temporal attention weighting to memories"""
-        # Extract temporal information
-        temporal_info = extract_temporal_info(query)
+        # Extract temporal information unless the query plan already has it
+        if temporal_info is None:
+            temporal_info = extract_temporal_info(query)
         query_date = temporal_info.get("parsed_date")
         
         if not temporal_info["has_temporal"]:
             return memories
         
-        # Enhanced temporal weighting with proximity calculation
-        for memory in memories:
-            timestamp = memory.get("timestamp", "")
-            if timestamp and query_date:
-                # Parse memory timestamp
-                memory_date = parse_temporal_expression(timestamp)
-                if memory_date:
-                    # Calculate temporal proximity
-                    proximity = calculate_temporal_proximity(memory_date, query_date)
-                    memory["temporal_weight"] = 1.0 + (proximity * 0.5)  # 1.0 to 1.5
-                else:
-                    memory["temporal_weight"] = 1.3  # Default boost for temporal queries
-            elif timestamp:
-                # Has timestamp but no query date - still boost
-                memory["temporal_weight"] = 1.3
-            else:
-                memory["temporal_weight"] = 1.0
+        # Enhanced temporal weighting with proximity calculation, for all memories at once
+        timestamps = [memory.get("timestamp", "") for memory in memories]
+        # Memories with a timestamp get the default boost for temporal queries unless it can be compared
+        weights = np.where([bool(timestamp) for timestamp in timestamps], 1.3, 1.0)
+        if query_date and memories:
+            epochs, parsed = parse_epochs(timestamps)
+            if parsed.any():
+                proximity = temporal_proximity_scores(epochs, query_date)
+                weights = np.where(parsed, 1.0 + (proximity * 0.5), weights)  # 1.0 to 1.5
+        for memory, weight in zip(memories, weights.tolist()):
+            memory["temporal_weight"] = weight
         
         # Re-sort with temporal weighting
         memories.sort(
@@ -382,31 +817,46 @@ class ImprovedMemorySearch:
         
         return memories
 
-    def answer_question(self, speaker_1_user_id, speaker_2_user_id, question, answer, category):
+    def answer_question(self, speaker_1_user_id, speaker_2_user_id, question, answer, category, max_retries=3, retry_delay=1):
         """Answer question using improved search"""
-        speaker_1_memories, speaker_1_graph_memories, speaker_1_memory_time = self.search_memory_with_expansion(
-            speaker_1_user_id, question
+        # Expansion, complexity and temporal parsing are done once per question for both speakers
+        plan_start = time.time()
+        plan = self.build_query_plan(question)
+        plan_time = time.time() - plan_start
+        
+        # Fan out every expanded query for both speakers at once, then merge each speaker in query order
+        search_start = time.time()
+        limit = plan.top_k * 2
+        speaker_1_searches = self._submit_searches(
+            speaker_1_user_id, plan.expanded_queries, limit, max_retries, retry_delay, vectors=plan.query_vectors
+        )
+        speaker_2_searches = self._submit_searches(
+            speaker_2_user_id, plan.expanded_queries, limit, max_retries, retry_delay, vectors=plan.query_vectors
+        )
+        speaker_1_candidates = self._collect_searches(speaker_1_searches)
+        speaker_2_candidates = self._collect_searches(speaker_2_searches)
+        search_time = time.time() - search_start
+        
+        t = time.time()
+        speaker_1_memories, speaker_1_graph_memories = self._finalize_search(
+            speaker_1_user_id, plan, speaker_1_candidates
         )
-        speaker_2_memories, speaker_2_graph_memories, speaker_2_memory_time = self.search_memory_with_expansion(
-            speaker_2_user_id, question
+        speaker_1_memory_time = plan_time + search_time + (time.time() - t)
+        
+        t = time.time()
+        speaker_2_memories, speaker_2_graph_memories = self._finalize_search(
+            speaker_2_user_id, plan, speaker_2_candidates
         )
+        speaker_2_memory_time = plan_time + search_time + (time.time() - t)
         
         # Apply temporal attention
-        speaker_1_memories = self.apply_temporal_attention(speaker_1_memories, question)
-        speaker_2_memories = self.apply_temporal_attention(speaker_2_memories, question)
+        speaker_1_memories = self.apply_temporal_attention(speaker_1_memories, question, plan.temporal_info)
+        speaker_2_memories = self.apply_temporal_attention(speaker_2_memories, question, plan.temporal_info)
 
-        search_1_memory = [f"{item['timestamp']}: {item['memory']}" for item in speaker_1_memories]
-        search_2_memory = [f"{item['timestamp']}: {item['memory']}" for item in speaker_2_memories]
-
-        template = Template(self.ANSWER_PROMPT)
-        answer_prompt = template.render(
-            speaker_1_user_id=speaker_1_user_id.split("_")[0],
-            speaker_2_user_id=speaker_2_user_id.split("_")[0],
-            speaker_1_memories=json.dumps(search_1_memory, indent=4),
-            speaker_2_memories=json.dumps(search_2_memory, indent=4),
-            speaker_1_graph_memories=json.dumps(speaker_1_graph_memories, indent=4) if speaker_1_graph_memories else "[]",
-            speaker_2_graph_memories=json.dumps(speaker_2_graph_memories, indent=4) if speaker_2_graph_memories else "[]",
-            question=question,
+        answer_prompt = self._render_answer_prompt(
+            speaker_1_user_id, speaker_2_user_id, question,
+            speaker_1_memories, speaker_2_memories,
+            speaker_1_graph_memories, speaker_2_graph_memories,
         )
 
         t1 = time.time()
@@ -418,14 +868,8 @@ class ImprovedMemorySearch:
         t2 = time.time()
         response_time = t2 - t1
         
-        # Handle different response formats
-        if isinstance(response, str):
-            response_content = response
-        else:
-            response_content = response.choices[0].message.content
-        
         return (
-            response_content,
+            self._response_text(response),
             speaker_1_memories,
             speaker_2_memories,
             speaker_1_memory_time,
@@ -433,6 +877,24 @@ class ImprovedMemorySearch:
             speaker_1_graph_memories,
             speaker_2_graph_memories,
             response_time,
+            plan.rerank_stats,
+        )
+
+    def _render_answer_prompt(self, speaker_1_user_id, speaker_2_user_id, question, speaker_1_memories,
+                              speaker_2_memories, speaker_1_graph_memories, speaker_2_graph_memories):
+        """Render the answer prompt from both speakers' memories"""
+        search_1_memory = [f"{item['timestamp']}: {item['memory']}" for item in speaker_1_memories]
+        search_2_memory = [f"{item['timestamp']}: {item['memory']}" for item in speaker_2_memories]
+
+        template = Template(self.ANSWER_PROMPT)
+        return template.render(
+            speaker_1_user_id=speaker_1_user_id.split("_")[0],
+            speaker_2_user_id=speaker_2_user_id.split("_")[0],
+            speaker_1_memories=json.dumps(search_1_memory, indent=4),
+            speaker_2_memories=json.dumps(search_2_memory, indent=4),
+            speaker_1_graph_memories=json.dumps(speaker_1_graph_memories, indent=4) if speaker_1_graph_memories else "[]",
+            speaker_2_graph_memories=json.dumps(speaker_2_graph_memories, indent=4) if speaker_2_graph_memories else "[]",
+            question=question,
         )
 
     def process_question(self, val, speaker_a_user_id, speaker_b_user_id):
@@ -440,9 +902,12 @@ class ImprovedMemorySearch:
         question = val.get("question", "")
         answer = val.get("answer", "")
         category = val.get("category", -1)
-        evidence = val.get("evidence", [])
-        adversarial_answer = val.get("adversarial_answer", "")
 
+        answer_output = self.answer_question(speaker_a_user_id, speaker_b_user_id, question, answer, category)
+        return self._build_result(val, answer_output)
+
+    def _build_result(self, val, answer_output):
+        """Build the result record for a question from the answer_question output"""
         (
             response,
             speaker_1_memories,
@@ -452,15 +917,16 @@ class ImprovedMemorySearch:
             speaker_1_graph_memories,
             speaker_2_graph_memories,
             response_time,
-        ) = self.answer_question(speaker_a_user_id, speaker_b_user_id, question, answer, category)
+            rerank_stats,
+        ) = answer_output
 
-        result = {
-            "question": question,
-            "answer": answer,
-            "category": category,
-            "evidence": evidence,
+        return {
+            "question": val.get("question", ""),
+            "answer": val.get("answer", ""),
+            "category": val.get("category", -1),
+            "evidence": val.get("evidence", []),
             "response": response,
-            "adversarial_answer": adversarial_answer,
+            "adversarial_answer": val.get("adversarial_answer", ""),
             "speaker_1_memories": speaker_1_memories,
             "speaker_2_memories": speaker_2_memories,
             "num_speaker_1_memories": len(speaker_1_memories),
@@ -470,18 +936,48 @@ class ImprovedMemorySearch:
             "speaker_1_graph_memories": speaker_1_graph_memories,
             "speaker_2_graph_memories": speaker_2_graph_memories,
             "response_time": response_time,
+            "rerank_calls": rerank_stats["calls"],
+            "rerank_time": rerank_stats["time"],
         }
 
-        # Save results after each question
-        with open(self.output_path, "w") as f:
-            json.dump(self.results, f, indent=4)
+    def _llm_settings(self):
+        """(provider, model) of the configured LLM"""
+        llm_config = getattr(getattr(self.memory, "config", None), "llm", None)
+        return getattr(llm_config, "provider", None), (getattr(llm_config, "config", None) or {}).get("model")
 
-        return result
+    def config_fingerprint(self):
+        """Short hash of the settings that affect answers, used to key resumable results"""
+        llm_provider, llm_model = self._llm_settings()
+        settings = {
+            "top_k": self.base_top_k,
+            "filter_memories": self.filter_memories,
+            "is_graph": self.is_graph,
+            "enable_deduplication": self.enable_deduplication,
+            "semantic_dedup_threshold": self.semantic_dedup_threshold if self.dedup_mode == "semantic" else None,
+            "graph_retrieval": (
+                [self.graph_max_depth, self.graph_fanout, self.graph_top_k]
+                + ([self.graph_max_nodes] if self.graph_max_nodes is not None else [])
+                if self.is_graph else None
+            ),
+            "enable_adaptive_params": self.enable_adaptive_params,
+            "batch_size": self.batch_size,
+            "rerank_mode": self.rerank_mode if self.reranker is None else None,
+            "rerank_token_budget": (
+                self.rerank_token_budget if self.reranker is None and self.rerank_mode == "listwise" else None
+            ),
+            "reranker": self.reranker.name if self.reranker is not None else "llm",
+            "enable_multi_hop": self.enable_multi_hop,
+            "llm_provider": llm_provider,
+            "llm_model": llm_model,
+            "answer_prompt": hashlib.sha1(self.ANSWER_PROMPT.encode()).hexdigest(),
+        }
+        return hashlib.sha1(json.dumps(settings, sort_keys=True, default=str).encode()).hexdigest()[:12]
 
-    def process_data_file(self, file_path, max_workers=4):
-        """Process all questions in the dataset with batch processing optimizations"""
+    def _load_questions(self, file_path):
+        """Flatten the dataset into a list of questions with their speaker user ids and resume keys"""
         with open(file_path, "r") as f:
             data = json.load(f)
+        fingerprint = self.config_fingerprint()
 
         # Collect all questions for batch processing
         all_questions = []
@@ -497,45 +993,117 @@ class ImprovedMemorySearch:
             for question_item in qa:
                 all_questions.append({
                     "idx": idx,
+                    "position": len(all_questions),
+                    "key": question_key(
+                        idx, question_item.get("question", ""), question_item.get("category", -1), fingerprint
+                    ),
                     "question_item": question_item,
                     "speaker_a_user_id": speaker_a_user_id,
                     "speaker_b_user_id": speaker_b_user_id
                 })
+        return all_questions
+
+    def _start_results_log(self, all_questions, resume=False):
+        """
+        Open the checkpoint log and work out which questions still need answering
+
+        With resume, answers recorded by an earlier run under the same config fingerprint are carried
+        over into the fresh log and their questions are skipped.
+
+        Returns:
+            Tuple of (writer, remaining questions)
+        """
+        if not resume:
+            return ResultsWriter(self.checkpoint_path).start(), all_questions
+
+        records = {record["key"]: record for record in load_completed_records(self.checkpoint_path)}
+        remaining = []
+        carried_over = []
+        for item in all_questions:
+            record = records.get(item["key"])
+            if record is None:
+                remaining.append(item)
+            else:
+                carried_over.append(self._log_record(item, record["result"]))
+
+        # Drop records from other configs or questions no longer in the dataset before appending
+        rewrite_log(self.checkpoint_path, carried_over)
+        writer = ResultsWriter(self.checkpoint_path, append=True).start()
+        print(f"Resuming: {len(carried_over)} questions already answered, {len(remaining)} remaining")
+        return writer, remaining
+
+    @staticmethod
+    def _log_record(item, result):
+        """Checkpoint log record for an answered question"""
+        return {"key": item["key"], "idx": item["idx"], "position": item["position"], "result": result}
+
+    def process_data_file(self, file_path, max_workers=4, scheduler="queue", question_timeout=None, resume=False):
+        """
+        Process all questions in the dataset
+
+        Args:
+            file_path: Path to the dataset
+            max_workers: Number of questions processed concurrently
+            scheduler: "queue" feeds one long-lived worker pool and collects results as they finish;
+                "batch" processes batch_size chunks with a barrier between them
+            question_timeout: Per-question deadline in seconds (queue mode only)
+            resume: Skip questions already answered under the same config in the checkpoint log
+                (or an existing results file)
+
+        Returns:
+            Scheduler run statistics (throughput, failures, timeouts)
+        """
+        if scheduler not in ("queue", "batch"):
+            raise ValueError(f"Invalid scheduler: {scheduler}")
+        all_questions = self._load_questions(file_path)
 
-        # Process questions in batches with parallel execution
         def process_single_question(item):
-            try:
-                result = self.process_question(
-                    item["question_item"],
-                    item["speaker_a_user_id"],
-                    item["speaker_b_user_id"]
-                )
-                return (item["idx"], result)
-            except Exception as e:
-                print(f"Error processing question: {e}")
-                return None
+            result = self.process_question(
+                item["question_item"],
+                item["speaker_a_user_id"],
+                item["speaker_b_user_id"]
+            )
+            return (item, result)
 
-        # Process in batches
-        for i in tqdm(range(0, len(all_questions), self.batch_size), desc="Processing question batches"):
-            batch = all_questions[i:i + self.batch_size]
-            
-            # Use ThreadPoolExecutor for parallel processing within batch
-            with ThreadPoolExecutor(max_workers=min(max_workers, len(batch))) as executor:
-                batch_results = list(executor.map(process_single_question, batch))
-            
-            # Collect results and save
-            for result in batch_results:
-                if result is not None:
-                    idx, question_result = result
-                    if idx not in self.results:
-                        self.results[idx] = []
-                    self.results[idx].append(question_result)
-            
-            # Save results after each batch
-            with open(self.output_path, "w") as f:
-                json.dump(self.results, f, indent=4)
+        # Each answer is appended to the checkpoint log; the results file is compacted from it at the end
+        writer, pending_questions = self._start_results_log(all_questions, resume=resume)
+        progress = tqdm(total=len(pending_questions), desc="Processing questions")
+
+        def collect(_, result):
+            item, question_result = result
+            writer.write(self._log_record(item, question_result))
+            progress.update(1)
+            # fsync every batch_size completed questions
+            if progress.n % self.batch_size == 0:
+                writer.checkpoint()
+
+        try:
+            if scheduler == "batch":
+                stats = run_batched(pending_questions, process_single_question, self.batch_size, max_workers,
+                                    on_result=collect)
+            else:
+                self.scheduler = StreamingScheduler(max_workers=max_workers, timeout=question_timeout)
+                stats = self.scheduler.run(pending_questions, process_single_question, on_result=collect)
+        finally:
+            progress.close()
+            writer.close()
 
-        # Final save
-        with open(self.output_path, "w") as f:
-            json.dump(self.results, f, indent=4)
+        self.results = compact_log(self.checkpoint_path, self.output_path)
+        print(format_throughput(stats))
+        self._report_run_stats()
+        return stats
 
+    def _report_run_stats(self):
+        """Print per-question rerank cost and LLM / query-embedding cache hit rates"""
+        results = [result for question_results in self.results.values() for result in question_results]
+        if results:
+            calls = sum(result.get("rerank_calls", 0) for result in results) / len(results)
+            seconds = sum(result.get("rerank_time", 0.0) for result in results) / len(results)
+            mode = self.reranker.name if self.reranker is not None else self.rerank_mode
+            print(f"Rerank ({mode}): {calls:.1f} requests, {seconds:.2f}s per question")
+        if self.llm_cache is not None:
+            print(f"LLM cache: {self.llm_cache.stats()}")
+        if self.query_embedder is not None:
+            print(f"Query embeddings: {self.query_embedder.stats()}")
+        if self.enable_multi_hop:
+            print(f"Memory snapshots: {self.snapshots.stats()}")
@@ -0,0 +1,185 @@
+"""
+Versioned per-user memory snapshots
+Multi-hop reasoning needs a user's full memory set on every question, and graph retrieval the
+user's entity graph. A snapshot holds both (with the prebuilt multi-hop index), each loaded on first
+use, until ImprovedMemoryADD writes for the user, which bumps the user's version in a
+MemoryVersions registry and invalidates the snapshot.
+"""
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+class MemoryVersions:
+    """Per-user write counters, in memory or in a SQLite file shared by add and search processes"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Initialize registry
+
+        Args:
+            db_path: SQLite file for the counters (None keeps them in this process only)
+        """
+        self.db_path = db_path
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._conn = None
+        if db_path:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS memory_versions (user_id TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get(self, user_id: str) -> int:
+        with self._lock:
+            if self._conn is None:
+                return self._versions.get(user_id, 0)
+            row = self._conn.execute(
+                "SELECT version FROM memory_versions WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            return row[0] if row else 0
+
+    def bump(self, user_id: str) -> int:
+        """Record a write for the user and return the new version"""
+        with self._lock:
+            if self._conn is None:
+                self._versions[user_id] = self._versions.get(user_id, 0) + 1
+                return self._versions[user_id]
+            self._conn.execute(
+                "INSERT INTO memory_versions (user_id, version) VALUES (?, 1) "
+                "ON CONFLICT(user_id) DO UPDATE SET version = version + 1",
+                (user_id,),
+            )
+            self._conn.commit()
+            return self._conn.execute(
+                "SELECT version FROM memory_versions WHERE user_id = ?", (user_id,)
+            ).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Registry shared by ImprovedMemoryADD and ImprovedMemorySearch instances in this process
+memory_versions = MemoryVersions()
+
+
+def normalize_memories(memories) -> List[Dict[str, Any]]:
+    """Memory dicts from a get_all / search result in any of mem0's return formats"""
+    if isinstance(memories, dict):
+        memories = memories.get("results", [])
+    formatted = []
+    for memory in memories or []:
+        if isinstance(memory, dict):
+            formatted.append(memory)
+        else:
+            formatted.append({"memory": str(memory), "text": str(memory)})
+    return formatted
+
+
+class UserSnapshot:
+    """A user's memories and graph at one version, each loaded or built on first use"""
+
+    def __init__(self, user_id: str, version: int, load_memories):
+        """
+        Initialize snapshot
+
+        Args:
+            user_id: User the snapshot belongs to
+            version: User's write version the snapshot reflects
+            load_memories: Callable returning the user's memories in any mem0 format
+        """
+        self.user_id = user_id
+        self.version = version
+        self._load_memories = load_memories
+        self._memories = None
+        self._multi_hop_index = None
+        self._memory_graph = None
+        # Reentrant: multi_hop_index loads memories while holding it
+        self._lock = threading.RLock()
+
+    @property
+    def memories(self) -> List[Dict[str, Any]]:
+        """All of the user's memories, fetched once"""
+        with self._lock:
+            if self._memories is None:
+                self._memories = normalize_memories(self._load_memories())
+            return self._memories
+
+    def multi_hop_index(self, reasoner):
+        """MultiHopIndex over the memories (entity sets, word sets and postings), built once"""
+        with self._lock:
+            if self._multi_hop_index is None:
+                self._multi_hop_index = reasoner.build_index(self.memories)
+            return self._multi_hop_index
+
+    def memory_graph(self, graph_store):
+        """The user's MemoryGraph, loaded once from a GraphStore and frozen for traversal"""
+        with self._lock:
+            if self._memory_graph is None:
+                self._memory_graph = graph_store.load_graph(self.user_id).freeze()
+            return self._memory_graph
+
+
+class SnapshotCache:
+    """LRU of per-user snapshots, refetched only when the user's version changes"""
+
+    def __init__(self, memory, versions: Optional[MemoryVersions] = None, max_users: int = 64):
+        """
+        Initialize cache
+
+        Args:
+            memory: mem0 Memory instance to fetch from
+            versions: Write counters to validate snapshots against (defaults to the process registry)
+            max_users: Number of user snapshots kept
+        """
+        self.memory = memory
+        self.versions = versions or memory_versions
+        self.max_users = max_users
+        self._snapshots = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str) -> UserSnapshot:
+        """Current snapshot of the user; concurrent users of one snapshot share its single fetch"""
+        version = self.versions.get(user_id)
+        with self._lock:
+            snapshot = self._snapshots.get(user_id)
+            if snapshot is not None and snapshot.version == version:
+                self._snapshots.move_to_end(user_id)
+                self.hits += 1
+                return snapshot
+            self.misses += 1
+
+            snapshot = UserSnapshot(user_id, version, lambda: self.memory.get_all(user_id=user_id))
+            self._snapshots[user_id] = snapshot
+            while len(self._snapshots) > self.max_users:
+                self._snapshots.popitem(last=False)
+            return snapshot
+
+    def invalidate(self, user_id: Optional[str] = None):
+        """Drop one user's snapshot, or all of them"""
+        with self._lock:
+            if user_id is None:
+                self._snapshots.clear()
+            else:
+                self._snapshots.pop(user_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "users": len(self._snapshots),
+        }
@@ -0,0 +1,219 @@
+"""
+Temporal expression parsing
+Relative expressions ("3 months ago", "last week", "yesterday") are found with one precompiled
+alternation regex, LoCoMo session timestamps ("1:56 pm on 8 May, 2023") with a dedicated
+recognizer, and absolute dates are only handed to strptime when their shape can match the format.
+Parses are memoized per input string as reference-independent specs; the reference date is applied
+per call. Candidate sets are scored for temporal proximity in one NumPy pass over their timestamps.
+"""
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Relative expressions in priority order: when several occur in a text, the first alternative wins,
+# as it did when each pattern was searched in turn
+_RELATIVE_UNITS = [
+    ("seconds", r"(?:seconds?|secs?)", lambda n: timedelta(seconds=n)),
+    ("minutes", r"(?:minutes?|mins?)", lambda n: timedelta(minutes=n)),
+    ("hours", r"(?:hours?|hrs?)", lambda n: timedelta(hours=n)),
+    ("days", r"(?:days?)", lambda n: timedelta(days=n)),
+    ("weeks", r"(?:weeks?)", lambda n: timedelta(weeks=n)),
+    ("months", r"(?:months?)", lambda n: timedelta(days=n * 30)),
+    ("years", r"(?:years?)", lambda n: timedelta(days=n * 365)),
+]
+_RELATIVE_WORDS = [
+    ("yesterday", r"yesterday", timedelta(days=1)),
+    ("today", r"today", timedelta(0)),
+    ("last_week", r"last\s+week", timedelta(weeks=1)),
+    ("last_month", r"last\s+month", timedelta(days=30)),
+    ("last_year", r"last\s+year", timedelta(days=365)),
+]
+_RELATIVE_PRIORITY = {
+    name: i for i, name in enumerate([name for name, _, _ in _RELATIVE_UNITS] + [name for name, _, _ in _RELATIVE_WORDS])
+}
+_UNIT_OFFSETS = {name: offset for name, _, offset in _RELATIVE_UNITS}
+_WORD_OFFSETS = {name: offset for name, _, offset in _RELATIVE_WORDS}
+
+# Wrapped in a lookahead so matches are reported at every position, overlapping or not; no two
+# alternatives can match at the same position, so each match names the only expression there
+_RELATIVE_PATTERN = re.compile(
+    "(?=(?:"
+    + "|".join(
+        [rf"(?P<{name}>\d+)\s*{unit}\s*ago" for name, unit, _ in _RELATIVE_UNITS]
+        + [rf"(?P<{name}>{pattern})" for name, pattern, _ in _RELATIVE_WORDS]
+    )
+    + "))"
+)
+
+_MONTHS = {
+    name: i + 1
+    for i, names in enumerate([
+        ("january", "jan"), ("february", "feb"), ("march", "mar"), ("april", "apr"), ("may",),
+        ("june", "jun"), ("july", "jul"), ("august", "aug"), ("september", "sep", "sept"),
+        ("october", "oct"), ("november", "nov"), ("december", "dec"),
+    ])
+    for name in names
+}
+
+# LoCoMo session timestamps, e.g. "1:56 pm on 8 May, 2023"
+_LOCOMO_PATTERN = re.compile(
+    r"\s*(?P<hour>\d{1,2}):(?P<minute>\d{2})\s*(?P<meridiem>[ap])\.?m\.?\s+on\s+"
+    r"(?P<day>\d{1,2})\s+(?P<month>[a-z]+)\.?,?\s+(?P<year>\d{4})\s*",
+    re.IGNORECASE,
+)
+
+# Absolute formats in the order they are tried, each with a loose shape check strptime must pass too
+_NUMERIC_SHAPE = re.compile(r"[\d\s/:-]+")
+_MONTH_NAME_SHAPE = re.compile(r"[^\W\d_]+\s+[\d\s]+,\s+\d+")
+_DATE_FORMATS = [
+    ("%Y-%m-%d", _NUMERIC_SHAPE),
+    ("%m/%d/%Y", _NUMERIC_SHAPE),
+    ("%d/%m/%Y", _NUMERIC_SHAPE),
+    ("%B %d, %Y", _MONTH_NAME_SHAPE),
+    ("%b %d, %Y", _MONTH_NAME_SHAPE),
+    ("%Y-%m-%d %H:%M:%S", _NUMERIC_SHAPE),
+]
+
+
+def parse_locomo_timestamp(text: str) -> Optional[datetime]:
+    """Parse a LoCoMo session timestamp like "1:56 pm on 8 May, 2023", or return None"""
+    match = _LOCOMO_PATTERN.fullmatch(text)
+    if not match:
+        return None
+    month = _MONTHS.get(match.group("month").lower())
+    hour = int(match.group("hour"))
+    if month is None or not 1 <= hour <= 12:
+        return None
+    hour = hour % 12 + (12 if match.group("meridiem").lower() == "p" else 0)
+    try:
+        return datetime(int(match.group("year")), month, int(match.group("day")), hour, int(match.group("minute")))
+    except ValueError:
+        return None
+
+
+def _relative_offsets(text_lower: str) -> Tuple[timedelta, ...]:
+    """Offsets before the reference date of the relative expressions in the text, by priority"""
+    found = {}
+    for match in _RELATIVE_PATTERN.finditer(text_lower):
+        name = match.lastgroup
+        if name not in found:  # Leftmost occurrence of each expression
+            found[name] = match.group(name)
+    offsets = []
+    for name in sorted(found, key=_RELATIVE_PRIORITY.get):
+        if name in _WORD_OFFSETS:
+            offsets.append(_WORD_OFFSETS[name])
+            continue
+        try:
+            offsets.append(_UNIT_OFFSETS[name](int(found[name])))
+        except (OverflowError, ValueError):
+            continue  # Amount out of range: skip to the next expression
+    return tuple(offsets)
+
+
+def _absolute_date(text: str) -> Optional[datetime]:
+    for fmt, shape in _DATE_FORMATS:
+        if not shape.fullmatch(text):
+            continue
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+@lru_cache(maxsize=8192)
+def _parse_spec(text: str) -> Tuple[Tuple[timedelta, ...], Optional[datetime]]:
+    """Reference-independent parse of a text: relative offsets by priority, then the absolute date"""
+    # LoCoMo timestamps never contain a relative expression, so they skip that scan
+    parsed = parse_locomo_timestamp(text)
+    if parsed is not None:
+        return (), parsed
+    return _relative_offsets(text.lower()), _absolute_date(text)
+
+
+def parse_temporal_expression(text: str, reference_date: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Parse temporal expressions like "3 months ago", "last week", "yesterday"
+
+    Args:
+        text: Text containing temporal expression
+        reference_date: Reference date (defaults to now)
+
+    Returns:
+        Parsed datetime or None if not found
+    """
+    offsets, absolute = _parse_spec(text)
+    if offsets:
+        if reference_date is None:
+            reference_date = datetime.now()
+        for offset in offsets:
+            try:
+                return reference_date - offset
+            except OverflowError:
+                continue
+    return absolute
+
+
+def parse_cache_info():
+    """Hit / miss counts of the parse memo"""
+    return _parse_spec.cache_info()
+
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+# Microsecond differences up to 2**53 convert to float exactly
+_EXACT_FLOAT_LIMIT = 2 ** 53
+
+
+def parse_epochs(timestamps: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parse timestamps once into an epoch array
+
+    Returns:
+        (microseconds since 1970-01-01 as int64, mask of the timestamps that parsed)
+    """
+    epochs = np.zeros(len(timestamps), dtype=np.int64)
+    parsed = np.zeros(len(timestamps), dtype=bool)
+    for i, timestamp in enumerate(timestamps):
+        if not timestamp:
+            continue
+        date = parse_temporal_expression(timestamp)
+        if date:
+            epochs[i] = (date - _EPOCH) // _MICROSECOND
+            parsed[i] = True
+    return epochs, parsed
+
+
+def temporal_proximity_scores(epochs: np.ndarray, query_date: datetime) -> np.ndarray:
+    """
+    calculate_temporal_proximity for a whole epoch array, with identical results
+
+    Args:
+        epochs: Memory dates as microseconds since 1970-01-01 (see parse_epochs)
+        query_date: Date the query refers to
+
+    Returns:
+        Scores between 0.1 and 1 (1 = same date)
+    """
+    difference = np.abs(epochs - (query_date - _EPOCH) // _MICROSECOND)
+    seconds = difference / 1e6
+    # Beyond float precision, divide like timedelta.total_seconds does
+    large = difference >= _EXACT_FLOAT_LIMIT
+    if large.any():
+        seconds[large] = [int(value) / 10 ** 6 for value in difference[large]]
+    days_diff = seconds / (24 * 3600)
+
+    # Same day = 1.0, 1 week = 0.7, 1 month = 0.4, 1 year = 0.1
+    return np.select(
+        [days_diff == 0, days_diff <= 7, days_diff <= 30, days_diff <= 365],
+        [
+            1.0,
+            1.0 - (days_diff / 7) * 0.3,
+            0.7 - ((days_diff - 7) / 23) * 0.3,
+            0.4 - ((days_diff - 30) / 335) * 0.3,
+        ],
+        np.maximum(0.1, 0.1 - (days_diff - 365) / 3650),
+    )
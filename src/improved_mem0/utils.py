@@ -3,11 +3,17 @@ Utility functions for improved memory operations
 """
 import re
 import json
+import itertools
+import math
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Tuple, Optional
 from collections import defaultdict
 import hashlib
 
+import numpy as np
+
+from src.improved_mem0.temporal import parse_temporal_expression
+
 
 def calculate_similarity(text1: str, text2: str) -> float:
     """Calculate simple text similarity using word overlap"""
@@ -20,10 +26,29 @@ def calculate_similarity(text1: str, text2: str) -> float:
     return len(intersection) / len(union) if union else 0.0
 
 
+def _memory_text(memory: Dict[str, Any]) -> str:
+    return memory.get("memory", "") or memory.get("text", "") or str(memory)
+
+
+def _prefix_length(size: int, threshold: float) -> int:
+    """
+    Number of leading tokens (in the global token order) two sets must share one of to reach the threshold
+
+    Any pair with Jaccard >= threshold has a common token within the first
+    size - ceil(threshold * size) + 1 tokens of both sets.
+    """
+    # The small epsilon only lengthens the prefix, so float error can never drop a true match
+    return min(size, size - math.ceil(threshold * size - 1e-9) + 1)
+
+
 def deduplicate_memories(memories: List[Dict[str, Any]], similarity_threshold: float = 0.8) -> List[Dict[str, Any]]:
     """
     Deduplicate and consolidate similar memories
     
+    Near-duplicates are found with a prefix-filter index over each memory's word set: only kept
+    memories sharing a token in their signature (rarest-first prefix) are compared, so the result
+    is identical to comparing every pair with calculate_similarity in roughly linear time.
+    
     Args:
         memories: List of memory dictionaries
         similarity_threshold: Threshold for considering memories as duplicates (0-1)
@@ -34,11 +59,77 @@ def deduplicate_memories(memories: List[Dict[str, Any]], similarity_threshold: f
     if not memories:
         return memories
     
+    if similarity_threshold <= 0:
+        # Every pair matches (even empty texts), so the first memory absorbs all others
+        return _deduplicate_memories_pairwise(memories, similarity_threshold)
+    
+    texts = [_memory_text(memory) for memory in memories]
+    token_sets = [set(text.lower().split()) for text in texts]
+    
+    # Global token order: rarest first, which keeps signature postings short
+    frequency = defaultdict(int)
+    for tokens in token_sets:
+        for token in tokens:
+            frequency[token] += 1
+    
+    # Signature of each memory: the prefix of its word set in the global token order
+    signatures = []
+    for tokens in token_sets:
+        ordered = sorted(tokens, key=lambda token: (frequency[token], token))
+        signatures.append(ordered[:_prefix_length(len(ordered), similarity_threshold)])
+    
+    kept = {}  # memory index -> insertion sequence; insertion order is the output order
+    postings = defaultdict(list)  # signature token -> kept memory indices (replaced ones are skipped lazily)
+    seen_hashes = set()
+    sequence = itertools.count()
+    
+    def keep(i):
+        kept[i] = next(sequence)
+        for token in signatures[i]:
+            postings[token].append(i)
+    
+    for i, memory in enumerate(memories):
+        # Create hash for exact duplicates
+        memory_hash = hashlib.md5(texts[i].lower().encode()).hexdigest()
+        if memory_hash in seen_hashes:
+            continue
+        
+        # The first kept memory (in output order) at or above the threshold is the match
+        tokens = token_sets[i]
+        min_size = similarity_threshold * len(tokens)
+        max_size = len(tokens) / similarity_threshold
+        candidates = set()
+        for token in signatures[i]:
+            for j in postings.get(token, ()):
+                # Sets whose sizes differ too much cannot reach the threshold
+                if j in kept and min_size <= len(token_sets[j]) <= max_size:
+                    candidates.add(j)
+        match = None
+        for j in sorted(candidates, key=kept.get):
+            other = token_sets[j]
+            if len(tokens & other) / len(tokens | other) >= similarity_threshold:
+                match = j
+                break
+        
+        if match is None:
+            keep(i)
+            seen_hashes.add(memory_hash)
+        elif memory.get("score", 0.0) > memories[match].get("score", 0.0):
+            # Replace with better memory, which moves to the end of the output
+            del kept[match]
+            keep(i)
+            seen_hashes.add(memory_hash)
+    
+    return [memories[i] for i in sorted(kept, key=kept.get)]
+
+
+def _deduplicate_memories_pairwise(memories: List[Dict[str, Any]], similarity_threshold: float) -> List[Dict[str, Any]]:
+    """Reference O(n^2) deduplication comparing each memory with every kept memory"""
     deduplicated = []
     seen_hashes = set()
     
     for memory in memories:
-        memory_text = memory.get("memory", "") or memory.get("text", "") or str(memory)
+        memory_text = _memory_text(memory)
         
         # Create hash for exact duplicates
         memory_hash = hashlib.md5(memory_text.lower().encode()).hexdigest()
@@ -47,18 +138,14 @@ def deduplicate_memories(memories: List[Dict[str, Any]], similarity_threshold: f
         
         # Check for similar memories
         is_duplicate = False
-        for existing in deduplicated:
-            existing_text = existing.get("memory", "") or existing.get("text", "") or str(existing)
-            similarity = calculate_similarity(memory_text, existing_text)
+        for position, existing in enumerate(deduplicated):
+            similarity = calculate_similarity(memory_text, _memory_text(existing))
             
             if similarity >= similarity_threshold:
-                # Merge similar memories - keep the one with higher score or more metadata
-                existing_score = existing.get("score", 0.0)
-                memory_score = memory.get("score", 0.0)
-                
-                if memory_score > existing_score:
+                # Merge similar memories - keep the one with higher score
+                if memory.get("score", 0.0) > existing.get("score", 0.0):
                     # Replace with better memory
-                    deduplicated.remove(existing)
+                    del deduplicated[position]
                     deduplicated.append(memory)
                     seen_hashes.add(memory_hash)
                 is_duplicate = True
@@ -71,6 +158,45 @@ def deduplicate_memories(memories: List[Dict[str, Any]], similarity_threshold: f
     return deduplicated
 
 
+def deduplicate_memories_semantic(memories: List[Dict[str, Any]], embeddings: List[List[float]],
+                                  similarity_threshold: float = 0.9) -> List[Dict[str, Any]]:
+    """
+    Deduplicate memories by embedding cosine similarity
+    
+    All pairwise similarities come from one normalized matrix product. Memories are then clustered
+    greedily from the highest score down: each memory not yet absorbed becomes a cluster leader and
+    absorbs every remaining memory at or above the threshold, so the higher-scoring memory is the
+    one kept. Leaders keep their original order.
+    
+    Args:
+        memories: List of memory dictionaries
+        embeddings: One embedding per memory
+        similarity_threshold: Cosine similarity for considering memories as duplicates (-1 to 1)
+    
+    Returns:
+        List of deduplicated memories
+    """
+    if len(memories) <= 1:
+        return memories
+    
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = matrix / np.maximum(norms, 1e-12)
+    duplicate = (matrix @ matrix.T) >= similarity_threshold
+    
+    scores = np.array([memory.get("score", 0.0) or 0.0 for memory in memories], dtype=np.float64)
+    absorbed = np.zeros(len(memories), dtype=bool)
+    leaders = []
+    # Stable sort keeps the earlier memory on score ties, like the Jaccard mode
+    for i in np.argsort(-scores, kind="stable"):
+        if absorbed[i]:
+            continue
+        leaders.append(i)
+        absorbed |= duplicate[i]
+    
+    return [memories[i] for i in sorted(leaders)]
+
+
 def consolidate_memories(memories: List[Dict[str, Any]], max_consolidation: int = 3) -> List[Dict[str, Any]]:
     """
     Consolidate related memories into summaries
@@ -108,65 +234,6 @@ def consolidate_memories(memories: List[Dict[str, Any]], max_consolidation: int
     return consolidated
 
 
-def parse_temporal_expression(text: str, reference_date: Optional[datetime] = None) -> Optional[datetime]:
-    """
-    Parse temporal expressions like "3 months ago", "last week", "yesterday"
-    
-    Args:
-        text: Text containing temporal expression
-        reference_date: Reference date (defaults to now)
-    
-    Returns:
-        Parsed datetime or None if not found
-    """
-    if reference_date is None:
-        reference_date = datetime.now()
-    
-    text_lower = text.lower()
-    
-    # Patterns for relative time
-    patterns = [
-        (r'(\d+)\s*(?:seconds?|secs?)\s*ago', lambda m: reference_date - timedelta(seconds=int(m.group(1)))),
-        (r'(\d+)\s*(?:minutes?|mins?)\s*ago', lambda m: reference_date - timedelta(minutes=int(m.group(1)))),
-        (r'(\d+)\s*(?:hours?|hrs?)\s*ago', lambda m: reference_date - timedelta(hours=int(m.group(1)))),
-        (r'(\d+)\s*(?:days?)\s*ago', lambda m: reference_date - timedelta(days=int(m.group(1)))),
-        (r'(\d+)\s*(?:weeks?)\s*ago', lambda m: reference_date - timedelta(weeks=int(m.group(1)))),
-        (r'(\d+)\s*(?:months?)\s*ago', lambda m: reference_date - timedelta(days=int(m.group(1)) * 30)),
-        (r'(\d+)\s*(?:years?)\s*ago', lambda m: reference_date - timedelta(days=int(m.group(1)) * 365)),
-        (r'yesterday', lambda m: reference_date - timedelta(days=1)),
-        (r'today', lambda m: reference_date),
-        (r'last\s+week', lambda m: reference_date - timedelta(weeks=1)),
-        (r'last\s+month', lambda m: reference_date - timedelta(days=30)),
-        (r'last\s+year', lambda m: reference_date - timedelta(days=365)),
-    ]
-    
-    for pattern, func in patterns:
-        match = re.search(pattern, text_lower)
-        if match:
-            try:
-                return func(match)
-            except:
-                continue
-    
-    # Try to parse absolute dates
-    date_formats = [
-        "%Y-%m-%d",
-        "%m/%d/%Y",
-        "%d/%m/%Y",
-        "%B %d, %Y",
-        "%b %d, %Y",
-        "%Y-%m-%d %H:%M:%S",
-    ]
-    
-    for fmt in date_formats:
-        try:
-            return datetime.strptime(text, fmt)
-        except:
-            continue
-    
-    return None
-
-
 def extract_temporal_info(query: str) -> Dict[str, Any]:
     """
     Extract temporal information from query